@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from evolucao import contas_instituicao
+from metricas import METRICAS, etapa
+
+# Antecipação das próximas seleções das páginas de evolução. Variáveis de ambiente:
+#   RELORC_ANTECIPACAO=16        máximo de seleções na fila de antecipação (0 desliga a antecipação)
+#   RELORC_ANTECIPACAO_THREADS=1 threads de fundo que calculam as seleções antecipadas
+LIMITE_ANTECIPACAO = int(os.environ.get('RELORC_ANTECIPACAO', '16'))
+THREADS_ANTECIPACAO = int(os.environ.get('RELORC_ANTECIPACAO_THREADS', '1'))
+
+# Instituições vizinhas (antes e depois da selecionada) antecipadas a cada seleção
+VIZINHOS = 2
+
+# Seleções lembradas para a taxa de acerto
+LIMITE_REGISTRO = 4096
+
+
+def _lembrar(registro, chave):
+    registro[chave] = True
+    registro.move_to_end(chave)
+    while len(registro) > LIMITE_REGISTRO:
+        registro.popitem(last=False)
+
+
+class Antecipador:
+    # Depois de exibir uma seleção, a página agenda as seleções mais prováveis em seguida: as instituições
+    # vizinhas da mesma UF (com a primeira conta, que é a exibida ao trocar de instituição) e as demais
+    # contas da instituição atual. Cada seleção antecipada passa pelas mesmas funções da página, o que
+    # deixa filtros, percentuais, quadro do último ano e gráficos nos caches compartilhados. A fila tem
+    # tamanho máximo; seleções além do limite são descartadas.
+
+    def __init__(self, limite=LIMITE_ANTECIPACAO, threads=THREADS_ANTECIPACAO):
+        self.limite = limite
+        self._threads = threads
+        self._executor = None
+        self._pendentes = set()
+        self._antecipadas = OrderedDict()
+        self._consultadas = OrderedDict()
+        self._trava = threading.Lock()
+        self.contadores = {'agendadas': 0, 'descartadas': 0, 'concluidas': 0, 'erros': 0,
+                           'consultas': 0, 'acertos': 0}
+
+    def consultar(self, chave):
+        # Registra a primeira exibição de uma seleção; é um acerto se ela já tinha sido antecipada
+        with self._trava:
+            if chave in self._consultadas:
+                return False
+            _lembrar(self._consultadas, chave)
+            self.contadores['consultas'] += 1
+            acerto = self._antecipadas.pop(chave, None) is not None
+            if acerto:
+                self.contadores['acertos'] += 1
+            return acerto
+
+    def taxa_acerto(self):
+        consultas = self.contadores['consultas']
+        return self.contadores['acertos'] / consultas if consultas else 0.0
+
+    def agendar(self, chave, tarefa):
+        if not self.limite:
+            return False
+        with self._trava:
+            if chave in self._pendentes or chave in self._antecipadas or chave in self._consultadas:
+                return False
+            if len(self._pendentes) >= self.limite:
+                self.contadores['descartadas'] += 1
+                return False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._threads,
+                                                    thread_name_prefix='relorc-antecipacao')
+            self._pendentes.add(chave)
+            self.contadores['agendadas'] += 1
+        self._executor.submit(self._executar, chave, tarefa)
+        return True
+
+    def _executar(self, chave, tarefa):
+        # A tarefa devolve a chave da seleção que de fato calculou (None se não havia o que calcular)
+        try:
+            with etapa('antecipar', chave[0]):
+                calculada = tarefa()
+        except Exception:
+            # Uma falha na antecipação não afeta a página: a seleção será calculada quando for exibida
+            with self._trava:
+                self.contadores['erros'] += 1
+        else:
+            with self._trava:
+                self.contadores['concluidas'] += 1
+                for antecipada in {chave, calculada or chave}:
+                    if antecipada not in self._consultadas:
+                        _lembrar(self._antecipadas, antecipada)
+        finally:
+            with self._trava:
+                self._pendentes.discard(chave)
+
+    def antecipar_evolucao(self, pagina, selecao, indice, ultimo_ano, uf, instituicao, conta):
+        # Agenda, em ordem de probabilidade, as instituições seguintes e anteriores da UF e as contas
+        # seguintes e anteriores da instituição atual
+        instituicoes = indice.instituicoes(uf)
+        if instituicao in instituicoes:
+            posicao = instituicoes.index(instituicao)
+            for distancia in range(1, VIZINHOS + 1):
+                for vizinha in (posicao + distancia, posicao - distancia):
+                    if 0 <= vizinha < len(instituicoes):
+                        self._agendar_instituicao(pagina, selecao, indice, ultimo_ano, uf, instituicoes[vizinha])
+
+        contas = contas_instituicao(indice.instituicao(uf, instituicao))
+        if conta in contas:
+            posicao = contas.index(conta)
+            contas = contas[posicao + 1:] + contas[:posicao][::-1]
+        for outra in contas:
+            self._agendar_conta(pagina, selecao, indice, uf, instituicao, outra)
+
+    def _agendar_conta(self, pagina, selecao, indice, uf, instituicao, conta):
+        chave = (pagina, uf, instituicao, conta)
+
+        def tarefa():
+            selecao(pagina, indice, uf, instituicao, conta)
+            return chave
+
+        self.agendar(chave, tarefa)
+
+    def _agendar_instituicao(self, pagina, selecao, indice, ultimo_ano, uf, instituicao):
+        def tarefa():
+            ultimo_ano.instituicao(uf, instituicao)
+            contas = contas_instituicao(indice.instituicao(uf, instituicao))
+            if contas:
+                selecao(pagina, indice, uf, instituicao, contas[0])
+                return pagina, uf, instituicao, contas[0]
+
+        # Ao trocar de instituição a página exibe a primeira conta, que só é conhecida depois de filtrar a
+        # instituição: a tarefa é agendada com None no lugar da conta e devolve a chave da seleção calculada
+        self.agendar((pagina, uf, instituicao, None), tarefa)
+
+
+ANTECIPACAO = Antecipador()
+
+METRICAS.registrar_medidor('relorc_antecipacao_consultas', 'Seleções exibidas nas páginas de evolução',
+                           lambda: ANTECIPACAO.contadores['consultas'])
+METRICAS.registrar_medidor('relorc_antecipacao_acertos', 'Seleções exibidas que já tinham sido antecipadas',
+                           lambda: ANTECIPACAO.contadores['acertos'])
+METRICAS.registrar_medidor('relorc_antecipacao_taxa_acerto', 'Fração das seleções exibidas já antecipadas',
+                           ANTECIPACAO.taxa_acerto)
+METRICAS.registrar_medidor('relorc_antecipacao_descartadas', 'Seleções descartadas pelo limite da fila',
+                           lambda: ANTECIPACAO.contadores['descartadas'])
+METRICAS.registrar_medidor('relorc_antecipacao_pendentes', 'Seleções na fila de antecipação',
+                           lambda: len(ANTECIPACAO._pendentes))
@@ -0,0 +1,190 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from cache import CacheDados
+from carregamento import (ARQUIVO_CAPAG, ARQUIVO_REC_DESP, CAMINHO_DESP, CAMINHO_REC, assinatura_fonte,
+                          assinatura_siconfi, carregar_indice_despesas, carregar_indice_receitas, carregar_relatorio)
+from evolucao import CONTA_DESPESA, CONTA_RECEITA, contas_instituicao, filtrar_conta
+from graficos import COLUNAS_DESPESA, COLUNAS_RECEITA
+from metricas import etapa, iniciar_servidor
+from relatorio import tabela_capag
+
+# API HTTP/JSON somente leitura sobre os mesmos dados e cálculos da aplicação. Variáveis de ambiente:
+#   RELORC_API_PORTA=8502   porta padrão do servidor
+#   RELORC_API_CACHE_MB=64  memória máxima das respostas já serializadas
+PORTA_API = int(os.environ.get('RELORC_API_PORTA', '8502'))
+LIMITE_RESPOSTAS_MB = int(os.environ.get('RELORC_API_CACHE_MB', '64'))
+
+# Conjuntos do Siconfi consultados pela rota de instituição: carregamento, pasta dos CSVs e conta de referência
+SICONFI = {
+    'receitas': (carregar_indice_receitas, CAMINHO_REC, CONTA_RECEITA),
+    'despesas': (carregar_indice_despesas, CAMINHO_DESP, CONTA_DESPESA),
+}
+
+# Colunas da série de cada município
+SERIES_MUNICIPIO = {
+    'receitas': COLUNAS_RECEITA + ['Receita_Total'],
+    'despesas': COLUNAS_DESPESA + ['Despesa_Total'],
+}
+
+# Respostas serializadas, válidas enquanto a versão dos dados (o ETag) não mudar
+RESPOSTAS = CacheDados(LIMITE_RESPOSTAS_MB * 1024 * 1024)
+
+log = logging.getLogger('relorc.api')
+
+
+class ErroApi(Exception):
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _registros(df):
+    # NaN vira null pelo to_json do pandas
+    return json.loads(df.to_json(orient='records', force_ascii=False, double_precision=15))
+
+
+def _versao_planilhas():
+    return assinatura_fonte('rec_desp', ARQUIVO_REC_DESP), assinatura_fonte('capag', ARQUIVO_CAPAG)
+
+
+def municipio(codigo, tipo):
+    df_municipio, _ = carregar_relatorio().municipio(codigo)
+    if df_municipio.empty:
+        raise ErroApi(404, f"Município {codigo} não encontrado")
+    return {
+        'codigo': codigo,
+        'municipio': df_municipio['municipio'].iloc[0],
+        'uf': df_municipio['uf'].iloc[0],
+        tipo: _registros(df_municipio[['ano'] + SERIES_MUNICIPIO[tipo]]),
+    }
+
+
+def capag(codigo):
+    _, df_capag = carregar_relatorio().municipio(codigo)
+    if df_capag.empty:
+        raise ErroApi(404, f"Não há dados da CAPAG para o município {codigo}")
+    return {'codigo': codigo, 'capag': _registros(tabela_capag(df_capag))}
+
+
+def _indice_instituicao(tipo, uf, instituicao):
+    indice = SICONFI[tipo][0]()
+    if instituicao not in indice.instituicoes(uf):
+        raise ErroApi(404, f"Instituição '{instituicao}' não encontrada na UF {uf}")
+    return indice
+
+
+def instituicao(tipo, uf, nome):
+    indice = _indice_instituicao(tipo, uf, nome)
+    return {'tipo': tipo, 'uf': uf, 'instituicao': nome, 'contas': contas_instituicao(indice.instituicao(uf, nome))}
+
+
+def conta(tipo, uf, nome, conta_selecionada):
+    # Série 2015-2023 da conta e percentual sobre a conta de referência, como nas páginas de evolução
+    indice = _indice_instituicao(tipo, uf, nome)
+    _, df_conta = filtrar_conta(indice, uf, nome, conta_selecionada, SICONFI[tipo][2], 'Percentual')
+    if df_conta.empty:
+        raise ErroApi(404, f"Conta '{conta_selecionada}' sem dados entre 2015 e 2023 para '{nome}'")
+    return {
+        'tipo': tipo, 'uf': uf, 'instituicao': nome, 'conta': df_conta['Conta'].iloc[0],
+        'serie': _registros(df_conta[['Ano', 'Valor', 'Percentual']].rename(columns=str.lower)),
+    }
+
+
+def resolver(caminho, consulta):
+    # Rota -> (chave da resposta, versão dos dados, função que monta a resposta). A chave é o nome da rota
+    # seguido apenas dos parâmetros que ela usa (da consulta, só `tipo`), então variações do caminho
+    # enviado pelo cliente compartilham a mesma resposta. A versão é calculada sem carregar os dados,
+    # então uma requisição com ETag atual é respondida sem nenhuma consulta.
+    partes = [unquote(parte) for parte in caminho.strip('/').split('/')]
+    if len(partes) == 3 and partes[0] == 'municipio' and partes[2] in SERIES_MUNICIPIO:
+        return ('municipio', partes[1], partes[2]), _versao_planilhas(), lambda: municipio(partes[1], partes[2])
+    if len(partes) == 2 and partes[0] == 'capag':
+        return ('capag', partes[1]), _versao_planilhas(), lambda: capag(partes[1])
+    if partes[0] == 'instituicao' and len(partes) in (3, 5) and (len(partes) == 3 or partes[3] == 'conta'):
+        uf, nome = partes[1], partes[2]
+        tipo = consulta.get('tipo', ['receitas'])[-1]
+        if tipo not in SICONFI:
+            raise ErroApi(400, f"Tipo '{tipo}' inválido (use receitas ou despesas)")
+        versao = assinatura_siconfi(tipo, SICONFI[tipo][1], uf)
+        if len(partes) == 3:
+            return ('instituicao', tipo, uf, nome), versao, lambda: instituicao(tipo, uf, nome)
+        return ('conta', tipo, uf, nome, partes[4]), versao, lambda: conta(tipo, uf, nome, partes[4])
+    raise ErroApi(404, f"Rota não encontrada: {caminho}")
+
+
+def _etag(rota, versao):
+    return '"' + hashlib.md5(json.dumps([rota, versao], default=str).encode()).hexdigest() + '"'
+
+
+class RespostaApi(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        endereco = urlsplit(self.path)
+        # As métricas são separadas pelo nome da rota, nunca pelo caminho enviado pelo cliente (que tem
+        # valores ilimitados); caminhos que não correspondem a nenhuma rota ficam em 'desconhecida'
+        with etapa('api', 'desconhecida') as registro:
+            try:
+                rota, versao, construir = resolver(endereco.path, parse_qs(endereco.query))
+                registro['detalhe'] = rota[0]
+                etag = _etag(rota, versao)
+                if etag in (valor.strip() for valor in self.headers.get('If-None-Match', '').split(',')):
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                corpo = RESPOSTAS.obter(rota, etag, lambda: json.dumps(construir(), ensure_ascii=False).encode('utf-8'))
+                self._enviar(200, corpo, etag)
+            except ErroApi as erro:
+                self._enviar(erro.status, json.dumps({'erro': str(erro)}, ensure_ascii=False).encode('utf-8'))
+            except Exception:
+                # Falha inesperada (arquivo ilegível, erro nos cálculos): registrada com o traceback no log;
+                # o cliente recebe uma resposta JSON sem detalhes internos
+                log.exception("Erro ao responder %s", self.path)
+                self._enviar(500, json.dumps({'erro': 'Erro interno do servidor'}, ensure_ascii=False).encode('utf-8'))
+
+    def _enviar(self, status, corpo, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        if etag is not None:
+            # O cliente guarda a resposta e revalida pelo ETag a cada uso
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def criar_servidor(porta=PORTA_API, endereco='127.0.0.1'):
+    # Uma thread por requisição; todas consultam os mesmos índices no cache compartilhado do processo
+    return ThreadingHTTPServer((endereco, porta), RespostaApi)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API HTTP/JSON somente leitura sobre os dados do relatório.')
+    parser.add_argument('--porta', type=int, default=PORTA_API)
+    parser.add_argument('--endereco', default='127.0.0.1', help='Endereço de escuta (padrão: apenas a máquina local)')
+    args = parser.parse_args()
+
+    iniciar_servidor()
+    servidor = criar_servidor(args.porta, args.endereco)
+    print(f"API disponível em http://{args.endereco}:{servidor.server_address[1]}/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
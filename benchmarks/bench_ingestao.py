@@ -0,0 +1,43 @@
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from benchmarks.sintetico import gerar_csvs
+from carregamento import CAMINHO_REC, construir_siconfi
+
+
+def medir(caminho, processos):
+    inicio = time.perf_counter()
+    df = construir_siconfi(caminho, processos)
+    return time.perf_counter() - inicio, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede a ingestão dos CSVs do Siconfi com diferentes números de processos.')
+    parser.add_argument('--caminho', default=CAMINHO_REC, help='Pasta com os CSVs (padrão: Receitas/)')
+    parser.add_argument('--processos', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--municipios', type=int, default=5570,
+                        help='Municípios por arquivo nos dados sintéticos, usados quando a pasta não tem CSVs')
+    parser.add_argument('--contas', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        caminho = args.caminho
+        if not glob.glob(os.path.join(caminho, '*.csv')):
+            caminho = temporario
+            gerar_csvs(caminho, args.municipios, args.contas)
+            print(f"Dados sintéticos: {args.municipios} municípios x {args.contas} contas x 9 anos")
+
+        arquivos = len(glob.glob(os.path.join(caminho, '*.csv')))
+        referencia = None
+        for processos in args.processos:
+            tempo, linhas = medir(caminho, processos)
+            referencia = referencia or tempo
+            print(f"{processos} processo(s): {tempo:.2f}s para {arquivos} arquivos e {linhas:,} linhas "
+                  f"({linhas / tempo:,.0f} linhas/s, {referencia / tempo:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import glob
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.sintetico import gerar_csvs
+from carregamento import CAMINHO_DESP, CAMINHO_REC
+from limpeza import converter_valor, ler_csv_siconfi, memoria_mb, normalizar_coluna, tipar_siconfi
+
+
+def carregar_sem_esquema(arquivos):
+    # Mesmo resultado da leitura original de main(): todas as colunas, textos e 'Ano' como string
+    df = pd.concat([ler_csv_siconfi(arquivo) for arquivo in arquivos], ignore_index=True)
+    df['Ano'] = df['Ano'].astype(str)
+    df['Valor'] = converter_valor(df['Valor'])
+    df['Conta_Normalizada'] = normalizar_coluna(df['Conta'])
+    df['UF'] = df['UF'].str.strip().str.upper()
+    df['Instituição'] = df['Instituição'].str.strip().str.upper()
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara a memória dos dados do Siconfi antes e depois do esquema compacto.')
+    parser.add_argument('--receitas', default=CAMINHO_REC)
+    parser.add_argument('--despesas', default=CAMINHO_DESP)
+    parser.add_argument('--municipios', type=int, default=5570,
+                        help='Municípios por arquivo nos dados sintéticos, usados quando a pasta não tem CSVs')
+    parser.add_argument('--contas', type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporario:
+        for nome, caminho, receitas in (('receitas', args.receitas, True), ('despesas', args.despesas, False)):
+            arquivos = sorted(glob.glob(os.path.join(caminho, '*.csv')))
+            if not arquivos:
+                arquivos = gerar_csvs(os.path.join(temporario, nome), args.municipios, args.contas, receitas=receitas)
+                nome += ' (sintético)'
+
+            antes = carregar_sem_esquema(arquivos)
+            depois = tipar_siconfi(antes)
+            print(f"{nome}: {len(antes):,} linhas")
+            print(f"  texto (object): {memoria_mb(antes.astype({coluna: object for coluna in antes.columns[antes.dtypes == 'str']})):8.1f} MB")
+            print(f"  texto (str):    {memoria_mb(antes):8.1f} MB")
+            print(f"  esquema:        {memoria_mb(depois):8.1f} MB")
+            for coluna in depois.columns:
+                print(f"    {coluna:<20} {str(depois[coluna].dtype):<10} {depois[coluna].memory_usage(deep=True) / 1024 ** 2:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
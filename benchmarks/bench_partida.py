@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em um processo novo: importa o Streamlit (como o servidor faz antes da primeira sessão) e
+# executa a aplicação uma vez, como a primeira sessão de uma réplica recém-iniciada
+FILHO = """
+import json, os, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+from streamlit.testing.v1 import AppTest
+streamlit = time.perf_counter()
+app = AppTest.from_file(os.path.join({raiz!r}, 'rel_orc_mun.py'), default_timeout=600)
+app.run()
+fim = time.perf_counter()
+modulos = [nome for nome in ('altair', 'openpyxl') if nome in sys.modules]
+print(json.dumps({{'streamlit': streamlit - inicio, 'primeira_execucao': fim - streamlit, 'total': fim - inicio,
+                  'modulos': modulos, 'erro': bool(app.exception)}}))
+"""
+
+
+def executar(dados, variaveis):
+    ambiente = dict(os.environ, **variaveis)
+    saida = subprocess.run([sys.executable, '-c', FILHO.format(raiz=RAIZ)], cwd=dados, env=ambiente,
+                           capture_output=True, text=True, check=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def medir(nome, dados, variaveis, repeticoes, preparar=None):
+    resultados = []
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        resultados.append(executar(dados, variaveis))
+    melhor = min(resultados, key=lambda resultado: resultado['total'])
+    print(f"{nome:<22} primeira renderização {melhor['total']:7.3f}s "
+          f"(Streamlit {melhor['streamlit']:.3f}s + execução {melhor['primeira_execucao']:.3f}s) "
+          f"módulos carregados: {', '.join(melhor['modulos']) or '-'}")
+    return dict(melhor, caso=nome)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mede o tempo até a primeira renderização da aplicação em um processo novo, '
+                    'com e sem o snapshot de partida rápida.')
+    parser.add_argument('--dados', default='.', help='Pasta de trabalho com as planilhas, CSVs e dados/')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+    dados = os.path.abspath(args.dados)
+
+    with tempfile.TemporaryDirectory() as temporario:
+        partida = os.path.join(temporario, 'partida.pickle')
+        resultados = [medir('sem partida rápida', dados, {'RELORC_PARTIDA': ''}, args.repeticoes)]
+
+        # Um processo anterior grava o snapshot; as execuções medidas partem dele
+        executar(dados, {'RELORC_PARTIDA': partida})
+        resultados.append(medir('com partida rápida', dados, {'RELORC_PARTIDA': partida}, args.repeticoes))
+    print(json.dumps(resultados, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
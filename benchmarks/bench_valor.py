@@ -0,0 +1,64 @@
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.sintetico import gerar_valores
+from carregamento import CAMINHO_DESP, CAMINHO_REC
+from limpeza import converter_valor
+
+
+def converter_valor_regex(serie):
+    # Limpeza usada originalmente em main(): três substituições por regex seguidas de pd.to_numeric
+    serie = serie.replace({r'\.': '', r',': '.', r'[^\d\.]': ''}, regex=True)
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def ler_coluna_valor(caminhos):
+    arquivos = sorted(arquivo for caminho in caminhos for arquivo in glob.glob(os.path.join(caminho, '*.csv')))
+    if not arquivos:
+        return None
+    return pd.concat(
+        [pd.read_csv(arquivo, encoding='ISO-8859-1', sep=';', on_bad_lines='skip', usecols=['Valor'], dtype=str)
+         for arquivo in arquivos],
+        ignore_index=True)['Valor']
+
+
+def medir(funcao, serie, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(serie)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a limpeza da coluna 'Valor' antes e depois do parser dedicado.")
+    parser.add_argument('--receitas', default=CAMINHO_REC)
+    parser.add_argument('--despesas', default=CAMINHO_DESP)
+    parser.add_argument('--linhas', type=int, default=1_000_000,
+                        help='Linhas sintéticas usadas quando não há CSVs do Siconfi nas pastas')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    serie = ler_coluna_valor([args.receitas, args.despesas])
+    origem = 'CSVs do Siconfi'
+    if serie is None:
+        serie = gerar_valores(args.linhas)
+        origem = 'dados sintéticos'
+    print(f"{len(serie):,} valores ({origem})")
+
+    tempo_antes, antes = medir(converter_valor_regex, serie, args.repeticoes)
+    tempo_depois, depois = medir(converter_valor, serie, args.repeticoes)
+
+    iguais = antes.fillna(-1).eq(depois.fillna(-1)).all()
+    print(f"regex + to_numeric: {tempo_antes:.3f}s ({len(serie) / tempo_antes:,.0f} linhas/s)")
+    print(f"converter_valor:    {tempo_depois:.3f}s ({len(serie) / tempo_depois:,.0f} linhas/s)")
+    print(f"ganho: {tempo_antes / tempo_depois:.1f}x; resultados idênticos: {'sim' if iguais else 'NÃO'}")
+
+
+if __name__ == "__main__":
+    main()
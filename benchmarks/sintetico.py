@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def formatar_valor(valor):
+    # 1234567.891 -> "1.234.567,89"
+    texto = f"{valor:,.2f}"
+    return texto.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def gerar_valores(linhas, semente=0):
+    # Coluna 'Valor' no formato do Siconfi, com alguns negativos, células inválidas e vazias
+    rng = np.random.default_rng(semente)
+    valores = [formatar_valor(valor) for valor in rng.uniform(-1e6, 1e9, linhas)]
+    for posicao in rng.choice(linhas, size=linhas // 500, replace=False):
+        valores[posicao] = rng.choice(['-', 'n.d.', ''])
+    return pd.Series(valores, name='Valor')
+
+
+UFS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA', 'PB',
+       'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Código IBGE de cada UF: o código de um município tem 7 dígitos e começa pelo código da sua UF
+CODIGOS_UF = {'RO': 11, 'AC': 12, 'AM': 13, 'RR': 14, 'PA': 15, 'AP': 16, 'TO': 17, 'MA': 21, 'PI': 22, 'CE': 23,
+              'RN': 24, 'PB': 25, 'PE': 26, 'AL': 27, 'SE': 28, 'BA': 29, 'MG': 31, 'ES': 32, 'RJ': 33, 'SP': 35,
+              'PR': 41, 'SC': 42, 'RS': 43, 'MS': 50, 'MT': 51, 'GO': 52, 'DF': 53}
+
+CONTAS_RECEITA = ['RECEITA CORRENTE LÍQUIDA (III) = (I - II)', 'RECEITAS CORRENTES (I)', 'Dedução (II)',
+                  'Impostos, Taxas e Contribuições de Melhoria', 'Contribuições', 'Receita Patrimonial',
+                  'Transferências Correntes', 'Outras Receitas Correntes']
+CONTAS_DESPESA = ['DESPESAS (EXCETO INTRA-ORÇAMENTÁRIAS) (I)', 'Pessoal e Encargos Sociais',
+                  'Juros e Encargos da Dívida', 'Outras Despesas Correntes', 'Investimentos',
+                  'Inversões Financeiras', 'Amortização da Dívida']
+
+COLUNAS_CSV = ['Instituição', 'Cod.IBGE', 'UF', 'População', 'Coluna', 'Conta', 'Identificador da Conta',
+               'Valor', 'Ano']
+
+# Células inválidas da coluna 'Valor' nos arquivos do Siconfi (None vira uma célula vazia no CSV)
+VALORES_INVALIDOS = ['n.d.', '-', '', None]
+
+
+def municipios_sinteticos(quantidade):
+    # (UF, nome, código IBGE) de `quantidade` municípios distribuídos pelas UFs, com códigos IBGE válidos
+    municipios = []
+    for posicao in range(quantidade):
+        uf = UFS[posicao % len(UFS)]
+        municipios.append((uf, f'Município {posicao}', CODIGOS_UF[uf] * 100000 + posicao))
+    return municipios
+
+
+def _municipios(municipios):
+    # Aceita a quantidade de municípios ou a lista de (UF, nome, código IBGE)
+    return municipios_sinteticos(municipios) if isinstance(municipios, int) else list(municipios)
+
+
+def _nomes_contas(base, quantidade):
+    # Completa a lista de contas reais com contas numeradas até a quantidade pedida
+    return base[:quantidade] + [f'{base[-1]} {i}' for i in range(max(0, quantidade - len(base)))]
+
+
+def gerar_siconfi(municipios, contas, ano, base, semente=0, fracao_invalidos=0.002):
+    # Um arquivo do Siconfi (um ano) com uma linha por município e conta, como lido do CSV (Valor em texto
+    # no formato brasileiro); a primeira conta é a de referência
+    municipios = _municipios(municipios)
+    rng = np.random.default_rng(semente + ano)
+    nomes = _nomes_contas(base, contas)
+    linhas = len(municipios) * len(nomes)
+    ufs, nomes_municipios, codigos = (np.repeat(coluna, len(nomes)) for coluna in zip(*municipios))
+    posicoes = np.repeat(np.arange(len(municipios)), len(nomes))
+    valores = rng.uniform(1e4, 1e8, linhas)
+    valores[::len(nomes)] = 2e8
+    valores = [formatar_valor(valor) for valor in valores]
+    for posicao in rng.choice(linhas, size=int(linhas * fracao_invalidos), replace=False):
+        valores[posicao] = VALORES_INVALIDOS[rng.integers(len(VALORES_INVALIDOS))]
+    return pd.DataFrame({
+        'Instituição': [f'Prefeitura Municipal de {nome} - {uf}' for nome, uf in zip(nomes_municipios, ufs)],
+        'Cod.IBGE': codigos,
+        'UF': ufs,
+        'População': 10000 + posicoes * 7,
+        'Coluna': 'Receitas Brutas Realizadas',
+        'Conta': np.tile(nomes, len(municipios)),
+        'Identificador da Conta': np.tile([f'cod{i}' for i in range(len(nomes))], len(municipios)),
+        'Valor': pd.Series(valores, dtype=object),
+        'Ano': ano,
+    }, columns=COLUNAS_CSV)
+
+
+def gerar_csvs(pasta, municipios=100, contas=8, anos=range(2015, 2024), receitas=True):
+    # Grava um CSV por ano em `pasta`, no mesmo formato (ISO-8859-1, separador ';') dos arquivos do Siconfi
+    os.makedirs(pasta, exist_ok=True)
+    base = CONTAS_RECEITA if receitas else CONTAS_DESPESA
+    municipios = _municipios(municipios)
+    arquivos = []
+    for ano in anos:
+        arquivo = os.path.join(pasta, f'finbra_{ano}.csv')
+        gerar_siconfi(municipios, contas, ano, base).to_csv(arquivo, sep=';', index=False, encoding='ISO-8859-1')
+        arquivos.append(arquivo)
+    return arquivos
+
+
+def _por_ano(municipios, anos):
+    # Uma linha por município e ano: colunas UF, nome, código e ano
+    ufs, nomes, codigos = (np.repeat(coluna, len(anos)) for coluna in zip(*municipios))
+    return ufs, nomes, codigos, np.tile(list(anos), len(municipios))
+
+
+def gerar_rec_desp(municipios, anos=range(2020, 2024), semente=0):
+    # Planilha de receitas e despesas municipais (rec_desp_full.xlsx), com os mesmos municípios dos CSVs
+    municipios = _municipios(municipios)
+    rng = np.random.default_rng(semente)
+    ufs, nomes, codigos, anos_linhas = _por_ano(municipios, anos)
+    linhas = len(codigos)
+    df = pd.DataFrame({
+        'id_municipio': codigos,
+        'ano': anos_linhas,
+        'municipio': nomes,
+        'uf': ufs,
+        'populacao': (10000 + np.repeat(np.arange(len(municipios)), len(anos)) * 7).astype(float),
+    })
+    for tipo in ('Receita', 'Despesa'):
+        partes = [f'{tipo}_Corrente', f'{tipo}_Capital', f'{tipo}_Intra_Orcamentaria']
+        for parte in partes:
+            df[parte] = rng.uniform(1e5, 1e9, linhas).round(2)
+        df[f'{tipo}_Total'] = df[partes].sum(axis=1)
+    return df
+
+
+def gerar_capag(municipios, anos=range(2020, 2024), semente=0, fracao_nd=0.02):
+    # Planilha CAPAG (capag_full.xlsx); alguns indicadores aparecem como 'n.d.', como na planilha real
+    municipios = _municipios(municipios)
+    rng = np.random.default_rng(semente)
+    ufs, nomes, codigos, anos_linhas = _por_ano(municipios, anos)
+    linhas = len(codigos)
+    df = pd.DataFrame({
+        'cod': codigos,
+        'Nome_Município': nomes,
+        'UF': ufs,
+        'ano': anos_linhas,
+    })
+    for indicador in range(1, 4):
+        valores = rng.uniform(-0.5, 2, linhas).astype(object)
+        valores[rng.choice(linhas, size=int(linhas * fracao_nd), replace=False)] = 'n.d.'
+        df[f'Indicador {indicador}'] = valores
+        df[f'Nota {indicador}'] = rng.choice(['A', 'B', 'C'], linhas)
+    df['CAPAG'] = rng.choice(['A', 'B', 'C', 'n.e.'], linhas)
+    return df
+
+
+def gerar_planilhas(pasta, municipios=100, anos=range(2020, 2024)):
+    # Grava as duas planilhas em `pasta` e devolve os caminhos (rec_desp, capag)
+    os.makedirs(pasta, exist_ok=True)
+    arquivo_rec_desp = os.path.join(pasta, 'rec_desp_full.xlsx')
+    arquivo_capag = os.path.join(pasta, 'capag_full.xlsx')
+    gerar_rec_desp(municipios, anos).to_excel(arquivo_rec_desp, index=False)
+    gerar_capag(municipios, anos).to_excel(arquivo_capag, index=False)
+    return arquivo_rec_desp, arquivo_capag
@@ -0,0 +1,287 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.sintetico import gerar_csvs, gerar_planilhas
+from calculos import QUADRO_ULTIMO_ANO, calcular_participacao
+from carregamento import CACHE, construir_siconfi, ler_capag, ler_rec_desp
+from comparacao import MAXIMO_MUNICIPIOS, PivoComparacao
+from evolucao import filtrar_conta
+from graficos import (_modelo_composicao, _modelo_evolucao_conta, _modelo_percentual, grafico_evolucao_conta,
+                      grafico_percentual, grafico_receita_municipio)
+from indices import IndiceRelatorio, IndiceSiconfi
+from limpeza import converter_valor, ler_csv_siconfi, normalizar_coluna, normalizar_texto
+
+CONTA_RCL = QUADRO_ULTIMO_ANO['receitas'][0]
+
+
+# Cada caso recebe os caminhos dos dados sintéticos e os parâmetros da execução, faz a preparação
+# (fora da medição) e devolve a operação medida e quantas unidades ela processa por execução
+
+
+def caso_ingestao_csv(dados, parametros):
+    return lambda: construir_siconfi(dados['receitas'], 1), dados['linhas_csv'], 'linhas'
+
+
+def _colunas_brutas(dados):
+    return pd.concat([ler_csv_siconfi(arquivo) for arquivo in dados['arquivos_receitas']], ignore_index=True)
+
+
+def caso_normalizar_texto(dados, parametros):
+    contas = _colunas_brutas(dados)['Conta']
+    return lambda: contas.apply(normalizar_texto), len(contas), 'linhas'
+
+
+def caso_normalizar_coluna(dados, parametros):
+    contas = _colunas_brutas(dados)['Conta']
+    return lambda: normalizar_coluna(contas), len(contas), 'linhas'
+
+
+def caso_converter_valor(dados, parametros):
+    valores = _colunas_brutas(dados)['Valor'].astype(str)
+    return lambda: converter_valor(valores), len(valores), 'linhas'
+
+
+def caso_excel_rec_desp(dados, parametros):
+    return lambda: ler_rec_desp(dados['rec_desp']), dados['linhas_excel'], 'linhas'
+
+
+def caso_excel_capag(dados, parametros):
+    return lambda: ler_capag(dados['capag']), dados['linhas_excel'], 'linhas'
+
+
+def _selecoes(indice, quantidade):
+    # Instituições sorteadas (sempre as mesmas) entre todas as UFs
+    todas = [(uf, instituicao) for uf in indice.ufs for instituicao in indice.instituicoes(uf)]
+    rng = np.random.default_rng(0)
+    return [todas[posicao] for posicao in rng.choice(len(todas), size=min(quantidade, len(todas)), replace=False)]
+
+
+def selecao_evolucao(indice, uf, instituicao, nome, conta_selecionada):
+    # Filtros e percentuais calculados pelas páginas de evolução a cada seleção (as mesmas funções das páginas)
+    conta_referencia, descartar = QUADRO_ULTIMO_ANO[nome]
+    quadro = indice.ultimo_ano(uf, instituicao, conta_referencia, descartar)
+    df_filtrado, df_evolucao = filtrar_conta(indice, uf, instituicao, conta_selecionada, conta_referencia,
+                                             'Percentual')
+    return quadro, df_filtrado, df_evolucao
+
+
+def _caso_pagina(caminho, nome, parametros):
+    CACHE.invalidar()
+    indice = IndiceSiconfi(construir_siconfi(caminho, 1))
+    selecoes = _selecoes(indice, parametros['selecoes'])
+    # A conta selecionada é a segunda conta da instituição (a primeira é a de referência)
+    contas = [indice.instituicao(uf, instituicao)['Conta'].iloc[1] for uf, instituicao in selecoes]
+
+    def executar():
+        # Participações e quadros ficam no cache compartilhado: sem esvaziá-lo, apenas a primeira
+        # execução mediria o cálculo de cada seleção
+        CACHE.invalidar()
+        for (uf, instituicao), conta in zip(selecoes, contas):
+            selecao_evolucao(indice, uf, instituicao, nome, conta)
+    return executar, len(selecoes), 'seleções'
+
+
+def caso_pagina_receita(dados, parametros):
+    return _caso_pagina(dados['receitas'], 'receitas', parametros)
+
+
+def caso_pagina_despesa(dados, parametros):
+    return _caso_pagina(dados['despesas'], 'despesas', parametros)
+
+
+def caso_pagina_relatorio(dados, parametros):
+    indice = IndiceRelatorio(ler_rec_desp(dados['rec_desp']), ler_capag(dados['capag']))
+    rng = np.random.default_rng(0)
+    quantidade = min(parametros['selecoes'], len(indice.codigos))
+    codigos = list(rng.choice(indice.codigos, size=quantidade, replace=False))
+
+    def executar():
+        for codigo in codigos:
+            indice.municipio(codigo)
+    return executar, len(codigos), 'seleções'
+
+
+def caso_pagina_comparacao(dados, parametros):
+    # Seleções de MAXIMO_MUNICIPIOS municípios lidas do pivô (valores de todos os anos e tabela de um ano)
+    pivo = PivoComparacao(ler_rec_desp(dados['rec_desp']), ler_capag(dados['capag']))
+    rng = np.random.default_rng(0)
+    selecoes = [list(rng.choice(pivo.codigos, size=min(MAXIMO_MUNICIPIOS, len(pivo.codigos)), replace=False))
+                for _ in range(parametros['selecoes'])]
+    ano = pivo.anos[-1]
+
+    def executar():
+        for codigos in selecoes:
+            pivo.longo(codigos, ['Receita_Total', 'Despesa_Total'])
+            pivo.tabela_ano(codigos, ano)
+    return executar, len(selecoes), 'seleções'
+
+
+def _dados_graficos(dados, parametros):
+    CACHE.invalidar()
+    indice = IndiceSiconfi(construir_siconfi(dados['receitas'], 1))
+    selecoes = []
+    for uf, instituicao in _selecoes(indice, parametros['selecoes']):
+        df = indice.instituicao(uf, instituicao)
+        conta = df['Conta_Normalizada'].iloc[1]
+        df = df.assign(Percentual_Receita=calcular_participacao(df, CONTA_RCL))
+        selecoes.append((df[df['Conta_Normalizada'] == conta], conta))
+    municipio = ler_rec_desp(dados['rec_desp']).head(4)
+    return selecoes, municipio
+
+
+def _construir_graficos(selecoes, municipio):
+    for df, conta in selecoes:
+        grafico_evolucao_conta(df, conta)
+        grafico_percentual(df, 'Percentual_Receita', f'Percentual da {conta} sobre Receita Corrente Líquida')
+        grafico_receita_municipio(municipio)
+
+
+def caso_graficos_sem_modelo(dados, parametros):
+    # Especificação montada do zero pelo Altair (primeira exibição de cada gráfico)
+    selecoes, municipio = _dados_graficos(dados, parametros)
+
+    def executar():
+        for modelo in (_modelo_composicao, _modelo_evolucao_conta, _modelo_percentual):
+            modelo.cache_clear()
+        _construir_graficos(selecoes, municipio)
+    return executar, 3 * len(selecoes), 'gráficos'
+
+
+def caso_graficos_com_modelo(dados, parametros):
+    # Modelos já montados: apenas os dados de cada seleção são inseridos na especificação
+    selecoes, municipio = _dados_graficos(dados, parametros)
+    _construir_graficos(selecoes, municipio)
+    return lambda: _construir_graficos(selecoes, municipio), 3 * len(selecoes), 'gráficos'
+
+
+CASOS = {
+    'ingestao_csv': caso_ingestao_csv,
+    'normalizar_texto': caso_normalizar_texto,
+    'normalizar_coluna': caso_normalizar_coluna,
+    'converter_valor': caso_converter_valor,
+    'excel_rec_desp': caso_excel_rec_desp,
+    'excel_capag': caso_excel_capag,
+    'pagina_receita': caso_pagina_receita,
+    'pagina_despesa': caso_pagina_despesa,
+    'pagina_relatorio': caso_pagina_relatorio,
+    'pagina_comparacao': caso_pagina_comparacao,
+    'graficos_sem_modelo': caso_graficos_sem_modelo,
+    'graficos_com_modelo': caso_graficos_com_modelo,
+}
+
+
+def _memoria_pico_mb():
+    # Pico de memória residente do processo (ru_maxrss está em KB no Linux e em bytes no macOS)
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def executar_caso(nome, dados, parametros):
+    inicio_memoria = _memoria_pico_mb()
+    executar, unidades, unidade = CASOS[nome](dados, parametros)
+    tempos = []
+    for _ in range(parametros['repeticoes']):
+        inicio = time.perf_counter()
+        executar()
+        tempos.append(time.perf_counter() - inicio)
+    fim_memoria = _memoria_pico_mb()
+    return {
+        'caso': nome,
+        'repeticoes': len(tempos),
+        'segundos_min': min(tempos),
+        'segundos_media': sum(tempos) / len(tempos),
+        'unidades': unidades,
+        'unidade': unidade,
+        'por_segundo': unidades / min(tempos),
+        # Memória acrescentada pelo caso (preparação e execuções) ao processo em que ele roda
+        'memoria_pico_mb': None if inicio_memoria is None else fim_memoria - inicio_memoria,
+    }
+
+
+def executar_isolado(nome, dados, parametros):
+    # Cada caso roda em um processo novo, para que o pico de memória de um não contamine o seguinte
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return executar_caso(nome, dados, parametros)
+    with multiprocessing.get_context('fork').Pool(1) as processo:
+        return processo.apply(executar_caso, (nome, dados, parametros))
+
+
+def preparar_dados(pasta, municipios, contas, anos):
+    anos = range(2024 - anos, 2024)
+    dados = {
+        'receitas': os.path.join(pasta, 'Receitas'),
+        'despesas': os.path.join(pasta, 'Despesas'),
+        'arquivos_receitas': gerar_csvs(os.path.join(pasta, 'Receitas'), municipios, contas, anos),
+        'linhas_csv': municipios * contas * len(anos),
+    }
+    gerar_csvs(dados['despesas'], municipios, contas, anos, receitas=False)
+    dados['rec_desp'], dados['capag'] = gerar_planilhas(pasta, municipios)
+    dados['linhas_excel'] = municipios * 4
+    return dados
+
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mede a ingestão e os trechos críticos de cada página com dados sintéticos.')
+    parser.add_argument('--municipios', type=int, default=500)
+    parser.add_argument('--contas', type=int, default=30)
+    parser.add_argument('--anos', type=int, default=9)
+    parser.add_argument('--selecoes', type=int, default=50, help='Seleções simuladas nos casos das páginas')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--casos', nargs='+', choices=list(CASOS), default=list(CASOS))
+    parser.add_argument('--saida', help='Arquivo JSON Lines ao qual o resultado da execução é acrescentado')
+    args = parser.parse_args()
+
+    parametros = {'municipios': args.municipios, 'contas': args.contas, 'anos': args.anos,
+                  'selecoes': args.selecoes, 'repeticoes': args.repeticoes}
+    resultados = []
+    with tempfile.TemporaryDirectory() as temporario:
+        print(f"Dados sintéticos: {args.municipios} municípios x {args.contas} contas x {args.anos} anos",
+              file=sys.stderr)
+        dados = preparar_dados(temporario, args.municipios, args.contas, args.anos)
+        for nome in args.casos:
+            resultado = executar_isolado(nome, dados, parametros)
+            resultados.append(resultado)
+            memoria = resultado['memoria_pico_mb']
+            print(f"{nome:<22} {resultado['segundos_min']:9.4f}s {resultado['por_segundo']:14,.0f} "
+                  f"{resultado['unidade']}/s" + (f" {memoria:8.1f} MB" if memoria is not None else ''),
+                  file=sys.stderr)
+
+    execucao = {
+        'versao': versao_codigo(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'parametros': parametros,
+        'resultados': resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(json.dumps(execucao, ensure_ascii=False) + '\n')
+    else:
+        print(json.dumps(execucao, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main()
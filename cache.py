@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from metricas import METRICAS
+
+# Cache de dados compartilhado pelo processo: as tabelas carregadas, os índices e os resultados derivados
+# deles disputam o mesmo limite de memória
+
+# Limite de memória do cache em MB (pode ser ajustado pela variável de ambiente)
+LIMITE_CACHE_MB = int(os.environ.get('RELORC_CACHE_MB', '1024'))
+
+
+def _tamanho_em_bytes(valor):
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    # Quadros prontos para a página (dicionários e listas de tuplas): conta também o conteúdo
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamanho_em_bytes(chave) + _tamanho_em_bytes(item)
+                                          for chave, item in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamanho_em_bytes(item) for item in valor)
+    return sys.getsizeof(valor)
+
+
+def tamanho_quadros(*quadros):
+    # Memória de DataFrames e arrays guardados por um objeto do cache (cada um contado uma única vez)
+    distintos = {id(quadro): quadro for quadro in quadros}.values()
+    return sum(int(quadro.memory_usage(deep=True).sum()) if isinstance(quadro, pd.DataFrame) else quadro.nbytes
+               for quadro in distintos)
+
+
+class CacheDados:
+    # Cache LRU compartilhado pelo processo (e portanto por todas as sessões do Streamlit).
+    # Cada entrada guarda a assinatura das fontes usadas para construí-la; uma assinatura
+    # diferente invalida apenas aquela entrada. O total de bytes é limitado por `limite_bytes`.
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._total_bytes = 0
+        self._trava = threading.Lock()
+        # Chave em construção -> [trava, sessões usando a trava]; a entrada sai ao fim da última construção
+        self._construcoes = {}
+
+    def obter(self, chave, assinatura, construir):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == assinatura:
+                self._itens.move_to_end(chave)
+                return item[1]
+            construcao = self._construcoes.setdefault(chave, [threading.Lock(), 0])
+            construcao[1] += 1
+
+        # Apenas uma sessão constrói cada chave; as demais aguardam e reaproveitam o resultado
+        try:
+            with construcao[0]:
+                with self._trava:
+                    item = self._itens.get(chave)
+                    if item is not None and item[0] == assinatura:
+                        self._itens.move_to_end(chave)
+                        return item[1]
+                valor = construir()
+                tamanho = _tamanho_em_bytes(valor)
+                with self._trava:
+                    self._descartar(chave)
+                    self._itens[chave] = (assinatura, valor, tamanho)
+                    self._total_bytes += tamanho
+                    self._aplicar_limite()
+                return valor
+        finally:
+            # As travas existem apenas durante a construção: chaves vindas de fora (como os caminhos
+            # pedidos à API) não deixam uma trava para trás
+            with self._trava:
+                construcao[1] -= 1
+                if not construcao[1]:
+                    del self._construcoes[chave]
+
+    def atual(self, chave, assinatura):
+        # Indica se a chave está no cache com a assinatura informada
+        with self._trava:
+            item = self._itens.get(chave)
+            return item is not None and item[0] == assinatura
+
+    def invalidar(self, chave=None):
+        # Remove uma entrada específica ou, sem argumento, esvazia o cache
+        with self._trava:
+            if chave is None:
+                self._itens.clear()
+                self._total_bytes = 0
+            else:
+                self._descartar(chave)
+
+    def exportar(self):
+        # Entradas (chave, assinatura, valor) da menos para a mais recentemente usada
+        with self._trava:
+            return [(chave, assinatura, valor) for chave, (assinatura, valor, _) in self._itens.items()]
+
+    def restaurar(self, itens):
+        # Inclui entradas exportadas por outro processo como as menos recentes, sem substituir as já
+        # construídas neste
+        with self._trava:
+            for chave, assinatura, valor in reversed(itens):
+                if chave in self._itens:
+                    continue
+                tamanho = _tamanho_em_bytes(valor)
+                self._itens[chave] = (assinatura, valor, tamanho)
+                self._itens.move_to_end(chave, last=False)
+                self._total_bytes += tamanho
+            self._aplicar_limite()
+
+    def _descartar(self, chave):
+        item = self._itens.pop(chave, None)
+        if item is not None:
+            self._total_bytes -= item[2]
+
+    def _aplicar_limite(self):
+        # Remove as entradas menos usadas até caber no limite (a mais recente é sempre mantida)
+        while self._total_bytes > self.limite_bytes and len(self._itens) > 1:
+            _, (_, _, tamanho) = self._itens.popitem(last=False)
+            self._total_bytes -= tamanho
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    def __len__(self):
+        return len(self._itens)
+
+
+CACHE = CacheDados(LIMITE_CACHE_MB * 1024 * 1024)
+METRICAS.registrar_medidor('relorc_cache_bytes', 'Bytes ocupados pelo cache de dados', lambda: CACHE.total_bytes)
+METRICAS.registrar_medidor('relorc_cache_entradas', 'Entradas no cache de dados', lambda: len(CACHE))
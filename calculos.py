@@ -0,0 +1,70 @@
+import pandas as pd
+
+from limpeza import normalizar_texto
+
+# Conta de referência de cada página de evolução e quantas contas do topo (a própria conta de referência
+# e as totalizadoras) ficam fora do quadro de participação no último ano
+QUADRO_ULTIMO_ANO = {
+    'receitas': (normalizar_texto('RECEITA CORRENTE LÍQUIDA (III) = (I - II)'), 4),
+    'despesas': (normalizar_texto('DESPESAS (EXCETO INTRA-ORÇAMENTÁRIAS) (I)'), 1),
+}
+
+
+def valores_referencia(df, conta_referencia, chaves=('Ano',)):
+    # Valor da conta de referência em cada ano (primeira ocorrência do ano, como no cálculo original)
+    referencia = df[df['Conta_Normalizada'] == conta_referencia]
+    return referencia.drop_duplicates(list(chaves)).set_index(list(chaves))['Valor']
+
+
+def calcular_participacao(df, conta_referencia, chaves=('Ano',)):
+    # Participação percentual de todas as contas sobre a conta de referência do mesmo ano.
+    # Anos sem a conta de referência (ou valores ausentes) resultam em NaN.
+    # Com chaves=('UF', 'Instituição', 'Ano') o cálculo vale para várias instituições de uma vez.
+    referencia = valores_referencia(df, conta_referencia, chaves)
+    if len(chaves) == 1:
+        posicoes = pd.Index(df[chaves[0]])
+    else:
+        posicoes = pd.MultiIndex.from_frame(df[list(chaves)])
+    denominador = referencia.reindex(posicoes).to_numpy()
+    return df['Valor'] / denominador * 100
+
+
+def tabela_ultimo_ano(df, conta_referencia, descartar, chaves=('UF', 'Instituição')):
+    # Quadro do último ano de cada instituição: contas do ano mais recente ordenadas pela participação
+    # sobre a conta de referência, sem as `descartar` primeiras (as próprias contas totalizadoras).
+    # Cada instituição tem ao menos uma linha com o ano, a população de 2023 e a indicação de que a
+    # conta de referência existe no último ano; instituições sem contas a exibir ficam com 'Conta' vazia.
+    chaves = list(chaves)
+    populacao = {}
+    if 'População' in df.columns:
+        # Na página, a população é a da primeira linha de 2023 da instituição
+        primeiras = df[df['Ano'] == 2023].drop_duplicates(chaves)
+        populacao = dict(zip(map(tuple, primeiras[chaves].to_numpy()), primeiras['População']))
+
+    df = df[df['Ano'] == df.groupby(chaves, observed=True, sort=False)['Ano'].transform('max')]
+    percentual = calcular_participacao(df, conta_referencia, chaves + ['Ano']).to_numpy()
+    referencia = (df['Conta_Normalizada'] == conta_referencia).to_numpy()
+    contas = df['Conta'].astype(object).to_numpy()
+
+    linhas = []
+    for chave, posicoes in df.groupby(chaves, observed=True, sort=False).indices.items():
+        chave = chave if isinstance(chave, tuple) else (chave,)
+        ano = int(df['Ano'].iat[posicoes[0]])
+        tem_referencia = bool(referencia[posicoes].any())
+        restantes = []
+        if tem_referencia:
+            # Mesma ordenação da página (sort_values decrescente), inclusive para percentuais empatados
+            ordem = pd.Series(percentual[posicoes]).sort_values(ascending=False).index[descartar:]
+            restantes = posicoes[ordem]
+        comuns = (*chave, ano, populacao.get(chave), tem_referencia)
+        if len(restantes):
+            linhas.extend((*comuns, contas[posicao], percentual[posicao]) for posicao in restantes)
+        else:
+            linhas.append((*comuns, None, float('nan')))
+
+    colunas = chaves + ['Ano', 'População', 'Referencia', 'Conta', 'Percentual']
+    tabela = pd.DataFrame(linhas, columns=colunas)
+    for coluna in chaves + ['Conta']:
+        tabela[coluna] = tabela[coluna].astype('category')
+    tabela['População'] = pd.to_numeric(tabela['População'], errors='coerce')
+    return tabela
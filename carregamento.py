@@ -0,0 +1,617 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+from cache import CACHE
+from calculos import QUADRO_ULTIMO_ANO
+from comparacao import PivoComparacao
+from indices import (IndiceParticionado, IndiceRankings, IndiceRelatorio, IndiceSiconfi, IndiceUltimoAno,
+                     UltimoAnoSiconfi, ordenar_siconfi)
+from metricas import etapa, medir
+from limpeza import (COLUNAS_CATEGORICAS, ESQUEMA_SICONFI, blocos_siconfi, ler_csv_limpo, tipar_siconfi,
+                     unificar_categorias)
+from rankings import INDICADORES_CAPAG, construir_rankings
+
+# Caminhos padrão das fontes de dados
+CAMINHO_DESP = './Despesas/'
+CAMINHO_REC = './Receitas/'
+ARQUIVO_REC_DESP = 'rec_desp_full.xlsx'
+ARQUIVO_CAPAG = 'capag_full.xlsx'
+
+# Pasta com os snapshots colunares gerados por `python ingestao.py`
+CAMINHO_SNAPSHOTS = './dados/'
+
+# Processos usados para ler os CSVs ainda não processados (1 = leitura sequencial)
+PROCESSOS_INGESTAO = int(os.environ.get('RELORC_PROCESSOS', '1'))
+
+
+def assinatura_arquivo(caminho):
+    # Caminho, data de modificação e tamanho identificam a versão de um arquivo
+    info = os.stat(caminho)
+    return (caminho, info.st_mtime_ns, info.st_size)
+
+
+def _ler_em_paralelo(arquivos, processos):
+    # Cada processo lê e limpa arquivos inteiros; apenas os DataFrames resultantes voltam ao processo principal
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return dict(zip(arquivos, executor.map(ler_csv_limpo, arquivos)))
+
+
+def construir_siconfi(caminho, processos=None):
+    # Carregar e concatenar todos os arquivos CSV da pasta. Apenas o conjunto concatenado fica no cache:
+    # guardar também cada arquivo limpo dobraria a memória ocupada pelos mesmos dados. Um arquivo novo
+    # ou alterado faz a pasta ser lida de novo; para reprocessar apenas os arquivos alterados, use as
+    # partições geradas por `python ingestao.py`
+    processos = processos or PROCESSOS_INGESTAO
+    arquivos = sorted(glob.glob(os.path.join(caminho, '*.csv')))
+    if processos > 1 and len(arquivos) > 1:
+        lidos = _ler_em_paralelo(arquivos, processos)
+        dfs = [lidos.pop(arquivo) for arquivo in arquivos]
+    else:
+        dfs = [ler_csv_limpo(arquivo) for arquivo in arquivos]
+    df = pd.concat(unificar_categorias(dfs), ignore_index=True)
+    del dfs
+    return ordenar_siconfi(tipar_siconfi(df)).reset_index(drop=True)
+
+
+def carregar_siconfi(caminho):
+    arquivos = sorted(glob.glob(os.path.join(caminho, '*.csv')))
+    assinatura = tuple(assinatura_arquivo(arquivo) for arquivo in arquivos)
+    return CACHE.obter(('siconfi', caminho), assinatura, lambda: construir_siconfi(caminho))
+
+
+@medir('ler_excel')
+def ler_rec_desp(arquivo):
+    df = pd.read_excel(arquivo)
+    # Convertendo colunas para string
+    df['id_municipio'] = df['id_municipio'].astype(str)
+    df['ano'] = df['ano'].astype(str)
+    return df
+
+
+def tipar_capag(df):
+    # Indicadores numéricos: 'n.d.' (não disponível) vira NaN e só volta a ser 'n.d.' na exibição da tabela
+    indicadores = [coluna for coluna in INDICADORES_CAPAG if not pd.api.types.is_float_dtype(df[coluna])]
+    if indicadores:
+        df = df.assign(**{coluna: pd.to_numeric(df[coluna], errors='coerce').astype('float64')
+                          for coluna in indicadores})
+    return df
+
+
+@medir('ler_excel')
+def ler_capag(arquivo):
+    df = pd.read_excel(arquivo)
+    # Convertendo colunas para string
+    df['cod'] = df['cod'].astype(str)
+    df['ano'] = df['ano'].astype(str)
+    return tipar_capag(df)
+
+
+def carregar_excel(arquivo, ler):
+    return CACHE.obter(('xlsx', arquivo), assinatura_arquivo(arquivo), lambda: ler(arquivo))
+
+
+def caminho_snapshot(nome, pasta=CAMINHO_SNAPSHOTS):
+    return os.path.join(pasta, nome + '.feather')
+
+
+def salvar_snapshot(df, nome, pasta=CAMINHO_SNAPSHOTS):
+    # Arrow IPC sem compressão, para que a leitura possa mapear o arquivo em memória
+    os.makedirs(pasta, exist_ok=True)
+    destino = caminho_snapshot(nome, pasta)
+    temporario = destino + '.tmp'
+    df = df.reset_index(drop=True)
+    # Colunas que ainda tenham tipos misturados são gravadas como texto (o Arrow exige um único tipo);
+    # as colunas numéricas das planilhas já chegam aqui convertidas pelas funções de leitura
+    for coluna in df.columns[df.dtypes == object]:
+        df[coluna] = df[coluna].astype(str)
+    df.to_feather(temporario, compression='uncompressed')
+    os.replace(temporario, destino)
+    return destino
+
+
+@medir('ler_snapshot')
+def ler_snapshot(caminho):
+    # O arquivo é mapeado em memória em vez de lido por completo
+    return feather.read_table(caminho, memory_map=True).to_pandas()
+
+
+def caminho_particoes(nome, pasta=CAMINHO_SNAPSHOTS):
+    return os.path.join(pasta, nome)
+
+
+# Manifesto dos CSVs já incorporados às partições de cada conjunto (dados/<nome>/manifesto.json)
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+
+def hash_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def ler_manifesto(nome, pasta=CAMINHO_SNAPSHOTS):
+    caminho = os.path.join(caminho_particoes(nome, pasta), ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _gravar_manifesto(manifesto, pasta_particoes):
+    caminho = os.path.join(pasta_particoes, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _arquivos_alterados(arquivos, registrados):
+    # Compara os CSVs da pasta com o manifesto. O hash só é calculado quando tamanho ou data de
+    # modificação mudaram; um arquivo regravado com o mesmo conteúdo não é processado de novo.
+    atuais, pendentes = {}, []
+    for arquivo in arquivos:
+        base = os.path.basename(arquivo)
+        info = os.stat(arquivo)
+        registro = registrados.get(base)
+        if registro and (registro['tamanho'], registro['modificado']) == (info.st_size, info.st_mtime_ns):
+            atuais[base] = registro
+            continue
+        resumo = hash_arquivo(arquivo)
+        if registro and registro['hash'] == resumo:
+            atuais[base] = dict(registro, modificado=info.st_mtime_ns)
+            continue
+        atuais[base] = {'caminho': arquivo, 'tamanho': info.st_size, 'modificado': info.st_mtime_ns,
+                        'hash': resumo, 'particoes': []}
+        pendentes.append(arquivo)
+    return atuais, pendentes
+
+
+def _chave_particao(chave, por_ano):
+    # Partição por UF ou, com `por_ano`, por UF e ano
+    return (chave[0], int(chave[1])) if por_ano else (chave[0],)
+
+
+def _local_particao(pasta_particoes, chave):
+    # Pasta da UF e nome do arquivo da partição
+    return os.path.join(pasta_particoes, chave[0]), str(chave[1]) if len(chave) > 1 else 'todos'
+
+
+def _regravar_em_memoria(trabalho, pendentes, atuais, descartados, afetadas, ordem, por_ano, processos):
+    # Cada CSV pendente é lido por inteiro e cada partição afetada é montada em memória e regravada
+    if processos > 1 and len(pendentes) > 1:
+        lidos = _ler_em_paralelo(pendentes, processos)
+    else:
+        lidos = {arquivo: ler_csv_limpo(arquivo) for arquivo in pendentes}
+    novos = {}
+    for arquivo, df in lidos.items():
+        base = os.path.basename(arquivo)
+        df = df.assign(Arquivo=pd.Categorical([base] * len(df)))
+        for chave, grupo in df.groupby(['UF', 'Ano'] if por_ano else ['UF'], observed=True):
+            chave = _chave_particao(chave, por_ano)
+            novos.setdefault(chave, []).append(grupo)
+            atuais[base]['particoes'].append(list(chave))
+            afetadas.add(chave)
+
+    for chave in sorted(afetadas):
+        pasta_uf, nome_particao = _local_particao(trabalho, chave)
+        arquivo_particao = caminho_snapshot(nome_particao, pasta_uf)
+        partes = []
+        if os.path.exists(arquivo_particao):
+            existente = ler_snapshot(arquivo_particao)
+            partes.append(existente[~existente['Arquivo'].isin(descartados)])
+        partes.extend(novos.get(chave, []))
+        partes = [parte for parte in partes if len(parte)]
+        if not partes:
+            os.remove(arquivo_particao)
+            if not os.listdir(pasta_uf):
+                os.rmdir(pasta_uf)
+            continue
+        df = pd.concat(unificar_categorias(partes, COLUNAS_CATEGORICAS + ['Arquivo']), ignore_index=True)
+        df['_ordem'] = df['Arquivo'].astype(str).map(ordem)
+        df = df.sort_values(['UF', 'Instituição', '_ordem'], kind='stable').drop(columns='_ordem')
+        salvar_snapshot(_remover_categorias_vazias(df), nome_particao, pasta_uf)
+
+
+# Esquema das partições gravadas em blocos: os inteiros são gravados como float, já que um bloco pode ter
+# valores ausentes; os tipos compactos são aplicados na leitura por tipar_siconfi
+_TIPOS_BLOCOS = {'category': pa.dictionary(pa.int32(), pa.string()), 'int32': pa.float64(), 'int16': pa.int16(),
+                 'float64': pa.float64()}
+ESQUEMA_BLOCOS = pa.schema([(coluna, _TIPOS_BLOCOS[tipo]) for coluna, tipo in ESQUEMA_SICONFI.items()] +
+                           [('Arquivo', _TIPOS_BLOCOS['category'])])
+
+
+class GravadorParticao:
+    # Grava uma partição (Arrow IPC, o mesmo formato do Feather) bloco a bloco. Cada coluna categórica
+    # usa um dicionário que só cresce, e cada bloco acrescenta ao arquivo apenas as categorias novas
+    # (delta de dicionário); nenhum bloco já gravado é mantido em memória.
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.linhas = 0
+        self._codigos = {campo.name: {} for campo in ESQUEMA_BLOCOS if pa.types.is_dictionary(campo.type)}
+        self._arquivo = pa.OSFile(caminho + '.tmp', 'wb')
+        self._gravador = pa.ipc.new_file(self._arquivo, ESQUEMA_BLOCOS,
+                                         options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def _coluna(self, campo, df):
+        if campo.name not in df.columns:
+            return pa.nulls(len(df), campo.type)
+        if campo.name not in self._codigos:
+            valores = pd.to_numeric(df[campo.name], errors='coerce').to_numpy(dtype=campo.type.to_pandas_dtype())
+            return pa.array(valores, type=campo.type, from_pandas=True)
+        codigos = self._codigos[campo.name]
+        posicoes, unicos = pd.factorize(df[campo.name])
+        # O código -1 (valor ausente) aponta para o último elemento e é mascarado
+        indices = np.array([codigos.setdefault(valor, len(codigos)) for valor in unicos] + [0], dtype='int32')
+        indices = pa.array(indices[posicoes], mask=posicoes < 0)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(list(codigos), pa.string()))
+
+    def gravar(self, df):
+        if len(df):
+            self._gravador.write_batch(pa.record_batch([self._coluna(campo, df) for campo in ESQUEMA_BLOCOS],
+                                                       schema=ESQUEMA_BLOCOS))
+            self.linhas += len(df)
+
+    def fechar(self):
+        # Conclui o arquivo; uma partição sem linhas não é gravada
+        self._gravador.close()
+        self._arquivo.close()
+        if self.linhas:
+            os.replace(self.caminho + '.tmp', self.caminho)
+            return True
+        os.remove(self.caminho + '.tmp')
+        return False
+
+
+def _caminho_bloco(pasta, base, chave):
+    return os.path.join(pasta, '.'.join([base, *map(str, chave)]) + '.feather')
+
+
+def _gravar_blocos_arquivo(arquivo, pasta, por_ano, linhas_por_bloco):
+    # Lê um CSV em blocos e grava as linhas de cada partição em um arquivo provisório do próprio CSV.
+    # Também é executada pelos processos da ingestão paralela; devolve as partições encontradas.
+    base = os.path.basename(arquivo)
+    gravadores = {}
+    for bloco in blocos_siconfi(arquivo, linhas_por_bloco):
+        bloco['Arquivo'] = base
+        for chave, grupo in bloco.groupby(['UF', 'Ano'] if por_ano else ['UF'], sort=False):
+            chave = _chave_particao(chave, por_ano)
+            if chave not in gravadores:
+                gravadores[chave] = GravadorParticao(_caminho_bloco(pasta, base, chave))
+            gravadores[chave].gravar(grupo)
+    for gravador in gravadores.values():
+        gravador.fechar()
+    return list(gravadores)
+
+
+def _lotes_arquivo(caminho):
+    # Lotes de um arquivo Arrow lidos um de cada vez, sem mapear o arquivo inteiro em memória
+    with pa.OSFile(caminho) as origem:
+        leitor = pa.ipc.open_file(origem)
+        for posicao in range(leitor.num_record_batches):
+            yield leitor.get_batch(posicao)
+
+
+def _lotes_mantidos(caminho, bases):
+    # Linhas da partição anterior vindas dos CSVs em `bases`, um lote de cada vez
+    valores = pa.array(sorted(bases), pa.string())
+    for lote in _lotes_arquivo(caminho):
+        arquivo = lote.column(lote.schema.get_field_index('Arquivo'))
+        if pa.types.is_dictionary(arquivo.type):
+            filtro = pc.take(pc.is_in(arquivo.dictionary, value_set=valores), arquivo.indices)
+        else:
+            filtro = pc.is_in(arquivo, value_set=valores)
+        yield lote.filter(filtro).to_pandas()
+
+
+def _regravar_em_blocos(trabalho, pendentes, atuais, descartados, afetadas, ordem, por_ano, processos,
+                        linhas_por_bloco):
+    # Cada CSV pendente é lido em blocos e suas linhas vão para arquivos provisórios (um por CSV e partição);
+    # depois cada partição afetada é regravada lote a lote a partir da partição anterior e desses arquivos.
+    # Nem um CSV nem uma partição inteira ficam em memória: nesta etapa, o pico depende apenas do tamanho do
+    # bloco (as tabelas derivadas calculadas depois, em ingestao.py, leem uma UF inteira de cada vez).
+    provisoria = trabalho + '.blocos'
+    shutil.rmtree(provisoria, ignore_errors=True)
+    os.makedirs(provisoria)
+    if processos > 1 and len(pendentes) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            futuros = [executor.submit(_gravar_blocos_arquivo, arquivo, provisoria, por_ano, linhas_por_bloco)
+                       for arquivo in pendentes]
+            chaves = [futuro.result() for futuro in futuros]
+    else:
+        chaves = [_gravar_blocos_arquivo(arquivo, provisoria, por_ano, linhas_por_bloco) for arquivo in pendentes]
+
+    novos = {}
+    for arquivo, chaves_arquivo in zip(pendentes, chaves):
+        base = os.path.basename(arquivo)
+        for chave in chaves_arquivo:
+            novos.setdefault(chave, set()).add(base)
+            atuais[base]['particoes'].append(list(chave))
+            afetadas.add(chave)
+
+    for chave in sorted(afetadas):
+        pasta_uf, nome_particao = _local_particao(trabalho, chave)
+        arquivo_particao = caminho_snapshot(nome_particao, pasta_uf)
+        existente = os.path.exists(arquivo_particao)
+
+        # Trechos da partição na ordem dos CSVs: CSVs inalterados seguidos são copiados da partição
+        # anterior em uma única passada; os CSVs novos ou alterados vêm dos arquivos provisórios
+        trechos = []
+        for base in sorted(atuais, key=ordem.get):
+            if base in novos.get(chave, ()):
+                trechos.append(('novo', base))
+            elif existente and base not in descartados and list(chave) in atuais[base]['particoes']:
+                if trechos and trechos[-1][0] == 'mantidos':
+                    trechos[-1][1].add(base)
+                else:
+                    trechos.append(('mantidos', {base}))
+
+        os.makedirs(pasta_uf, exist_ok=True)
+        gravador = GravadorParticao(arquivo_particao)
+        for tipo, bases in trechos:
+            if tipo == 'mantidos':
+                lotes = _lotes_mantidos(arquivo_particao, bases)
+            else:
+                lotes = (lote.to_pandas() for lote in _lotes_arquivo(_caminho_bloco(provisoria, bases, chave)))
+            for lote in lotes:
+                gravador.gravar(lote)
+        if not gravador.fechar():
+            if os.path.exists(arquivo_particao):
+                os.remove(arquivo_particao)
+            if not os.listdir(pasta_uf):
+                os.rmdir(pasta_uf)
+    shutil.rmtree(provisoria)
+
+
+def atualizar_particoes(caminho, nome, pasta=CAMINHO_SNAPSHOTS, por_ano=False, processos=None, completo=False,
+                        linhas_por_bloco=None):
+    # Ingestão incremental dos CSVs de uma pasta nas partições por UF (dados/<nome>/<UF>/).
+    # Cada linha gravada guarda o arquivo de origem (coluna 'Arquivo', descartada na leitura pela
+    # aplicação); apenas os arquivos novos ou alterados desde o manifesto são lidos, e apenas as
+    # partições em que eles aparecem (antes ou depois da alteração) são regravadas. Com `linhas_por_bloco`,
+    # os CSVs são lidos e as partições gravadas em blocos, com memória limitada pelo tamanho do bloco.
+    destino = caminho_particoes(nome, pasta)
+    manifesto = None if completo else ler_manifesto(nome, pasta)
+    reconstruir = manifesto is None or manifesto['por_ano'] != por_ano or not os.path.isdir(destino)
+    if reconstruir:
+        # Primeira ingestão, partições sem manifesto, mudança de layout ou reconstrução pedida:
+        # o conjunto é montado em um diretório temporário e substitui o anterior de uma só vez
+        manifesto = {'por_ano': por_ano, 'arquivos': {}}
+    trabalho = destino + '.tmp' if reconstruir else destino
+    if reconstruir:
+        shutil.rmtree(trabalho, ignore_errors=True)
+    os.makedirs(trabalho, exist_ok=True)
+
+    registrados = manifesto['arquivos']
+    arquivos = sorted(glob.glob(os.path.join(caminho, '*.csv')))
+    atuais, pendentes = _arquivos_alterados(arquivos, registrados)
+    removidos = set(registrados) - set(atuais)
+    descartados = removidos | ({os.path.basename(arquivo) for arquivo in pendentes} & set(registrados))
+
+    # Partições afetadas: onde estavam as linhas descartadas e onde entram as linhas novas
+    afetadas = {tuple(chave) for base in descartados for chave in registrados[base]['particoes']}
+    processos = processos or PROCESSOS_INGESTAO
+    # Dentro de cada instituição, as linhas seguem a ordem dos arquivos, como na leitura completa
+    ordem = {os.path.basename(arquivo): posicao for posicao, arquivo in enumerate(arquivos)}
+    if linhas_por_bloco:
+        _regravar_em_blocos(trabalho, pendentes, atuais, descartados, afetadas, ordem, por_ano, processos,
+                            linhas_por_bloco)
+    else:
+        _regravar_em_memoria(trabalho, pendentes, atuais, descartados, afetadas, ordem, por_ano, processos)
+
+    manifesto['arquivos'] = atuais
+    _gravar_manifesto(manifesto, trabalho)
+
+    if reconstruir:
+        antigo = destino + '.old'
+        if os.path.isdir(destino):
+            os.replace(destino, antigo)
+        os.replace(trabalho, destino)
+        shutil.rmtree(antigo, ignore_errors=True)
+
+    # O snapshot único de versões anteriores deixa de ser usado
+    if os.path.exists(caminho_snapshot(nome, pasta)):
+        os.remove(caminho_snapshot(nome, pasta))
+
+    print(f"{nome}: {len(pendentes)} arquivo(s) novo(s) ou alterado(s), {len(removidos)} removido(s), "
+          f"{len(afetadas)} partição(ões) regravada(s)")
+    return destino
+
+
+def _remover_categorias_vazias(df):
+    # Cada partição guarda apenas as categorias que usa (ex.: as instituições da própria UF)
+    df = df.copy()
+    for coluna in df.columns[df.dtypes == 'category']:
+        df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
+
+
+def ufs_particionadas(nome, pasta=CAMINHO_SNAPSHOTS):
+    caminho = caminho_particoes(nome, pasta)
+    if not os.path.isdir(caminho):
+        return []
+    return sorted(uf for uf in os.listdir(caminho) if os.path.isdir(os.path.join(caminho, uf)))
+
+
+def _ler_particoes(arquivos):
+    df = pd.concat([ler_snapshot(arquivo) for arquivo in arquivos], ignore_index=True)
+    # Categorias diferentes entre os arquivos são unificadas e a ordem por UF e Instituição é refeita
+    return ordenar_siconfi(tipar_siconfi(df)).reset_index(drop=True)
+
+
+def ler_todas_particoes(nome, pasta=CAMINHO_SNAPSHOTS):
+    return _ler_particoes(sorted(glob.glob(os.path.join(caminho_particoes(nome, pasta), '*', '*.feather'))))
+
+
+def ler_particoes_por_uf(nome, pasta=CAMINHO_SNAPSHOTS):
+    # Uma UF de cada vez, para percorrer o conjunto sem mantê-lo inteiro em memória
+    for uf in ufs_particionadas(nome, pasta):
+        yield _ler_particoes(sorted(glob.glob(os.path.join(caminho_particoes(nome, pasta), uf, '*.feather'))))
+
+
+def _carregar_particoes(nome, ufs):
+    arquivos = [arquivo for uf in ufs
+                for arquivo in sorted(glob.glob(os.path.join(caminho_particoes(nome), uf, '*.feather')))]
+    assinatura = tuple(assinatura_arquivo(arquivo) for arquivo in arquivos)
+    return CACHE.obter(('particoes', nome, tuple(ufs)), assinatura, lambda: _ler_particoes(arquivos))
+
+
+def carregar_particao(nome, uf):
+    # Apenas a UF consultada é lida e indexada; as demais UFs não ocupam memória
+    return carregar_indice((nome, uf), _carregar_particoes(nome, [uf]))
+
+
+def assinatura_fonte(nome, arquivo):
+    # Assinatura do arquivo que será efetivamente lido: o snapshot, se existir, ou a fonte original
+    snapshot = caminho_snapshot(nome)
+    return assinatura_arquivo(snapshot if os.path.exists(snapshot) else arquivo)
+
+
+def assinatura_siconfi(nome, caminho, uf=None):
+    # Assinatura dos arquivos lidos para o conjunto do Siconfi: as partições (apenas as da UF, se
+    # informada), o snapshot ou os CSVs originais, na mesma ordem de preferência do carregamento
+    if ufs_particionadas(nome):
+        arquivos = sorted(glob.glob(os.path.join(caminho_particoes(nome), uf or '*', '*.feather')))
+    elif os.path.exists(caminho_snapshot(nome)):
+        arquivos = [caminho_snapshot(nome)]
+    else:
+        arquivos = sorted(glob.glob(os.path.join(caminho, '*.csv')))
+    return tuple(assinatura_arquivo(arquivo) for arquivo in arquivos)
+
+
+def _carregar(nome, carregar_fonte, tipar=None):
+    # Usa as partições por UF ou o snapshot colunar quando existirem; caso contrário, lê as fontes originais.
+    # `tipar` aplica ao snapshot os mesmos tipos da leitura original (snapshots gravados por versões
+    # anteriores da ingestão podem ter colunas como texto)
+    ufs = ufs_particionadas(nome)
+    if ufs:
+        return _carregar_particoes(nome, ufs)
+    snapshot = caminho_snapshot(nome)
+    if os.path.exists(snapshot):
+        return CACHE.obter(('snapshot', snapshot), assinatura_arquivo(snapshot),
+                           lambda: ler_snapshot(snapshot) if tipar is None else tipar(ler_snapshot(snapshot)))
+    return carregar_fonte()
+
+
+def carregar_despesas(caminho=CAMINHO_DESP):
+    return _carregar('despesas', lambda: carregar_siconfi(caminho))
+
+
+def carregar_receitas(caminho=CAMINHO_REC):
+    return _carregar('receitas', lambda: carregar_siconfi(caminho))
+
+
+def carregar_indice(nome, df, classe=IndiceSiconfi):
+    # O índice guarda uma referência ao DataFrame de origem, então o id não é reaproveitado
+    # por outro objeto enquanto a entrada estiver no cache
+    return CACHE.obter(('indice', nome), id(df), lambda: classe(df))
+
+
+def _carregar_indice_siconfi(nome, carregar_fonte):
+    # Com partições por UF, cada UF é carregada apenas quando consultada pela página
+    ufs = ufs_particionadas(nome)
+    if ufs:
+        return IndiceParticionado(ufs, lambda uf: carregar_particao(nome, uf))
+    return carregar_indice(nome, carregar_fonte())
+
+
+def carregar_indice_despesas(caminho=CAMINHO_DESP):
+    return _carregar_indice_siconfi('despesas', lambda: carregar_despesas(caminho))
+
+
+def carregar_indice_receitas(caminho=CAMINHO_REC):
+    return _carregar_indice_siconfi('receitas', lambda: carregar_receitas(caminho))
+
+
+def carregar_ultimo_ano(nome, carregar_indice_siconfi):
+    # Gerado por `python ingestao.py`; sem o snapshot, o quadro de cada instituição é calculado na consulta
+    snapshot = caminho_snapshot('ultimo_ano_' + nome)
+    if os.path.exists(snapshot):
+        df = CACHE.obter(('snapshot', snapshot), assinatura_arquivo(snapshot), lambda: ler_snapshot(snapshot))
+        return carregar_indice(('ultimo_ano', nome), df, IndiceUltimoAno)
+    return UltimoAnoSiconfi(carregar_indice_siconfi(), *QUADRO_ULTIMO_ANO[nome])
+
+
+def carregar_ultimo_ano_despesas(caminho=CAMINHO_DESP):
+    return carregar_ultimo_ano('despesas', lambda: carregar_indice_despesas(caminho))
+
+
+def carregar_ultimo_ano_receitas(caminho=CAMINHO_REC):
+    return carregar_ultimo_ano('receitas', lambda: carregar_indice_receitas(caminho))
+
+
+def carregar_rec_desp(arquivo=ARQUIVO_REC_DESP):
+    return _carregar('rec_desp', lambda: carregar_excel(arquivo, ler_rec_desp))
+
+
+def carregar_capag(arquivo=ARQUIVO_CAPAG):
+    return _carregar('capag', lambda: carregar_excel(arquivo, ler_capag), tipar_capag)
+
+
+def carregar_relatorio(arquivo_rec_desp=ARQUIVO_REC_DESP, arquivo_capag=ARQUIVO_CAPAG):
+    # Receitas/despesas e CAPAG unidas pelo código do município; o índice guarda as duas tabelas de origem
+    rec_desp, capag = carregar_rec_desp(arquivo_rec_desp), carregar_capag(arquivo_capag)
+    return CACHE.obter(('indice', 'relatorio'), (id(rec_desp), id(capag)),
+                       lambda: IndiceRelatorio(rec_desp, capag))
+
+
+def carregar_comparacao(arquivo_rec_desp=ARQUIVO_REC_DESP, arquivo_capag=ARQUIVO_CAPAG):
+    # Pivô município x ano x métrica das duas planilhas, montado uma vez e compartilhado pelas sessões
+    rec_desp, capag = carregar_rec_desp(arquivo_rec_desp), carregar_capag(arquivo_capag)
+    return CACHE.obter(('indice', 'comparacao'), (id(rec_desp), id(capag)),
+                       lambda: PivoComparacao(rec_desp, capag))
+
+
+def carregar_rankings(arquivo_rec_desp=ARQUIVO_REC_DESP, arquivo_capag=ARQUIVO_CAPAG):
+    # Gerado por `python ingestao.py`; sem o snapshot, os rankings das planilhas são calculados aqui
+    # (as participações na RCL dependem dos CSVs do Siconfi e só existem no snapshot)
+    assinatura = (assinatura_fonte('rec_desp', arquivo_rec_desp), assinatura_fonte('capag', arquivo_capag))
+    return _carregar('rankings', lambda: CACHE.obter(
+        ('rankings',), assinatura,
+        lambda: construir_rankings(carregar_rec_desp(arquivo_rec_desp), carregar_capag(arquivo_capag))))
+
+
+def carregar_indice_rankings():
+    return carregar_indice('rankings', carregar_rankings(), IndiceRankings)
+
+
+# Registro dos conjuntos de dados disponíveis para as páginas
+CONJUNTOS = {
+    'despesas': carregar_indice_despesas,
+    'receitas': carregar_indice_receitas,
+    'ultimo_ano_despesas': carregar_ultimo_ano_despesas,
+    'ultimo_ano_receitas': carregar_ultimo_ano_receitas,
+    'rec_desp': carregar_rec_desp,
+    'capag': carregar_capag,
+    'relatorio': carregar_relatorio,
+    'comparacao': carregar_comparacao,
+    'rankings': carregar_indice_rankings,
+}
+
+
+class DadosPagina:
+    # Acesso preguiçoso aos conjuntos declarados por uma página: cada conjunto só é carregado
+    # no primeiro acesso e permanece no cache compartilhado para as próximas execuções
+
+    def __init__(self, nomes):
+        desconhecidos = set(nomes) - set(CONJUNTOS)
+        if desconhecidos:
+            raise KeyError(f"Conjuntos de dados desconhecidos: {', '.join(sorted(desconhecidos))}")
+        self.nomes = list(nomes)
+
+    def __getitem__(self, nome):
+        if nome not in self.nomes:
+            raise KeyError(f"O conjunto '{nome}' não foi declarado pela página")
+        with etapa('carregar', nome):
+            return CONJUNTOS[nome]()
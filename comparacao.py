@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from graficos import COLUNAS_DESPESA, COLUNAS_RECEITA
+from metricas import medir
+from rankings import INDICADORES_CAPAG
+
+# Número máximo de municípios comparados ao mesmo tempo
+MAXIMO_MUNICIPIOS = 6
+
+# Métricas numéricas do pivô: planilha de receitas/despesas e indicadores CAPAG
+METRICAS_REC_DESP = ['populacao', *COLUNAS_RECEITA, 'Receita_Total', *COLUNAS_DESPESA, 'Despesa_Total']
+METRICAS_PIVO = METRICAS_REC_DESP + INDICADORES_CAPAG
+
+# Notas CAPAG (texto), guardadas como códigos em um array paralelo
+NOTAS_CAPAG = ['Nota 1', 'Nota 2', 'Nota 3', 'CAPAG']
+
+
+class PivoComparacao:
+    # Receitas, despesas e indicadores CAPAG de todos os municípios em um único array contíguo
+    # (município x ano x métrica), montado uma vez a partir das duas planilhas. As notas CAPAG ficam
+    # em um array de códigos com as mesmas duas primeiras dimensões. Uma seleção de municípios é uma
+    # indexação por posições, sem filtrar DataFrames a cada município.
+
+    def __init__(self, rec_desp, capag):
+        self.origem = (rec_desp, capag)
+        municipios = rec_desp.drop_duplicates('id_municipio').sort_values(['uf', 'municipio'], kind='stable')
+        self.codigos = pd.Index(municipios['id_municipio'])
+        self.rotulos = (municipios['municipio'] + ' (' + municipios['uf'] + ')').tolist()
+        self._codigos = dict(zip(self.rotulos, self.codigos))
+        self._posicoes_codigos = {codigo: posicao for posicao, codigo in enumerate(self.codigos)}
+        self.anos = pd.Index(sorted(set(rec_desp['ano']) | set(capag['ano'])))
+        self.metricas = list(METRICAS_PIVO)
+
+        self.valores = np.full((len(self.codigos), len(self.anos), len(self.metricas)), np.nan)
+        self.notas = np.full((len(self.codigos), len(self.anos), len(NOTAS_CAPAG)), -1, dtype='int8')
+
+        municipio, ano, validos = self._posicoes(rec_desp['id_municipio'], rec_desp['ano'])
+        colunas = [coluna for coluna in METRICAS_REC_DESP if coluna in rec_desp.columns]
+        valores = rec_desp[colunas].to_numpy(dtype='float64')[validos]
+        self.valores[municipio[:, None], ano[:, None], self._indices(colunas)] = valores
+
+        municipio, ano, validos = self._posicoes(capag['cod'], capag['ano'])
+        # Indicadores não numéricos (ex.: 'n.d.') ficam como NaN, como nos rankings
+        indicadores = capag[INDICADORES_CAPAG].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+        self.valores[municipio[:, None], ano[:, None], self._indices(INDICADORES_CAPAG)] = indicadores[validos]
+        notas = capag[NOTAS_CAPAG].fillna('').astype(str)
+        self.categorias_notas = sorted(set(notas.to_numpy().ravel()) - {''})
+        codigos = np.column_stack([pd.Categorical(notas[coluna], categories=self.categorias_notas).codes
+                                   for coluna in NOTAS_CAPAG])
+        self.notas[municipio, ano] = codigos[validos]
+
+    def __sizeof__(self):
+        # Contado pelo limite de memória do cache de dados (as planilhas de origem já têm entrada própria)
+        return object.__sizeof__(self) + self.valores.nbytes + self.notas.nbytes
+
+    def _indices(self, metricas):
+        return [self.metricas.index(metrica) for metrica in metricas]
+
+    def _posicoes(self, codigos, anos):
+        # Posições (município, ano) de cada linha; linhas de municípios fora da planilha de
+        # receitas/despesas são descartadas
+        municipio = self.codigos.get_indexer(codigos)
+        ano = self.anos.get_indexer(anos)
+        validos = municipio >= 0
+        return municipio[validos], ano[validos], validos
+
+    def codigos_selecionados(self, rotulos):
+        return [self._codigos[rotulo] for rotulo in rotulos]
+
+    @medir('filtrar')
+    def selecao(self, codigos):
+        # Valores e notas dos municípios selecionados, na ordem da seleção
+        posicoes = [self._posicoes_codigos[codigo] for codigo in codigos]
+        return self.valores[posicoes], self.notas[posicoes]
+
+    def _rotulos(self, codigos):
+        return [self.rotulos[self._posicoes_codigos[codigo]] for codigo in codigos]
+
+    def longo(self, codigos, metricas, ano=None):
+        # Formato longo (Município, ano, Tipo, Valor) das métricas selecionadas, para os gráficos
+        valores, _ = self.selecao(codigos)
+        anos = list(self.anos)
+        if ano is not None:
+            valores = valores[:, [self.anos.get_loc(ano)]]
+            anos = [ano]
+        bloco = valores[:, :, self._indices(metricas)]
+        municipios, quantidade_anos, quantidade_metricas = bloco.shape
+        preenchidos = ~np.isnan(bloco.ravel())
+        return pd.DataFrame({
+            'Município': np.repeat(self._rotulos(codigos), quantidade_anos * quantidade_metricas)[preenchidos],
+            'ano': np.tile(np.repeat(anos, quantidade_metricas), municipios)[preenchidos],
+            'Tipo': np.tile(metricas, municipios * quantidade_anos)[preenchidos],
+            'Valor': bloco.ravel()[preenchidos],
+        })
+
+    def tabela_ano(self, codigos, ano):
+        # Uma linha por município com as métricas e as notas CAPAG do ano
+        valores, notas = self.selecao(codigos)
+        posicao = self.anos.get_loc(ano)
+        categorias = np.asarray(self.categorias_notas + [''], dtype=object)
+        colunas = {'Município': self._rotulos(codigos)}
+        colunas.update(zip(self.metricas, valores[:, posicao].T))
+        colunas.update(zip(NOTAS_CAPAG, categorias[notas[:, posicao].T]))
+        return pd.DataFrame(colunas)
@@ -0,0 +1,60 @@
+from calculos import QUADRO_ULTIMO_ANO
+from graficos import GRAFICOS, grafico_evolucao_conta, grafico_percentual
+from limpeza import normalizar_texto
+
+# Cálculos de uma seleção (UF, Instituição e Conta) das páginas de evolução. A página, a antecipação
+# das próximas seleções e a API usam as mesmas funções, então os resultados e as chaves do cache de
+# gráficos são idênticos.
+
+CONTA_RECEITA = QUADRO_ULTIMO_ANO['receitas'][0]
+CONTA_DESPESA = QUADRO_ULTIMO_ANO['despesas'][0]
+
+
+def contas_instituicao(df_instituicao):
+    # Opções da caixa de seleção de conta
+    return sorted(df_instituicao['Conta'].unique())
+
+
+def filtrar_conta(indice, uf, instituicao, conta, conta_referencia, coluna):
+    # Linhas de 2015-2023 da instituição com o percentual da conta selecionada sobre a conta de
+    # referência (NaN nas demais contas) e a série da conta selecionada
+    df_instituicao = indice.instituicao(uf, instituicao)
+    participacao = indice.participacao(uf, instituicao, conta_referencia)
+    conta_normalizada = normalizar_texto(conta)
+    df_filtrado = df_instituicao[df_instituicao['Ano'].between(2015, 2023)]
+    df_filtrado = df_filtrado.assign(**{coluna: participacao.loc[df_filtrado.index].where(
+        df_filtrado['Conta_Normalizada'] == conta_normalizada)})
+    df_evolucao_conta = df_filtrado[df_filtrado['Conta_Normalizada'] == conta_normalizada]
+    return df_filtrado, df_evolucao_conta
+
+
+def selecao_receita(pagina, indice, uf, instituicao, conta):
+    # Dados e gráficos da página Evolução da Receita (None quando não há dados para o gráfico)
+    df_filtrado, df_evolucao_conta = filtrar_conta(indice, uf, instituicao, conta, CONTA_RECEITA,
+                                                   'Percentual_Receita')
+    chart_conta = chart_percentual = None
+    if not df_evolucao_conta.empty:
+        chart_conta = GRAFICOS.obter((pagina, 'conta', uf, instituicao, conta), indice.indice_uf(uf),
+                                     lambda: grafico_evolucao_conta(df_evolucao_conta, conta))
+    if df_filtrado['Percentual_Receita'].notnull().sum() > 0:
+        chart_percentual = GRAFICOS.obter(
+            (pagina, 'percentual', uf, instituicao, conta), indice.indice_uf(uf),
+            lambda: grafico_percentual(df_filtrado, 'Percentual_Receita',
+                                       f'Percentual da {conta} sobre Receita Corrente Líquida'))
+    return df_filtrado, chart_conta, chart_percentual
+
+
+def selecao_despesa(pagina, indice, uf, instituicao, conta):
+    # Dados e gráficos da página Evolução da Despesa; como na versão original da página, o gráfico
+    # de evolução recebe as linhas de todas as contas do período
+    df_filtrado, _ = filtrar_conta(indice, uf, instituicao, conta, CONTA_DESPESA, 'Percentual_Despesa')
+    chart_conta = chart_percentual = None
+    if not df_filtrado.empty:
+        chart_conta = GRAFICOS.obter((pagina, 'conta', uf, instituicao, conta), indice.indice_uf(uf),
+                                     lambda: grafico_evolucao_conta(df_filtrado, conta))
+    if df_filtrado['Percentual_Despesa'].notnull().sum() > 0:
+        chart_percentual = GRAFICOS.obter(
+            (pagina, 'percentual', uf, instituicao, conta), indice.indice_uf(uf),
+            lambda: grafico_percentual(df_filtrado, 'Percentual_Despesa',
+                                       f'Percentual da {conta} sobre Despesa Corrente Líquida'))
+    return df_filtrado, chart_conta, chart_percentual
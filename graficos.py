@@ -0,0 +1,233 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+from metricas import METRICAS, etapa, medir
+
+# Número máximo de especificações de gráficos mantidas em memória (pode ser ajustado pela variável de ambiente)
+LIMITE_GRAFICOS = int(os.environ.get('RELORC_CACHE_GRAFICOS', '512'))
+
+# Colunas de cada gráfico da página de relatório: barras empilhadas e linha do total
+COLUNAS_RECEITA = ['Receita_Corrente', 'Receita_Capital', 'Receita_Intra_Orcamentaria']
+COLUNAS_DESPESA = ['Despesa_Corrente', 'Despesa_Capital', 'Despesa_Intra_Orcamentaria']
+
+_trava_tema = threading.Lock()
+
+
+def _altair():
+    # O Altair é importado apenas quando o primeiro gráfico é montado: a partida da aplicação e as
+    # especificações já em cache não pagam esse custo
+    import altair
+    return altair
+
+
+class CacheGraficos:
+    # Cache LRU das especificações Vega-Lite já serializadas, compartilhado por todas as sessões.
+    # Cada entrada vale enquanto o conjunto de dados que a originou for o mesmo objeto em memória;
+    # a referência fraca não impede que o cache de dados libere esse objeto.
+
+    def __init__(self, limite):
+        self.limite = limite
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, fonte, construir):
+        with etapa('grafico', chave[0]):
+            return self._obter(chave, fonte, construir)
+
+    def _obter(self, chave, fonte, construir):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0]() is fonte:
+                self._itens.move_to_end(chave)
+                return item[1]
+        especificacao = construir()
+        with self._trava:
+            self._itens[chave] = (weakref.ref(fonte), especificacao)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.limite:
+                self._itens.popitem(last=False)
+        return especificacao
+
+    def invalidar(self):
+        with self._trava:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+GRAFICOS = CacheGraficos(LIMITE_GRAFICOS)
+METRICAS.registrar_medidor('relorc_cache_graficos_entradas', 'Gráficos no cache de especificações', lambda: len(GRAFICOS))
+
+
+@medir('serializar')
+def especificacao(grafico):
+    # Serializa o gráfico como o st.altair_chart faria: sem as dimensões padrão do tema do Altair
+    alt = _altair()
+    with _trava_tema:
+        if alt.theme.active == 'default':
+            with alt.theme.enable('none'):
+                return grafico.to_dict()
+        return grafico.to_dict()
+
+
+def _com_dados(modelo, df):
+    # Montar o gráfico com o Altair custa muito mais do que os dados; cada tipo de gráfico é montado
+    # uma vez sobre um DataFrame vazio e recebe aqui os dados, como um conjunto nomeado pelo hash do
+    # conteúdo (o mesmo formato gerado pelo Altair)
+    alt = _altair()
+    valores = alt.to_values(df)['values']
+    nome = 'data-' + hashlib.md5(json.dumps(valores, sort_keys=True).encode()).hexdigest()
+    especificacao = dict(modelo)
+    especificacao['data'] = {'name': nome}
+    especificacao['datasets'] = {nome: valores}
+    return especificacao
+
+
+@functools.lru_cache(maxsize=None)
+def _modelo_composicao(colunas, total, tipo, titulo_tipo, titulo_valores, titulo_total, titulo, cor_linha,
+                       cores=None):
+    # Barras empilhadas das parcelas e linha do total, por ano (página de relatório)
+    alt = _altair()
+    df = pd.DataFrame(columns=['ano', *colunas, total])
+    cor = alt.Color(f'{tipo}:N', legend=alt.Legend(orient='bottom'))
+    if cores is not None:
+        cor = alt.Color(f'{tipo}:N', scale=alt.Scale(range=list(cores)), legend=alt.Legend(orient='bottom'))
+
+    barras = alt.Chart(df).transform_fold(
+        list(colunas),
+        as_=[tipo, 'Valor']
+    ).mark_bar().encode(
+        x=alt.X('ano:O', title='Ano'),
+        y=alt.Y('Valor:Q', title=titulo_valores),
+        color=cor,
+        tooltip=[
+            alt.Tooltip('ano:O', title='Ano'),
+            alt.Tooltip(f'{tipo}:N', title=titulo_tipo),
+            alt.Tooltip('Valor:Q', title='Valor', format=",.2f", formatType='number')  # Formatação de moeda
+        ]
+    )
+
+    linha = alt.Chart(df).mark_line(color=cor_linha, size=2).encode(
+        x=alt.X('ano:O', title='Ano'),
+        y=alt.Y(f'{total}:Q', title=titulo_total),
+        tooltip=[
+            alt.Tooltip('ano:O', title='Ano'),
+            alt.Tooltip(f'{total}:Q', title=titulo_total, format=",.2f", formatType='number')  # Formatação de moeda
+        ]
+    )
+
+    # Combinar ambos os gráficos e definir o uso da largura total
+    grafico = (barras + linha).properties(
+        width='container',  # Ajusta a largura ao tamanho do container
+        height=400,
+        title=titulo
+    )
+    return especificacao(grafico)
+
+
+def grafico_receita_municipio(df):
+    # Apenas as colunas codificadas no gráfico entram na especificação
+    modelo = _modelo_composicao(
+        tuple(COLUNAS_RECEITA), 'Receita_Total', 'Tipo_Receita', 'Tipo de Receita', 'Valores das Receitas',
+        'Receita Total', "Evolução da Receita Total e Composição das Receitas", 'black')
+    return _com_dados(modelo, df[['ano'] + COLUNAS_RECEITA + ['Receita_Total']])
+
+
+def grafico_despesa_municipio(df):
+    modelo = _modelo_composicao(
+        tuple(COLUNAS_DESPESA), 'Despesa_Total', 'Tipo_Despesa', 'Tipo de Despesa', 'Valores das Despesas',
+        'Despesa Total', "Evolução da Despesa Total e Composição das Despesas", 'red',
+        cores=('#FF6666', '#FFB266', '#FFCC66'))  # Cores personalizadas
+    return _com_dados(modelo, df[['ano'] + COLUNAS_DESPESA + ['Despesa_Total']])
+
+
+@functools.lru_cache(maxsize=LIMITE_GRAFICOS)
+def _modelo_evolucao_conta(conta):
+    # Linha com o valor da conta ao longo dos anos
+    alt = _altair()
+    grafico = alt.Chart(pd.DataFrame(columns=['Ano', 'Valor'])).mark_line().encode(
+        x=alt.X('Ano:O', title='Ano'),
+        y=alt.Y('Valor:Q', title=f'Valor da {conta}'),
+        tooltip=[alt.Tooltip('Ano:O', title='Ano'),
+                 alt.Tooltip('Valor:Q', title='Valor', format=",.2f")]
+    ).properties(width='container', height=400)
+    return especificacao(grafico)
+
+
+def grafico_evolucao_conta(df, conta):
+    return _com_dados(_modelo_evolucao_conta(conta), df[['Ano', 'Valor']])
+
+
+@functools.lru_cache(maxsize=LIMITE_GRAFICOS)
+def _modelo_percentual(coluna, titulo):
+    # Barras com o percentual da conta sobre a conta de referência
+    alt = _altair()
+    grafico = alt.Chart(pd.DataFrame(columns=['Ano', coluna])).mark_bar().encode(
+        x=alt.X('Ano:O', title='Ano'),
+        y=alt.Y(f'{coluna}:Q', title=titulo),
+        tooltip=[alt.Tooltip('Ano:O', title='Ano'),
+                 alt.Tooltip(f'{coluna}:Q', title='Percentual', format=",.2f")]
+    ).properties(width='container', height=400)
+    return especificacao(grafico)
+
+
+def grafico_percentual(df, coluna, titulo):
+    # Apenas os anos com percentual calculado
+    return _com_dados(_modelo_percentual(coluna, titulo), df.loc[df[coluna].notnull(), ['Ano', coluna]])
+
+
+@functools.lru_cache(maxsize=None)
+def _modelo_comparacao_total(titulo_valores, titulo):
+    # Uma linha por município ao longo dos anos (página de comparação)
+    alt = _altair()
+    grafico = alt.Chart(pd.DataFrame(columns=['Município', 'ano', 'Valor'])).mark_line(point=True).encode(
+        x=alt.X('ano:O', title='Ano'),
+        y=alt.Y('Valor:Q', title=titulo_valores),
+        color=alt.Color('Município:N', legend=alt.Legend(orient='bottom')),
+        tooltip=[alt.Tooltip('Município:N', title='Município'),
+                 alt.Tooltip('ano:O', title='Ano'),
+                 alt.Tooltip('Valor:Q', title='Valor', format=",.2f", formatType='number')]
+    ).properties(width='container', height=400, title=titulo)
+    return especificacao(grafico)
+
+
+def grafico_comparacao_total(df, titulo_valores, titulo):
+    return _com_dados(_modelo_comparacao_total(titulo_valores, titulo), df[['Município', 'ano', 'Valor']])
+
+
+@functools.lru_cache(maxsize=None)
+def _modelo_comparacao_composicao(titulo_tipo, titulo, cores=None):
+    # Barras empilhadas normalizadas: participação de cada parcela no total de cada município
+    alt = _altair()
+    cor = alt.Color('Tipo:N', title=titulo_tipo, legend=alt.Legend(orient='bottom'))
+    if cores is not None:
+        cor = alt.Color('Tipo:N', title=titulo_tipo, scale=alt.Scale(range=list(cores)),
+                        legend=alt.Legend(orient='bottom'))
+    grafico = alt.Chart(pd.DataFrame(columns=['Município', 'Tipo', 'Valor'])).mark_bar().encode(
+        x=alt.X('Município:N', title='Município'),
+        y=alt.Y('Valor:Q', title='Participação', stack='normalize', axis=alt.Axis(format='%')),
+        color=cor,
+        tooltip=[alt.Tooltip('Município:N', title='Município'),
+                 alt.Tooltip('Tipo:N', title=titulo_tipo),
+                 alt.Tooltip('Valor:Q', title='Valor', format=",.2f", formatType='number')]
+    ).properties(width='container', height=400, title=titulo)
+    return especificacao(grafico)
+
+
+def grafico_comparacao_receita(df):
+    modelo = _modelo_comparacao_composicao('Tipo de Receita', 'Composição das Receitas')
+    return _com_dados(modelo, df[['Município', 'Tipo', 'Valor']])
+
+
+def grafico_comparacao_despesa(df):
+    modelo = _modelo_comparacao_composicao('Tipo de Despesa', 'Composição das Despesas',
+                                           cores=('#FF6666', '#FFB266', '#FFCC66'))
+    return _com_dados(modelo, df[['Município', 'Tipo', 'Valor']])
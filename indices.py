@@ -0,0 +1,213 @@
+import sys
+
+import pandas as pd
+
+from cache import CACHE, tamanho_quadros
+from calculos import calcular_participacao, tabela_ultimo_ano
+from metricas import medir
+
+CHAVE_INDICE = ['UF', 'Instituição']
+
+
+def ordenar_siconfi(df):
+    # Ordenação estável: dentro de cada instituição as linhas mantêm a ordem original dos arquivos
+    return df.sort_values(CHAVE_INDICE, kind='stable')
+
+
+def _ordenado(df):
+    return pd.MultiIndex.from_frame(df[CHAVE_INDICE]).is_monotonic_increasing
+
+
+class IndiceSiconfi:
+    # Índice UF -> Instituição sobre um DataFrame do Siconfi ordenado por essas colunas.
+    # Cada instituição ocupa um bloco contíguo de linhas, então a consulta é uma fatia (iloc)
+    # em vez de uma máscara booleana sobre todas as linhas.
+
+    def __init__(self, df):
+        self.origem = df
+        if not _ordenado(df):
+            df = ordenar_siconfi(df)
+        self.df = df
+
+        grupos = df.groupby(CHAVE_INDICE, observed=True, sort=False).indices
+        self._fatias = {chave: slice(posicoes[0], posicoes[-1] + 1) for chave, posicoes in grupos.items()}
+
+        # Listas ordenadas usadas nas caixas de seleção
+        instituicoes = {}
+        for uf, instituicao in self._fatias:
+            instituicoes.setdefault(uf, []).append(instituicao)
+        self._instituicoes = {uf: sorted(nomes) for uf, nomes in instituicoes.items()}
+        self.ufs = sorted(self._instituicoes)
+
+        # Identifica este índice nas entradas derivadas dele no cache compartilhado: um objeto só é igual
+        # a si mesmo, então um índice reconstruído nunca reaproveita os resultados do anterior
+        self.identidade = object()
+
+    def __sizeof__(self):
+        # Contado pelo limite de memória do cache de dados. A tabela de origem entra na conta mesmo quando
+        # tem entrada própria: o índice a mantém em memória depois que essa entrada é descartada
+        return object.__sizeof__(self) + tamanho_quadros(self.origem, self.df) + sys.getsizeof(self._fatias)
+
+    def indice_uf(self, uf):
+        # Índice que contém os dados da UF (aqui, o próprio índice nacional)
+        return self
+
+    def instituicoes(self, uf):
+        return self._instituicoes.get(uf, [])
+
+    @medir('filtrar')
+    def instituicao(self, uf, instituicao):
+        return self.df.iloc[self._fatias.get((uf, instituicao), slice(0, 0))]
+
+    @medir('calcular')
+    def participacao(self, uf, instituicao, conta_referencia):
+        # Percentual de cada linha da instituição sobre a conta de referência, calculado uma vez para
+        # todas as contas; trocar a conta selecionada não exige novo cálculo. O resultado fica no cache
+        # compartilhado e conta para o seu limite de memória.
+        return CACHE.obter(('participacao', self.identidade, uf, instituicao, conta_referencia), self.identidade,
+                           lambda: calcular_participacao(self.instituicao(uf, instituicao), conta_referencia))
+
+    @medir('calcular')
+    def ultimo_ano(self, uf, instituicao, conta_referencia, descartar):
+        # Quadro do último ano calculado apenas para a instituição (sem a tabela gerada na ingestão),
+        # guardado no cache compartilhado como as participações
+        return CACHE.obter(('ultimo_ano', self.identidade, uf, instituicao, conta_referencia, descartar),
+                           self.identidade,
+                           lambda: _quadro(tabela_ultimo_ano(self.instituicao(uf, instituicao), conta_referencia,
+                                                             descartar)))
+
+
+class IndiceParticionado:
+    # Mesma interface de IndiceSiconfi sobre dados particionados por UF: cada consulta carrega
+    # (pelo cache compartilhado) apenas o índice da UF envolvida
+
+    def __init__(self, ufs, carregar_uf):
+        self.ufs = list(ufs)
+        self._carregar_uf = carregar_uf
+
+    def indice_uf(self, uf):
+        return self._carregar_uf(uf)
+
+    def instituicoes(self, uf):
+        return self._carregar_uf(uf).instituicoes(uf) if uf in self.ufs else []
+
+    def instituicao(self, uf, instituicao):
+        return self._carregar_uf(uf).instituicao(uf, instituicao)
+
+    def participacao(self, uf, instituicao, conta_referencia):
+        return self._carregar_uf(uf).participacao(uf, instituicao, conta_referencia)
+
+    def ultimo_ano(self, uf, instituicao, conta_referencia, descartar):
+        return self._carregar_uf(uf).ultimo_ano(uf, instituicao, conta_referencia, descartar)
+
+
+def _quadro(df):
+    # Valores prontos para os st.metric da página: nenhuma operação do pandas na exibição
+    if df.empty:
+        return {'ano': None, 'populacao': None, 'referencia': False, 'contas': []}
+    populacao = df['População'].iat[0]
+    return {
+        'ano': int(df['Ano'].iat[0]),
+        'populacao': None if pd.isna(populacao) else populacao,
+        'referencia': bool(df['Referencia'].iat[0]),
+        'contas': [(conta, percentual) for conta, percentual in zip(df['Conta'], df['Percentual'])
+                   if not pd.isna(conta)],
+    }
+
+
+class IndiceUltimoAno:
+    # Quadros de participação no último ano de todas as instituições (calculos.tabela_ultimo_ano),
+    # consultados por UF e Instituição; cada quadro é convertido uma única vez
+
+    def __init__(self, df):
+        self.df = df
+        grupos = df.groupby(CHAVE_INDICE, observed=True, sort=False).indices
+        self._fatias = {chave: slice(posicoes[0], posicoes[-1] + 1) for chave, posicoes in grupos.items()}
+        self.identidade = object()
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + tamanho_quadros(self.df) + sys.getsizeof(self._fatias)
+
+    @medir('filtrar')
+    def instituicao(self, uf, instituicao):
+        # Cada quadro é guardado no cache compartilhado, identificado por este índice
+        return CACHE.obter(('quadro', self.identidade, uf, instituicao), self.identidade,
+                           lambda: _quadro(self.df.iloc[self._fatias.get((uf, instituicao), slice(0, 0))]))
+
+
+class UltimoAnoSiconfi:
+    # Mesma interface de IndiceUltimoAno quando a ingestão não gerou a tabela: o quadro de cada
+    # instituição é calculado na primeira consulta e guardado no cache compartilhado
+
+    def __init__(self, indice, conta_referencia, descartar):
+        self.indice = indice
+        self.conta_referencia = conta_referencia
+        self.descartar = descartar
+
+    def instituicao(self, uf, instituicao):
+        return self.indice.ultimo_ano(uf, instituicao, self.conta_referencia, self.descartar)
+
+
+class IndiceRankings:
+    # Consulta por município em tempo constante: cada município ocupa um bloco contíguo da tabela
+
+    def __init__(self, df):
+        self.df = df
+        grupos = df.groupby('municipio', observed=True, sort=False).indices
+        self._fatias = {municipio: slice(posicoes[0], posicoes[-1] + 1) for municipio, posicoes in grupos.items()}
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + tamanho_quadros(self.df) + sys.getsizeof(self._fatias)
+
+    @medir('filtrar')
+    def municipio(self, codigo):
+        return self.df.iloc[self._fatias.get(codigo, slice(0, 0))]
+
+
+class IndiceRelatorio:
+    # Planilhas de receitas/despesas e CAPAG unidas uma única vez pelo código do município e pelo ano.
+    # Cada município ocupa um bloco contíguo da tabela, então a página obtém os dados das duas planilhas
+    # com uma única consulta pelo código, sem comparar nomes (que se repetem entre as UFs).
+
+    def __init__(self, rec_desp, capag):
+        self.origem = (rec_desp, capag)
+        capag = capag.rename(columns={'cod': 'id_municipio'})
+        self._colunas_rec_desp = list(rec_desp.columns)
+        self._colunas_capag = list(capag.columns)
+
+        df = rec_desp.merge(capag, on=['id_municipio', 'ano'], how='outer', indicator='_origem')
+        self.df = df.sort_values(['id_municipio', 'ano'], kind='stable').reset_index(drop=True)
+        self._tem_rec_desp = self.df['_origem'].isin(['both', 'left_only']).to_numpy()
+        self._tem_capag = self.df['_origem'].isin(['both', 'right_only']).to_numpy()
+
+        grupos = self.df.groupby('id_municipio', sort=False).indices
+        self._fatias = {codigo: slice(posicoes[0], posicoes[-1] + 1) for codigo, posicoes in grupos.items()}
+
+        # Nome -> código dos municípios de cada UF, para as caixas de seleção
+        municipios = self.df.loc[self._tem_rec_desp, ['uf', 'municipio', 'id_municipio']]
+        municipios = municipios.drop_duplicates('id_municipio')
+        self._codigos = {}
+        for uf, nome, codigo in municipios.itertuples(index=False):
+            self._codigos.setdefault(uf, {})[nome] = codigo
+        self.ufs = sorted(self._codigos)
+        self.codigos = sorted(municipios['id_municipio'])
+
+    def __sizeof__(self):
+        # A tabela unida e as duas planilhas de origem, que o índice mantém em memória
+        return (object.__sizeof__(self) + tamanho_quadros(self.df, *self.origem, self._tem_rec_desp, self._tem_capag)
+                + sys.getsizeof(self._fatias))
+
+    def municipios(self, uf):
+        return sorted(self._codigos.get(uf, {}))
+
+    def codigo(self, uf, municipio):
+        return self._codigos.get(uf, {}).get(municipio)
+
+    @medir('filtrar')
+    def municipio(self, codigo):
+        # Linhas das duas planilhas para o município, com as colunas originais de cada uma
+        fatia = self._fatias.get(codigo, slice(0, 0))
+        df = self.df.iloc[fatia]
+        rec_desp = df.loc[self._tem_rec_desp[fatia], self._colunas_rec_desp]
+        capag = df.loc[self._tem_capag[fatia], self._colunas_capag].rename(columns={'id_municipio': 'cod'})
+        return rec_desp, capag
@@ -0,0 +1,109 @@
+import argparse
+import glob
+import os
+import shutil
+
+import pandas as pd
+
+from carregamento import (ARQUIVO_CAPAG, ARQUIVO_REC_DESP, CAMINHO_DESP, CAMINHO_REC, CAMINHO_SNAPSHOTS,
+                          atualizar_particoes, caminho_particoes, ler_capag, ler_particoes_por_uf, ler_rec_desp,
+                          ler_snapshot, ler_todas_particoes, salvar_snapshot, ufs_particionadas)
+from calculos import QUADRO_ULTIMO_ANO, tabela_ultimo_ano
+from limpeza import LINHAS_POR_BLOCO, memoria_mb, unificar_categorias
+from rankings import construir_rankings, indicadores_participacao_rcl
+
+
+# Participações na RCL de cada UF gravadas pela ingestão em blocos (dados/participacoes_rcl/)
+PARTICOES_RCL = 'participacoes_rcl'
+
+
+def ler_participacoes(pasta):
+    # Todas as UFs em uma tabela, com as categorias unificadas entre os arquivos
+    partes = [ler_snapshot(arquivo) for arquivo in sorted(glob.glob(os.path.join(pasta, '*.feather')))]
+    return pd.concat(unificar_categorias(partes, ['municipio', 'uf', 'ano', 'indicador']), ignore_index=True)
+
+
+def ingerir(caminho_desp=CAMINHO_DESP, caminho_rec=CAMINHO_REC, arquivo_rec_desp=ARQUIVO_REC_DESP,
+            arquivo_capag=ARQUIVO_CAPAG, destino=CAMINHO_SNAPSHOTS, por_ano=False, processos=None, completo=False,
+            linhas_por_bloco=None):
+    # Converte as fontes originais em snapshots colunares já limpos e tipados.
+    # Os dados do Siconfi são particionados por UF (e opcionalmente por ano) e atualizados de forma
+    # incremental: só os CSVs novos ou alterados desde a última execução são processados.
+    # Com `linhas_por_bloco`, nenhum conjunto do Siconfi fica inteiro em memória: os CSVs são gravados
+    # em blocos e as tabelas derivadas (último ano e participações na RCL) são calculadas UF por UF, então
+    # o pico passa a depender da maior partição de UF. As participações na RCL de cada UF vão para o disco
+    # assim que calculadas e só voltam, compactas, para os rankings, cujas posições nacionais comparam
+    # todos os municípios de uma vez.
+    gerados = []
+    dados = {}
+    participacoes = None
+    pasta_participacoes = caminho_particoes(PARTICOES_RCL, destino)
+    for nome, caminho in (('despesas', caminho_desp), ('receitas', caminho_rec)):
+        if not glob.glob(os.path.join(caminho, '*.csv')):
+            print(f"Nenhum arquivo CSV encontrado em {caminho}; snapshot '{nome}' não gerado.")
+            continue
+        gerados.append(atualizar_particoes(caminho, nome, destino, por_ano, processos, completo, linhas_por_bloco))
+
+        # Quadro de participação no último ano de cada instituição, servido pronto às páginas de evolução
+        if linhas_por_bloco:
+            ultimo_ano, linhas = [], 0
+            if nome == 'receitas':
+                shutil.rmtree(pasta_participacoes, ignore_errors=True)
+            for uf, parte in zip(ufs_particionadas(nome, destino), ler_particoes_por_uf(nome, destino)):
+                linhas += len(parte)
+                ultimo_ano.append(tabela_ultimo_ano(parte, *QUADRO_ULTIMO_ANO[nome]))
+                if nome == 'receitas' and 'Cod.IBGE' in parte.columns:
+                    salvar_snapshot(indicadores_participacao_rcl(parte), uf, pasta_participacoes)
+            print(f"{nome}: {linhas:,} linhas")
+            if not ultimo_ano:
+                continue
+            ultimo_ano = pd.concat(unificar_categorias(ultimo_ano, ['UF', 'Instituição', 'Conta']), ignore_index=True)
+            if nome == 'receitas' and os.path.isdir(pasta_participacoes):
+                participacoes = ler_participacoes(pasta_participacoes)
+        else:
+            dados[nome] = ler_todas_particoes(nome, destino)
+            print(f"{nome}: {len(dados[nome]):,} linhas, {memoria_mb(dados[nome]):.1f} MB em memória")
+            ultimo_ano = tabela_ultimo_ano(dados[nome], *QUADRO_ULTIMO_ANO[nome])
+        gerados.append(salvar_snapshot(ultimo_ano, 'ultimo_ano_' + nome, destino))
+
+    for nome, arquivo, ler in (('rec_desp', arquivo_rec_desp, ler_rec_desp), ('capag', arquivo_capag, ler_capag)):
+        if not os.path.exists(arquivo):
+            print(f"Arquivo {arquivo} não encontrado; snapshot '{nome}' não gerado.")
+            continue
+        dados[nome] = ler(arquivo)
+        gerados.append(salvar_snapshot(dados[nome], nome, destino))
+
+    # Rankings e percentis dos municípios, por UF e nacionais
+    if 'rec_desp' in dados and 'capag' in dados:
+        rankings = construir_rankings(dados['rec_desp'], dados['capag'], dados.get('receitas'), participacoes)
+        gerados.append(salvar_snapshot(rankings, 'rankings', destino))
+
+    for caminho in gerados:
+        print(f"Snapshot gerado: {caminho}")
+    return gerados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera os snapshots colunares (Arrow/Feather) usados pela aplicação.')
+    parser.add_argument('--despesas', default=CAMINHO_DESP, help='Pasta com os CSVs de despesas do Siconfi')
+    parser.add_argument('--receitas', default=CAMINHO_REC, help='Pasta com os CSVs de receitas do Siconfi')
+    parser.add_argument('--rec-desp', default=ARQUIVO_REC_DESP, help='Planilha de receitas e despesas municipais')
+    parser.add_argument('--capag', default=ARQUIVO_CAPAG, help='Planilha com os indicadores CAPAG')
+    parser.add_argument('--destino', default=CAMINHO_SNAPSHOTS, help='Pasta onde os snapshots serão gravados')
+    parser.add_argument('--por-ano', action='store_true',
+                        help='Grava um arquivo por ano dentro da partição de cada UF')
+    parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                        help='Número de processos usados para ler os CSVs (padrão: número de CPUs)')
+    parser.add_argument('--completo', action='store_true',
+                        help='Reprocessa todos os CSVs em vez de apenas os novos ou alterados')
+    parser.add_argument('--blocos', type=int, nargs='?', const=LINHAS_POR_BLOCO, metavar='LINHAS',
+                        help='Lê os CSVs em blocos de LINHAS linhas (padrão: %(const)s) e calcula as tabelas '
+                             'derivadas UF por UF, com memória limitada pela maior UF')
+    args = parser.parse_args()
+
+    ingerir(args.despesas, args.receitas, args.rec_desp, args.capag, args.destino, args.por_ano, args.processos,
+            args.completo, args.blocos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from metricas import medir
+
+
+def normalizar_texto(texto):
+    if pd.isnull(texto):
+        return ''
+    # Remover acentuação
+    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
+    # Remover caracteres especiais
+    texto = re.sub(r'[^\w\s]', '', texto)
+    # Converter para maiúsculas e remover espaços extras
+    texto = texto.upper().strip()
+    return texto
+
+
+@medir('normalizar')
+def normalizar_coluna(serie):
+    # Versão vetorizada de normalizar_texto: normaliza apenas os valores distintos e replica o resultado.
+    # As marcas de acentuação (categoria Mn) nunca casam com \w, então a própria expressão regular as remove.
+    # O dtype object mantém a semântica do módulo `re` (o dtype str usa o motor de regex do Arrow).
+    codigos, unicos = pd.factorize(serie)
+    normalizados = (pd.Series(unicos, dtype=object)
+                    .str.normalize('NFD')
+                    .str.replace(r'[^\w\s]', '', regex=True)
+                    .str.upper()
+                    .str.strip())
+    # O código -1 (valor ausente) aponta para o último elemento, o texto vazio
+    valores = np.append(normalizados.to_numpy(dtype=object), '')
+    return pd.Series(valores[codigos], index=serie.index)
+
+
+def _converter_texto(serie):
+    texto = pc.replace_substring_regex(pa.array(serie, type=pa.string(), from_pandas=True), r'[^0-9,]', '')
+    valido = pc.match_substring_regex(texto, r'^([0-9]+,?[0-9]*|,[0-9]+)$')
+    texto = pc.if_else(valido, pc.replace_substring(texto, ',', '.'), pa.scalar(None, pa.string()))
+    return pd.Series(pc.cast(texto, pa.float64()).to_numpy(zero_copy_only=False), index=serie.index)
+
+
+@medir('converter_valor')
+def converter_valor(serie):
+    # Converte valores no formato brasileiro ("1.234.567,89") para float em uma única passada de regex.
+    # Equivale à limpeza original: pontos são descartados, a vírgula vira separador decimal e qualquer
+    # outro caractere (inclusive o sinal de menos) é removido; o que não formar um número vira NaN.
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors='coerce')
+    if pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty'):
+        return _converter_texto(serie)
+    # Coluna mista (números ao lado de textos): como na limpeza original, os números passam sem alteração
+    # e apenas os textos são convertidos
+    eh_texto = serie.map(lambda valor: isinstance(valor, str)).to_numpy(dtype=bool)
+    resultado = pd.to_numeric(serie.where(~eh_texto), errors='coerce').astype('float64')
+    resultado[eh_texto] = _converter_texto(serie[eh_texto]).to_numpy()
+    return resultado
+
+
+@medir('ler_csv')
+def ler_csv_siconfi(arquivo):
+    # Leitura de um arquivo CSV exportado do Siconfi
+    return pd.read_csv(arquivo, encoding='ISO-8859-1', sep=';', on_bad_lines='skip')
+
+
+# Linhas lidas de cada vez na ingestão em blocos (python ingestao.py --blocos)
+LINHAS_POR_BLOCO = 50_000
+
+# Colunas lidas sempre como texto na leitura em blocos: a inferência de tipos de cada bloco poderia, por
+# exemplo, ler como número um bloco de valores sem vírgula ("1.234" viraria 1.234 em vez de 1234)
+COLUNAS_TEXTO = ['Instituição', 'UF', 'Conta', 'Valor']
+
+
+def blocos_siconfi(arquivo, linhas_por_bloco=LINHAS_POR_BLOCO):
+    # Leitura e limpeza de um CSV em blocos de `linhas_por_bloco` linhas: cada bloco é lido e limpo
+    # apenas quando o anterior já foi consumido, então a memória não depende do tamanho do arquivo
+    with pd.read_csv(arquivo, encoding='ISO-8859-1', sep=';', on_bad_lines='skip', chunksize=linhas_por_bloco,
+                     dtype={coluna: str for coluna in COLUNAS_TEXTO}) as leitor:
+        for bloco in leitor:
+            yield limpar_siconfi(bloco)
+
+
+@medir('limpar')
+def limpar_siconfi(df):
+    # Converter a coluna 'Ano' para inteiro (linhas sem ano válido são descartadas)
+    df['Ano'] = pd.to_numeric(df['Ano'], errors='coerce')
+    df = df.dropna(subset=['Ano']).reset_index(drop=True)
+    df['Ano'] = df['Ano'].astype('int64')
+
+    # Limpar e converter os valores da coluna 'Valor' para numérico
+    df['Valor'] = converter_valor(df['Valor'])
+
+    # Normalizar os nomes das contas
+    df['Conta_Normalizada'] = normalizar_coluna(df['Conta'])
+
+    # Normalizar outras colunas se necessário
+    df['UF'] = df['UF'].str.strip().str.upper()
+    df['Instituição'] = df['Instituição'].str.strip().str.upper()
+    return df
+
+
+# Esquema em memória dos dados do Siconfi: apenas as colunas usadas pelas páginas (e pelos rankings),
+# com textos repetidos como categorias e números nos menores tipos que comportam os valores
+ESQUEMA_SICONFI = {
+    'Instituição': 'category',
+    'Cod.IBGE': 'int32',
+    'UF': 'category',
+    'População': 'int32',
+    'Conta': 'category',
+    'Conta_Normalizada': 'category',
+    'Valor': 'float64',
+    'Ano': 'int16',
+}
+
+COLUNAS_CATEGORICAS = [coluna for coluna, tipo in ESQUEMA_SICONFI.items() if tipo == 'category']
+
+
+@medir('tipar')
+def tipar_siconfi(df):
+    # Descarta as colunas fora do esquema e aplica os tipos compactos. Depois da concatenação,
+    # colunas com categorias diferentes entre os arquivos são recategorizadas.
+    df = df[[coluna for coluna in ESQUEMA_SICONFI if coluna in df.columns]].copy()
+    for coluna, tipo in ESQUEMA_SICONFI.items():
+        if coluna not in df.columns:
+            continue
+        if tipo == 'int32' and df[coluna].isna().any():
+            # Inteiros com valores ausentes (ex.: população não informada) permanecem como float
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype('float64')
+        elif tipo == 'int32':
+            df[coluna] = pd.to_numeric(df[coluna], errors='coerce').astype(tipo)
+        elif tipo == 'category' and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # Categorias em ordem alfabética, como na conversão de texto (as partições gravadas em blocos
+            # guardam as categorias na ordem em que apareceram)
+            df[coluna] = df[coluna].cat.reorder_categories(sorted(df[coluna].cat.categories))
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+
+def memoria_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def ler_csv_limpo(arquivo):
+    # Leitura e limpeza completas de um arquivo; usada também pelos processos da ingestão paralela
+    return tipar_siconfi(limpar_siconfi(ler_csv_siconfi(arquivo)))
+
+
+def unificar_categorias(dfs, colunas=COLUNAS_CATEGORICAS):
+    # Mesmas categorias (em ordem alfabética) em todos os DataFrames, para que pd.concat
+    # preserve o tipo categórico em vez de voltar a texto
+    dfs = list(dfs)
+    for coluna in colunas:
+        if coluna not in dfs[0].columns:
+            continue
+        categorias = sorted(set().union(*(df[coluna].cat.categories for df in dfs)))
+        dfs = [df.assign(**{coluna: df[coluna].cat.set_categories(categorias)}) for df in dfs]
+    return dfs
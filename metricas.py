@@ -0,0 +1,186 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+# Instrumentação das etapas da aplicação (leitura, limpeza, normalização, filtros, cálculos e gráficos).
+# Variáveis de ambiente:
+#   RELORC_METRICAS_MEMORIA=1  mede também a memória alocada em cada etapa (tracemalloc; acrescenta custo)
+#   RELORC_LOG_METRICAS=1      grava cada etapa como uma linha JSON no log 'relorc.metricas'
+#   RELORC_METRICAS_PORTA=9108 expõe as métricas acumuladas em http://127.0.0.1:<porta>/metrics
+#   RELORC_DEBUG=1             mostra o painel de desempenho na barra lateral
+MEDIR_MEMORIA = os.environ.get('RELORC_METRICAS_MEMORIA') == '1'
+PORTA_METRICAS = int(os.environ.get('RELORC_METRICAS_PORTA', '0'))
+DEBUG = os.environ.get('RELORC_DEBUG') == '1'
+
+if MEDIR_MEMORIA and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+log = logging.getLogger('relorc.metricas')
+if os.environ.get('RELORC_LOG_METRICAS') == '1':
+    log.setLevel(logging.INFO)
+    log.addHandler(logging.StreamHandler())
+
+
+def _linhas(resultado):
+    # Linhas processadas pela etapa, quando o resultado é um DataFrame/Series (ou uma tupla deles)
+    if isinstance(resultado, (pd.DataFrame, pd.Series)):
+        return len(resultado)
+    if isinstance(resultado, tuple) and resultado and all(isinstance(r, (pd.DataFrame, pd.Series)) for r in resultado):
+        return sum(len(r) for r in resultado)
+    return None
+
+
+class Metricas:
+    # Totais por etapa desde o início do processo (compartilhados pelas sessões) e a lista das etapas
+    # da execução atual do script, guardada por thread (cada execução do Streamlit roda em uma thread)
+
+    def __init__(self):
+        self._totais = {}
+        self._medidores = {}
+        self._trava = threading.Lock()
+        self._local = threading.local()
+
+    def iniciar_execucao(self):
+        self._local.etapas = []
+
+    def execucao(self):
+        return list(getattr(self._local, 'etapas', []))
+
+    def registrar(self, etapa, segundos, linhas=None, memoria=None, detalhe=None):
+        registro = {'etapa': etapa, 'detalhe': detalhe, 'segundos': segundos, 'linhas': linhas, 'memoria': memoria}
+        with self._trava:
+            total = self._totais.setdefault((etapa, detalhe), {'execucoes': 0, 'segundos': 0.0, 'linhas': 0,
+                                                                'memoria': None})
+            total['execucoes'] += 1
+            total['segundos'] += segundos
+            total['linhas'] += linhas or 0
+            if memoria is not None:
+                total['memoria'] = memoria
+        etapas = getattr(self._local, 'etapas', None)
+        if etapas is not None:
+            etapas.append(registro)
+        if log.isEnabledFor(logging.INFO):
+            log.info(json.dumps(registro, ensure_ascii=False))
+
+    def registrar_medidor(self, nome, descricao, funcao):
+        # Valor instantâneo lido a cada coleta (ex.: bytes ocupados pelo cache)
+        self._medidores[nome] = (descricao, funcao)
+
+    def totais(self):
+        with self._trava:
+            return {chave: dict(total) for chave, total in self._totais.items()}
+
+    def texto_prometheus(self):
+        # Formato de exposição em texto do Prometheus
+        linhas = []
+        series = (
+            ('relorc_etapa_execucoes_total', 'counter', 'Execuções de cada etapa', 'execucoes'),
+            ('relorc_etapa_segundos_total', 'counter', 'Tempo acumulado de cada etapa, em segundos', 'segundos'),
+            ('relorc_etapa_linhas_total', 'counter', 'Linhas processadas por cada etapa', 'linhas'),
+            ('relorc_etapa_memoria_bytes', 'gauge', 'Memória alocada na última execução de cada etapa', 'memoria'),
+        )
+        totais = self.totais()
+        for nome, tipo, descricao, campo in series:
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+            for (etapa, detalhe), total in sorted(totais.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+                if total[campo] is None:
+                    continue
+                rotulos = f'etapa="{etapa}"' + (f',detalhe="{_escapar(detalhe)}"' if detalhe is not None else '')
+                linhas.append(f'{nome}{{{rotulos}}} {total[campo]}')
+        for nome, (descricao, funcao) in sorted(self._medidores.items()):
+            linhas.append(f'# HELP {nome} {descricao}')
+            linhas.append(f'# TYPE {nome} gauge')
+            linhas.append(f'{nome} {funcao()}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+METRICAS = Metricas()
+
+
+@contextmanager
+def etapa(nome, detalhe=None):
+    # Mede o bloco; as linhas processadas podem ser informadas em registro['linhas'] e o detalhe,
+    # quando só é conhecido dentro do bloco, em registro['detalhe']
+    registro = {'linhas': None, 'detalhe': detalhe}
+    memoria_inicial = tracemalloc.get_traced_memory()[0] if MEDIR_MEMORIA else None
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        segundos = time.perf_counter() - inicio
+        memoria = tracemalloc.get_traced_memory()[0] - memoria_inicial if MEDIR_MEMORIA else None
+        METRICAS.registrar(nome, segundos, registro['linhas'], memoria, registro['detalhe'])
+
+
+def medir(nome):
+    # Decorador: registra cada chamada da função como uma execução da etapa
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with etapa(nome) as registro:
+                resultado = funcao(*args, **kwargs)
+                registro['linhas'] = _linhas(resultado)
+            return resultado
+        return medida
+    return decorador
+
+
+class _RespostaMetricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        corpo = METRICAS.texto_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        # As coletas periódicas não poluem o log da aplicação
+        pass
+
+
+_servidor = None
+_trava_servidor = threading.Lock()
+
+
+def iniciar_servidor(porta=PORTA_METRICAS, endereco='127.0.0.1'):
+    # Inicia (uma única vez por processo) o endpoint /metrics em uma thread de fundo
+    global _servidor
+    with _trava_servidor:
+        if _servidor is None and porta:
+            _servidor = ThreadingHTTPServer((endereco, porta), _RespostaMetricas)
+            threading.Thread(target=_servidor.serve_forever, name='relorc-metricas', daemon=True).start()
+    return _servidor
+
+
+def tabela_execucao():
+    # Etapas da execução atual agrupadas, para o painel de desempenho
+    etapas = pd.DataFrame(METRICAS.execucao(), columns=['etapa', 'detalhe', 'segundos', 'linhas', 'memoria'])
+    if etapas.empty:
+        return etapas
+    etapas['detalhe'] = etapas['detalhe'].fillna('')
+    tabela = etapas.groupby(['etapa', 'detalhe'], sort=False).agg(
+        chamadas=('segundos', 'size'), ms=('segundos', 'sum'), linhas=('linhas', 'sum'), memoria_kb=('memoria', 'sum'))
+    tabela['ms'] = (tabela['ms'] * 1000).round(2)
+    if MEDIR_MEMORIA:
+        tabela['memoria_kb'] = (tabela['memoria_kb'] / 1024).round(1)
+    else:
+        tabela = tabela.drop(columns='memoria_kb')
+    return tabela.reset_index()
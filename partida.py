@@ -0,0 +1,148 @@
+import os
+import pickle
+import tempfile
+import threading
+
+from cache import CACHE
+from metricas import etapa
+
+# Partida rápida: ao final das execuções em que os dados carregados mudaram, o processo grava em um único
+# arquivo os dados já limpos e os índices; o próximo processo os restaura antes de carregar qualquer fonte. Cada entrada continua validada pela sua assinatura (data de modificação
+# e tamanho dos arquivos), então uma fonte alterada depois da gravação é relida normalmente.
+# Desligada por padrão; o arquivo é um pickle e deve ser gravado apenas pela própria aplicação:
+#   RELORC_PARTIDA=./dados/partida.pickle
+ARQUIVO_PARTIDA = os.environ.get('RELORC_PARTIDA', '')
+
+_trava = threading.Lock()
+# 'pendente': último conteúdo ainda não gravado; 'gravando': a thread de gravação está ativa
+_estado = {'restaurado': False, 'gravado': None, 'pendente': None, 'gravando': False}
+
+# Entradas do cache gravadas: as tabelas carregadas das fontes e os índices sobre elas. Os resultados de
+# cada seleção (participações, quadros do último ano) ficam de fora do arquivo e da verificação de mudança:
+# surgem a cada clique e são refeitos rapidamente a partir dos índices
+TIPOS_GRAVADOS = {'siconfi', 'particoes', 'snapshot', 'xlsx', 'rankings', 'indice'}
+
+
+class _Referencia:
+    # Assinatura formada pelo id de um objeto do cache (os índices): no processo seguinte ela é refeita
+    # com o id do objeto restaurado
+
+    def __init__(self, objeto):
+        self.objeto = objeto
+
+
+def _assinatura_por_id(assinatura):
+    return isinstance(assinatura, int) or (
+        isinstance(assinatura, tuple) and bool(assinatura) and all(isinstance(valor, int) for valor in assinatura))
+
+
+def _exportar_assinatura(assinatura, objetos):
+    # Devolve None quando o objeto identificado pela assinatura não está mais no cache
+    if not _assinatura_por_id(assinatura):
+        return assinatura
+    valores = assinatura if isinstance(assinatura, tuple) else (assinatura,)
+    if not all(valor in objetos for valor in valores):
+        return None
+    referencias = tuple(_Referencia(objetos[valor]) for valor in valores)
+    return referencias if isinstance(assinatura, tuple) else referencias[0]
+
+
+def _restaurar_assinatura(assinatura):
+    if isinstance(assinatura, _Referencia):
+        return id(assinatura.objeto)
+    if isinstance(assinatura, tuple) and assinatura and all(isinstance(valor, _Referencia) for valor in assinatura):
+        return tuple(id(valor.objeto) for valor in assinatura)
+    return assinatura
+
+
+def _itens_gravados():
+    return [item for item in CACHE.exportar() if item[0][0] in TIPOS_GRAVADOS]
+
+
+def _estado_cache(itens):
+    # Conjunto, sem ordem, das entradas e das versões das fontes de cada uma: consultar dados já
+    # carregados (que só reordena o LRU) não provoca uma nova gravação
+    return frozenset((chave, assinatura) for chave, assinatura, _ in itens)
+
+
+def exportar():
+    itens = _itens_gravados()
+    objetos = {id(valor): valor for _, _, valor in itens}
+    dados = []
+    for chave, assinatura, valor in itens:
+        assinatura = _exportar_assinatura(assinatura, objetos)
+        if assinatura is not None:
+            dados.append((chave, assinatura, valor))
+    return _estado_cache(itens), {'dados': dados}
+
+
+def gravar(conteudo, arquivo=ARQUIVO_PARTIDA):
+    # Grava em um arquivo temporário e o substitui de uma vez: uma leitura simultânea nunca vê um arquivo parcial
+    descritor, temporario = tempfile.mkstemp(prefix=os.path.basename(arquivo) + '.',
+                                             dir=os.path.dirname(os.path.abspath(arquivo)))
+    try:
+        with os.fdopen(descritor, 'wb') as saida:
+            pickle.dump(conteudo, saida, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, arquivo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def restaurar_partida(arquivo=ARQUIVO_PARTIDA):
+    # Executada uma vez por processo, antes do primeiro acesso aos dados
+    with _trava:
+        if _estado['restaurado'] or not arquivo:
+            return
+        _estado['restaurado'] = True
+        if not os.path.exists(arquivo):
+            return
+        with etapa('restaurar_partida'):
+            try:
+                with open(arquivo, 'rb') as entrada:
+                    conteudo = pickle.load(entrada)
+            except Exception:
+                # A partida rápida é apenas uma otimização: um arquivo ilegível é ignorado e regravado
+                return
+            CACHE.restaurar([(chave, _restaurar_assinatura(assinatura), valor)
+                             for chave, assinatura, valor in conteudo['dados']])
+            _estado['gravado'] = _estado_cache(_itens_gravados())
+
+
+def _gravar_pendentes():
+    # Grava sempre o conteúdo mais recente: as mudanças feitas durante uma gravação resultam em uma
+    # única gravação seguinte, e os estados intermediários são descartados sem nunca ir para o disco
+    while True:
+        with _trava:
+            pendente = _estado['pendente']
+            _estado['pendente'] = None
+            if pendente is None:
+                _estado['gravando'] = False
+                return
+        conteudo, arquivo = pendente
+        with etapa('gravar_partida'):
+            try:
+                gravar(conteudo, arquivo)
+            except Exception:
+                with _trava:
+                    _estado['gravado'] = None
+
+
+def salvar_partida(arquivo=ARQUIVO_PARTIDA):
+    # Chamada ao final de cada execução: grava em segundo plano somente se os dados carregados mudaram
+    if not arquivo:
+        return
+    with _trava:
+        estado, conteudo = exportar()
+        if estado == _estado['gravado']:
+            return
+        _estado['gravado'] = estado
+        _estado['pendente'] = (conteudo, arquivo)
+        if _estado['gravando']:
+            return
+        _estado['gravando'] = True
+
+    # Uma única thread de gravação por vez, que termina quando não há mais nada pendente. As execuções do
+    # Streamlit rodam em threads daemon; a gravação não pode ser interrompida no encerramento do processo,
+    # então a thread é criada explicitamente como não daemon
+    threading.Thread(target=_gravar_pendentes, name='relorc-partida', daemon=False).start()
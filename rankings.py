@@ -0,0 +1,117 @@
+import pandas as pd
+
+from calculos import calcular_participacao
+from limpeza import normalizar_texto
+
+# Indicadores da planilha de receitas e despesas e da planilha CAPAG usados nos rankings
+INDICADORES_REC_DESP = ['Receita_Total', 'Despesa_Total']
+INDICADORES_CAPAG = ['Indicador 1', 'Indicador 2', 'Indicador 3']
+
+CONTA_RCL = normalizar_texto('RECEITA CORRENTE LÍQUIDA (III) = (I - II)')
+
+COLUNAS_RANKING = ['municipio', 'uf', 'ano', 'indicador', 'valor']
+
+# Prefixo dos indicadores de participação de cada conta na RCL
+PREFIXO_RCL = 'RCL % '
+
+# Códigos IBGE das UFs: o código de um município tem 7 dígitos e começa pelo código da sua UF
+CODIGOS_UF = {11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29, 31, 32, 33, 35, 41, 42, 43, 50, 51,
+              52, 53}
+
+
+def _formato_longo(df, municipio, uf, ano, indicadores):
+    longo = df.melt(id_vars=[municipio, uf, ano], value_vars=indicadores, var_name='indicador', value_name='valor')
+    longo.columns = COLUNAS_RANKING
+    # Valores não numéricos (ex.: 'n.d.' nos indicadores CAPAG) ficam fora do ranking
+    longo['valor'] = pd.to_numeric(longo['valor'], errors='coerce')
+    return longo
+
+
+def indicadores_rec_desp(df):
+    return _formato_longo(df, 'id_municipio', 'uf', 'ano', INDICADORES_REC_DESP)
+
+
+def indicadores_capag(df):
+    return _formato_longo(df, 'cod', 'UF', 'ano', INDICADORES_CAPAG)
+
+
+def _categorias_texto(serie, prefixo=''):
+    # Coluna categórica com as categorias em texto, sem montar um texto por linha
+    serie = serie.astype('category')
+    return serie.cat.rename_categories([prefixo + str(categoria) for categoria in serie.cat.categories])
+
+
+def indicadores_participacao_rcl(df_rec):
+    # Participação de cada conta na Receita Corrente Líquida, por município e ano (requer a coluna 'Cod.IBGE').
+    # Colunas de texto como categorias: a tabela tem uma linha por município, ano e conta.
+    # Apenas as prefeituras entram no ranking: instituições estaduais e outras sem código de município são
+    # descartadas antes do cálculo
+    df = df_rec[['Cod.IBGE', 'UF', 'Instituição', 'Ano', 'Conta_Normalizada', 'Valor']]
+    codigo = pd.to_numeric(df['Cod.IBGE'], errors='coerce')
+    df = df[codigo.between(1_000_000, 9_999_999) & (codigo // 100_000).isin(CODIGOS_UF)]
+    df = df.assign(valor=calcular_participacao(df, CONTA_RCL, ('UF', 'Instituição', 'Ano')))
+    df = df[df['Conta_Normalizada'] != CONTA_RCL].drop_duplicates(['Cod.IBGE', 'Ano', 'Conta_Normalizada'])
+    return pd.DataFrame({
+        'municipio': _categorias_texto(df['Cod.IBGE']),
+        'uf': _categorias_texto(df['UF']),
+        'ano': _categorias_texto(df['Ano']),
+        'indicador': _categorias_texto(df['Conta_Normalizada'], PREFIXO_RCL),
+        'valor': df['valor'],
+    })
+
+
+def calcular_ranking(longo):
+    # Posição 1 corresponde ao maior valor; o percentil é a fração de municípios com valor menor ou igual
+    longo = longo.dropna(subset=['valor']).reset_index(drop=True)
+    for sufixo, grupos in (('uf', ['ano', 'indicador', 'uf']), ('nacional', ['ano', 'indicador'])):
+        valores = longo.groupby(grupos, observed=True)['valor']
+        longo[f'posicao_{sufixo}'] = valores.rank(method='min', ascending=False).astype('int32')
+        longo[f'total_{sufixo}'] = valores.transform('count').astype('int32')
+        longo[f'percentil_{sufixo}'] = (valores.rank(method='max', pct=True) * 100).astype('float32')
+
+    # Tabela compacta, ordenada por município para a consulta por fatias
+    for coluna in ('municipio', 'uf', 'ano', 'indicador'):
+        longo[coluna] = longo[coluna].astype('category')
+    return longo.sort_values(['municipio', 'ano', 'indicador']).reset_index(drop=True)
+
+
+def construir_rankings(rec_desp, capag, receitas=None, participacoes=None):
+    # `participacoes` permite informar as participações na RCL já calculadas (ex.: UF por UF, na ingestão em blocos)
+    partes = [indicadores_rec_desp(rec_desp), indicadores_capag(capag)]
+    if participacoes is not None:
+        partes.append(participacoes)
+    elif receitas is not None and 'Cod.IBGE' in receitas.columns:
+        partes.append(indicadores_participacao_rcl(receitas))
+    return calcular_ranking(pd.concat(partes, ignore_index=True))
+
+
+
+def tabela_posicao(ranking_municipio, indicadores=INDICADORES_REC_DESP + INDICADORES_CAPAG):
+    # Tabela exibida na página: posição do município no ano mais recente disponível
+    df = ranking_municipio[ranking_municipio['indicador'].isin(indicadores)]
+    if df.empty:
+        return None, df
+    ano = df['ano'].astype(str).max()
+    df = df[df['ano'] == ano]
+    tabela = pd.DataFrame({
+        'Indicador': df['indicador'].astype(str),
+        'Valor': df['valor'],
+        'Posição na UF': df['posicao_uf'].astype(str) + ' de ' + df['total_uf'].astype(str),
+        'Percentil na UF': df['percentil_uf'].round(1),
+        'Posição no Brasil': df['posicao_nacional'].astype(str) + ' de ' + df['total_nacional'].astype(str),
+        'Percentil no Brasil': df['percentil_nacional'].round(1),
+    })
+    return ano, tabela.reset_index(drop=True)
+
+
+def tabela_participacao_rcl(ranking_municipio):
+    # Posição do município na participação de cada conta na RCL (disponível quando a ingestão leu os
+    # CSVs do Siconfi), no ano mais recente disponível
+    indicadores = [indicador for indicador in ranking_municipio['indicador'].astype(str).unique()
+                   if indicador.startswith(PREFIXO_RCL)]
+    ano, tabela = tabela_posicao(ranking_municipio, indicadores)
+    if ano is None:
+        return ano, tabela
+    tabela = tabela.rename(columns={'Indicador': 'Conta', 'Valor': '% da RCL'})
+    tabela['Conta'] = tabela['Conta'].str.removeprefix(PREFIXO_RCL)
+    return ano, tabela.sort_values('Conta').reset_index(drop=True)
@@ -1,107 +1,79 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
-import glob
-import unicodedata
-import re
-
-def normalizar_texto(texto):
-    if pd.isnull(texto):
-        return ''
-    # Remover acentuação
-    texto = ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn')
-    # Remover caracteres especiais
-    texto = re.sub(r'[^\w\s]', '', texto)
-    # Converter para maiúsculas e remover espaços extras
-    texto = texto.upper().strip()
-    return texto
 
-def main():
-    # Definir o caminho onde estão seus arquivos CSV
-    caminho_desp = './Despesas/'  # Coloque './Despesas/' se a pasta Despesas estiver na mesma pasta que o script
-    caminho_rec = './Receitas/'
-
-    # Usar glob para encontrar todos os arquivos CSV no caminho
-    arquivos_desp = glob.glob(caminho_desp + "*.csv")
-    arquivos_rec = glob.glob(caminho_rec + "*.csv")
-
-    # Carregar e concatenar todos os arquivos CSV
-    df_desp = pd.concat(
-        [pd.read_csv(arquivos, encoding='ISO-8859-1', sep=';', on_bad_lines='skip') for arquivos in arquivos_desp],
-        ignore_index=True)
-
-    df_rec = pd.concat(
-        [pd.read_csv(arquivos, encoding='ISO-8859-1', sep=';', on_bad_lines='skip') for arquivos in arquivos_rec],
-        ignore_index=True)
-
-    # Converter a coluna 'Ano' para string
-    df_rec['Ano'] = df_rec['Ano'].astype(str)
-    df_desp['Ano'] = df_desp['Ano'].astype(str)
-
-    # Limpar e converter os valores da coluna 'Valor' para numérico
-    df_rec['Valor'] = df_rec['Valor'].replace({r'\.': '', r',': '.', r'[^\d\.]': ''}, regex=True)
-    df_rec['Valor'] = pd.to_numeric(df_rec['Valor'], errors='coerce')
-
-    df_desp['Valor'] = df_desp['Valor'].replace({r'\.': '', r',': '.', r'[^\d\.]': ''}, regex=True)
-    df_desp['Valor'] = pd.to_numeric(df_desp['Valor'], errors='coerce')
-
-
-    # Normalizar os nomes das contas
-    df_rec['Conta_Normalizada'] = df_rec['Conta'].apply(normalizar_texto)
-    df_desp['Conta_Normalizada'] = df_desp['Conta'].apply(normalizar_texto)
-
-    # Normalizar outras colunas se necessário
-    df_rec['UF'] = df_rec['UF'].str.strip().str.upper()
-    df_rec['Instituição'] = df_rec['Instituição'].str.strip().str.upper()
-
-    df_desp['UF'] = df_desp['UF'].str.strip().str.upper()
-    df_desp['Instituição'] = df_desp['Instituição'].str.strip().str.upper()
+from antecipacao import ANTECIPACAO
+from carregamento import DadosPagina
+from comparacao import MAXIMO_MUNICIPIOS, NOTAS_CAPAG
+from evolucao import contas_instituicao, selecao_despesa, selecao_receita
+from graficos import (COLUNAS_DESPESA, COLUNAS_RECEITA, GRAFICOS, grafico_comparacao_despesa,
+                      grafico_comparacao_receita, grafico_comparacao_total, grafico_despesa_municipio,
+                      grafico_receita_municipio)
+from limpeza import normalizar_texto
+from metricas import DEBUG, METRICAS, etapa, iniciar_servidor, tabela_execucao
+from partida import restaurar_partida, salvar_partida
+from rankings import INDICADORES_CAPAG, tabela_participacao_rcl, tabela_posicao
+from relatorio import formatar_indicador, tabela_capag
+
+# Conjuntos de dados usados por cada página (carregados apenas quando a página é exibida)
+PAGINAS = {
+    'Relatório Orçamentário': ['relatorio', 'rankings'],
+    'Evolução da Receita': ['receitas', 'ultimo_ano_receitas'],
+    'Evolução da Despesa': ['despesas', 'ultimo_ano_despesas'],
+    'Comparação de Municípios': ['comparacao'],
+}
+
+def exibir_grafico(especificacao):
+    with etapa('renderizar'):
+        st.vega_lite_chart(especificacao, use_container_width=True)
+
+
+def painel_desempenho():
+    # Painel opcional (RELORC_DEBUG=1) com o tempo de cada etapa da execução atual
+    with st.sidebar.expander('Desempenho'):
+        st.dataframe(tabela_execucao(), use_container_width=True)
 
 
+def main():
     # Atualizar o nome da conta de referência
     conta_receita_corrente_normalizada = normalizar_texto('RECEITA CORRENTE LÍQUIDA (III) = (I - II)')
     conta_despesa_corrente_normalizada = normalizar_texto('DESPESAS (EXCETO INTRA-ORÇAMENTÁRIAS) (I)')
     
     # Criar uma barra lateral para a navegação entre as páginas
-    page = st.sidebar.selectbox('Escolha a Página', ['Relatório Orçamentário', 'Evolução da Receita','Evolução da Despesa'])
-
-    if page == 'Relatório Orçamentário':
-            # Carregar os dados
-        df = pd.read_excel('rec_desp_full.xlsx')
-        df_2 = pd.read_excel('capag_full.xlsx')
+    page = st.sidebar.selectbox('Escolha a Página', list(PAGINAS))
+    dados = DadosPagina(PAGINAS[page])
 
-        # Convertendo colunas para string
-        df['id_municipio'] = df['id_municipio'].astype(str)
-        df['ano'] = df['ano'].astype(str)
-        df_2['cod'] = df_2['cod'].astype(str)
-        df_2['ano'] = df_2['ano'].astype(str)
+    # Na primeira execução do processo, restaurar os dados e índices gravados pelo processo anterior
+    # (RELORC_PARTIDA); a barra lateral já foi enviada ao navegador
+    restaurar_partida()
 
-        # Título da aplicação
+    if page == 'Relatório Orçamentário':
+        # Título da aplicação (exibido antes do carregamento dos dados)
         st.title("Relatório Orçamentário Municipal (2020-23)")
 
-        # Ordenar a lista de estados em ordem alfabética
-        estados = sorted(df['uf'].unique())
+        # Carregar os dados (receitas/despesas e CAPAG já unidas pelo código do município)
+        indice_relatorio = dados['relatorio']
+
+        # Lista de estados em ordem alfabética
+        estados = indice_relatorio.ufs
 
         # Selectbox para selecionar o estado na barra lateral
         estado_selecionado = st.sidebar.selectbox('Selecione o Estado', estados)
 
-        # Filtrar e ordenar os municípios com base no estado selecionado
-        municipios = sorted(df[df['uf'] == estado_selecionado]['municipio'].unique())
+        # Municípios do estado selecionado, em ordem alfabética
+        municipios = indice_relatorio.municipios(estado_selecionado)
 
         # Selectbox para selecionar o município na barra lateral
         municipio_selecionado = st.sidebar.selectbox('Selecione o Município', municipios)
 
         # Verificar se um município foi selecionado
         if municipio_selecionado:
-            # Filtrar o DataFrame para o município selecionado
-            df_filtrado = df[df['municipio'] == municipio_selecionado]
-            df_despesas = df[df['municipio'] == municipio_selecionado]
-
-            # Filtrar o DataFrame df_2 para obter a Nota Capag do município selecionado
-            df_capag = df_2[df_2['Nome_Município'] == municipio_selecionado]
+            # Dados das duas planilhas para o município selecionado, em uma única consulta pelo código
+            codigo_municipio = indice_relatorio.codigo(estado_selecionado, municipio_selecionado)
+            df_filtrado, df_capag = indice_relatorio.municipio(codigo_municipio)
+            df_despesas = df_filtrado
 
-            # Remover as duas primeiras colunas e ordenar cronologicamente
-            df_capag_exibicao = df_capag.drop(columns=['cod']).sort_values(by='ano').reset_index(drop=True)
+            # Remover o código do município e ordenar cronologicamente
+            df_capag_exibicao = tabela_capag(df_capag)
             
             # Exibir os gráficos somente se houver dados para o município selecionado
             if not df_filtrado.empty and not df_despesas.empty:
@@ -110,40 +82,13 @@ def main():
                 # Gráfico de Receita
                 st.write(f'Evolução da composição da Receita Total do município {municipio_selecionado} ({estado_selecionado})')
                 
-                # Gráfico de barras empilhadas para as receitas correntes, de capital e intraorçamentárias
-                barras_receita = alt.Chart(df_filtrado).transform_fold(
-                    ['Receita_Corrente', 'Receita_Capital', 'Receita_Intra_Orcamentaria'],
-                    as_=['Tipo_Receita', 'Valor']
-                ).mark_bar().encode(
-                    x=alt.X('ano:O', title='Ano'),
-                    y=alt.Y('Valor:Q', title='Valores das Receitas'),
-                    color=alt.Color('Tipo_Receita:N', legend=alt.Legend(orient='bottom')),
-                    tooltip=[
-                        alt.Tooltip('ano:O', title='Ano'), 
-                        alt.Tooltip('Tipo_Receita:N', title='Tipo de Receita'), 
-                        alt.Tooltip('Valor:Q', title='Valor', format=",.2f", formatType='number')  # Formatação de moeda
-                    ]
-                )
-
-                # Gráfico de linha para Receita Total
-                linha_receita = alt.Chart(df_filtrado).mark_line(color='black', size=2).encode(
-                    x=alt.X('ano:O', title='Ano'),
-                    y=alt.Y('Receita_Total:Q', title='Receita Total'),
-                    tooltip=[
-                        alt.Tooltip('ano:O', title='Ano'), 
-                        alt.Tooltip('Receita_Total:Q', title='Receita Total', format=",.2f", formatType='number')  # Formatação de moeda
-                    ]
-                )
-
-                # Combinar ambos os gráficos de receita e definir o uso da largura total
-                chart_receita = (barras_receita + linha_receita).properties(
-                    width='container',  # Ajusta a largura ao tamanho do container
-                    height=400,
-                    title="Evolução da Receita Total e Composição das Receitas"
-                )
+                # Barras empilhadas das receitas correntes, de capital e intraorçamentárias e linha da Receita Total.
+                # A especificação do gráfico é reaproveitada entre sessões enquanto os dados não mudarem.
+                chart_receita = GRAFICOS.obter((page, 'receita', codigo_municipio), indice_relatorio,
+                                               lambda: grafico_receita_municipio(df_filtrado))
 
                 # Exibir o gráfico de receita
-                st.altair_chart(chart_receita, use_container_width=True)
+                exibir_grafico(chart_receita)
                 
                 # Fonte de dados
                 st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
@@ -152,40 +97,12 @@ def main():
                 # Gráfico de Despesa
                 st.write(f'Evolução da composição das Despesas do município {municipio_selecionado}')
                 
-                # Gráfico de barras empilhadas para as despesas correntes, de capital e intraorçamentárias com cores personalizadas
-                barras_despesa = alt.Chart(df_despesas).transform_fold(
-                    ['Despesa_Corrente', 'Despesa_Capital', 'Despesa_Intra_Orcamentaria'],
-                    as_=['Tipo_Despesa', 'Valor']
-                ).mark_bar().encode(
-                    x=alt.X('ano:O', title='Ano'),
-                    y=alt.Y('Valor:Q', title='Valores das Despesas'),
-                    color=alt.Color('Tipo_Despesa:N', scale=alt.Scale(range=['#FF6666', '#FFB266', '#FFCC66']), legend=alt.Legend(orient='bottom')),  # Cores personalizadas
-                    tooltip=[
-                        alt.Tooltip('ano:O', title='Ano'), 
-                        alt.Tooltip('Tipo_Despesa:N', title='Tipo de Despesa'), 
-                        alt.Tooltip('Valor:Q', title='Valor', format=",.2f", formatType='number')  # Formatação de moeda
-                    ]
-                )
-
-                # Gráfico de linha para Despesa Total
-                linha_despesa = alt.Chart(df_despesas).mark_line(color='red', size=2).encode(
-                    x=alt.X('ano:O', title='Ano'),
-                    y=alt.Y('Despesa_Total:Q', title='Despesa Total'),
-                    tooltip=[
-                        alt.Tooltip('ano:O', title='Ano'), 
-                        alt.Tooltip('Despesa_Total:Q', title='Despesa Total', format=",.2f", formatType='number')  # Formatação de moeda
-                    ]
-                )
-
-                # Combinar ambos os gráficos de despesa e definir o uso da largura total
-                chart_despesa = (barras_despesa + linha_despesa).properties(
-                    width='container',  # Ajusta a largura ao tamanho do container
-                    height=400,
-                    title="Evolução da Despesa Total e Composição das Despesas"
-                )
+                # Barras empilhadas das despesas correntes, de capital e intraorçamentárias e linha da Despesa Total
+                chart_despesa = GRAFICOS.obter((page, 'despesa', codigo_municipio), indice_relatorio,
+                                               lambda: grafico_despesa_municipio(df_despesas))
 
                 # Exibir o gráfico de despesa
-                st.altair_chart(chart_despesa, use_container_width=True)
+                exibir_grafico(chart_despesa)
 
                 # Fonte de dados
                 st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
@@ -193,7 +110,9 @@ def main():
 
                 # Exibir a tabela da Nota Capag sem as duas primeiras colunas e ordenada
                 st.write(f"Tabela com dados da Nota Capag para o município {municipio_selecionado} ({estado_selecionado})")
-                st.dataframe(df_capag_exibicao, use_container_width=True)  # Mostrar o DataFrame filtrado e ajustado na tabela
+                # Indicadores numéricos; os ausentes aparecem como 'n.d.' apenas na exibição
+                st.dataframe(df_capag_exibicao.style.format(formatar_indicador, subset=INDICADORES_CAPAG),
+                             use_container_width=True)  # Mostrar o DataFrame filtrado e ajustado na tabela
 
                 # Texto explicativo sobre os indicadores e notas CAPAG
                 st.write("""
@@ -228,6 +147,21 @@ def main():
                 st.markdown('<h6>Fonte: <a href="https://www.tesourotransparente.gov.br/temas/estados-e-municipios/capacidade-de-pagamento-capag">Capacidade de Pagamento (CAPAG)</a></h6>',unsafe_allow_html=True)
                 st.markdown("---") 
 
+                # Posição do município entre os demais municípios da UF e do país (rankings pré-calculados)
+                ranking_municipio = dados['rankings'].municipio(codigo_municipio)
+                ano_ranking, df_posicao = tabela_posicao(ranking_municipio)
+                if ano_ranking is not None:
+                    st.write(f"Posição do município {municipio_selecionado} ({estado_selecionado}) entre os municípios da UF e do Brasil em {ano_ranking} (posição 1 = maior valor)")
+                    st.dataframe(df_posicao, use_container_width=True)
+                    st.markdown("---")
+
+                # Participação de cada conta na Receita Corrente Líquida, comparada entre os municípios
+                ano_rcl, df_rcl = tabela_participacao_rcl(ranking_municipio)
+                if ano_rcl is not None:
+                    st.write(f"Posição do município {municipio_selecionado} ({estado_selecionado}) na participação de cada conta na Receita Corrente Líquida em {ano_rcl} (posição 1 = maior percentual)")
+                    st.dataframe(df_rcl, use_container_width=True)
+                    st.markdown("---")
+
             else:
                 st.write("Não há dados disponíveis para o município selecionado.")
         else:
@@ -243,56 +177,31 @@ def main():
         # Página Evolução da Receita
         st.title("Evolução da Receita por Instituição")
 
+        # Dados do Siconfi já limpos e indexados por UF e Instituição
+        indice_rec = dados['receitas']
+
         # Seleção de UF, Instituição e Conta
-        ufs = sorted(df_rec['UF'].unique())
+        ufs = indice_rec.ufs
         uf_selecionada = st.sidebar.selectbox('Selecione a UF', ufs)
 
-        instituicoes = sorted(df_rec[df_rec['UF'] == uf_selecionada]['Instituição'].unique())
+        instituicoes = indice_rec.instituicoes(uf_selecionada)
         instituicao_selecionada = st.sidebar.selectbox('Selecione a Instituição', instituicoes)
 
         # Normalizar o nome da instituição selecionada
         instituicao_selecionada_normalizada = normalizar_texto(instituicao_selecionada)
 
         # Filtrar os dados com base nas seleções de UF e Instituição
-        df_filtrado_instituicao = df_rec[
-            (df_rec['UF'] == uf_selecionada) &
-            (df_rec['Instituição'] == instituicao_selecionada)
-        ]
-
-        # Identificar o último ano da série
-        ultimo_ano = df_filtrado_instituicao['Ano'].max()
-
-        # Filtrar os dados para o último ano
-        df_ultimo_ano = df_filtrado_instituicao[df_filtrado_instituicao['Ano'] == ultimo_ano]
-
-        # Filtrar os dados da receita corrente líquida
-        df_receita_corrente_ultimo_ano = df_ultimo_ano[df_ultimo_ano['Conta_Normalizada'] == conta_receita_corrente_normalizada]
-
-        # **Novo**: Obter o valor da população para 2023 a partir da coluna 'População' (ajuste o nome da coluna conforme necessário)
-        df_populacao_2023 = df_rec[
-            (df_rec['UF'] == uf_selecionada) &
-            (df_rec['Instituição'] == instituicao_selecionada) &
-            (df_rec['Ano'] == '2023')
-        ]
-
-        if 'População' in df_populacao_2023.columns:
-            populacao_2023 = df_populacao_2023['População'].values[0]
-        else:
-            populacao_2023 = None
+        df_filtrado_instituicao = indice_rec.instituicao(uf_selecionada, instituicao_selecionada)
 
-        if not df_receita_corrente_ultimo_ano.empty:
-            receita_corrente_valor = df_receita_corrente_ultimo_ano['Valor'].values[0]
+        # Quadro do último ano da série (contas ordenadas por participação, já sem as contas do topo),
+        # pré-calculado na ingestão para todas as instituições
+        quadro = dados['ultimo_ano_receitas'].instituicao(uf_selecionada, instituicao_selecionada)
+        ultimo_ano = quadro['ano']
 
-            # Calcular a participação percentual de cada conta no último ano
-            df_ultimo_ano['Percentual'] = df_ultimo_ano.apply(
-                lambda row: (row['Valor'] / receita_corrente_valor) * 100 if pd.notna(row['Valor']) else None, axis=1)
-
-            # Ordenar as contas por percentual em ordem decrescente
-            df_ultimo_ano_ordenado = df_ultimo_ano.sort_values(by='Percentual', ascending=False)
-
-            # Remover as 4 primeiras contas
-            df_ultimo_ano_restante = df_ultimo_ano_ordenado.iloc[4:]
+        # População de 2023, se disponível
+        populacao_2023 = quadro['populacao']
 
+        if quadro['referencia']:
             # Exibir o resumo das contas restantes com percentual ordenado
             st.write(f"### Participação percentual na Receita Corrente Líquida ({ultimo_ano}) para {instituicao_selecionada}:")
             
@@ -304,71 +213,34 @@ def main():
             colunas_por_linha = 3
 
             # Dividir os dados em blocos de linhas com 3 colunas
-            for inicio in range(0, len(df_ultimo_ano_restante), colunas_por_linha):
+            contas_ultimo_ano = quadro['contas']
+            for inicio in range(0, len(contas_ultimo_ano), colunas_por_linha):
                 cols = st.columns(colunas_por_linha)
-                for idx, (i, row) in enumerate(df_ultimo_ano_restante.iloc[inicio:inicio + colunas_por_linha].iterrows()):
+                for idx, (conta, percentual) in enumerate(contas_ultimo_ano[inicio:inicio + colunas_por_linha]):
                     with cols[idx]:
-                        st.metric(label=row['Conta'], value=f"{row['Percentual']:.2f}%")
+                        st.metric(label=conta, value=f"{percentual:.2f}%")
         else:
             st.write(f"Nenhum dado disponível para 'Receita Corrente Líquida' no ano {ultimo_ano}.")
 
         # Seleção de Conta
-        contas = sorted(df_filtrado_instituicao['Conta'].unique())
+        contas = contas_instituicao(df_filtrado_instituicao)
         conta_selecionada = st.selectbox('Selecione a Conta', contas)
 
         # Normalizar o nome da conta selecionada
         conta_selecionada_normalizada = normalizar_texto(conta_selecionada)
 
-        # Filtrar os dados com base nas seleções de conta
-        df_filtrado = df_rec[
-            (df_rec['UF'] == uf_selecionada) &
-            (df_rec['Instituição'] == instituicao_selecionada) &
-            (df_rec['Ano'].between('2015', '2023'))
-        ]
-
-        # Verificar se os dados foram filtrados corretamente
-        #st.write("Dados filtrados após as seleções:")
-        #st.write(df_filtrado[['Ano', 'Conta', 'Valor']])
-
-        def calcular_percentual(row, df_filtrado):
-            receita_corrente_liquida = df_filtrado[
-                (df_filtrado['Conta_Normalizada'] == conta_receita_corrente_normalizada) & 
-                (df_filtrado['Ano'] == row['Ano'])
-            ]
-            if not receita_corrente_liquida.empty:
-                valor_receita_corrente = receita_corrente_liquida['Valor'].values[0]
-                valor_atual = row['Valor']
-                if pd.notna(valor_receita_corrente) and pd.notna(valor_atual):
-                    return (valor_atual / valor_receita_corrente) * 100
-            return None
-
-        # Aplicar a função para calcular o percentual
-        df_filtrado['Percentual_Receita'] = df_filtrado.apply(
-            lambda row: calcular_percentual(row, df_filtrado) if row['Conta_Normalizada'] == conta_selecionada_normalizada else None, axis=1
-        )
-
-        # Verificar se o percentual foi calculado corretamente
-        #st.write("Dados com Percentual Receita calculado:")
-        #st.write(df_filtrado[['Ano', 'Conta', 'Valor', 'Percentual_Receita']])
+        # Registrar a seleção exibida (taxa de acerto da antecipação)
+        ANTECIPACAO.consultar((page, uf_selecionada, instituicao_selecionada, conta_selecionada))
 
-        # Filtrar os dados da conta escolhida ao longo do tempo
-        df_evolucao_conta = df_rec[
-            (df_rec['UF'] == uf_selecionada) &
-            (df_rec['Instituição'] == instituicao_selecionada) &
-            (df_rec['Conta_Normalizada'] == conta_selecionada_normalizada) &
-            (df_rec['Ano'].between('2015', '2023'))
-        ]
+        # Linhas de 2015-2023 com o percentual da conta selecionada sobre a Receita Corrente Líquida e
+        # gráficos da conta (as mesmas funções usadas na antecipação das próximas seleções)
+        df_filtrado, chart_conta, chart_receita = selecao_receita(
+            page, indice_rec, uf_selecionada, instituicao_selecionada, conta_selecionada)
 
         # Gráfico de evolução da conta selecionada ao longo do tempo
-        if not df_evolucao_conta.empty:
+        if chart_conta is not None:
             st.write(f"Evolução da conta ({conta_selecionada}) ao longo do tempo (2015-2023)")
-            chart_conta = alt.Chart(df_evolucao_conta).mark_line().encode(
-                x=alt.X('Ano:O', title='Ano'),
-                y=alt.Y('Valor:Q', title=f'Valor da {conta_selecionada}'),
-                tooltip=[alt.Tooltip('Ano:O', title='Ano'),
-                        alt.Tooltip('Valor:Q', title='Valor', format=",.2f")]
-            ).properties(width='container', height=400)
-            st.altair_chart(chart_conta, use_container_width=True)
+            exibir_grafico(chart_conta)
         else:
             st.write(f"Não há dados disponíveis para a conta ({conta_selecionada}) entre 2015 e 2023.")
         
@@ -378,15 +250,9 @@ def main():
 
 
         # Gráfico de evolução da Receita (em barras)
-        if df_filtrado['Percentual_Receita'].notnull().sum() > 0:
+        if chart_receita is not None:
             st.write(f"Evolução da Receita ({conta_selecionada}) sobre a Receita Corrente Líquida (2015-2023)")
-            chart_receita = alt.Chart(df_filtrado.dropna(subset=['Percentual_Receita'])).mark_bar().encode(
-                x=alt.X('Ano:O', title='Ano'),
-                y=alt.Y('Percentual_Receita:Q', title=f'Percentual da {conta_selecionada} sobre Receita Corrente Líquida'),
-                tooltip=[alt.Tooltip('Ano:O', title='Ano'), 
-                        alt.Tooltip('Percentual_Receita:Q', title='Percentual', format=",.2f")]
-            ).properties(width='container', height=400)
-            st.altair_chart(chart_receita, use_container_width=True)
+            exibir_grafico(chart_receita)
         else:
             st.write("Nenhum dado disponível para calcular o percentual.")
         
@@ -413,6 +279,10 @@ def main():
         st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
         st.markdown("---")
 
+        # Antecipar em segundo plano as próximas seleções prováveis (instituições vizinhas e demais contas)
+        ANTECIPACAO.antecipar_evolucao(page, selecao_receita, indice_rec, dados['ultimo_ano_receitas'],
+                                       uf_selecionada, instituicao_selecionada, conta_selecionada)
+
 
         st.sidebar.markdown("---")
         st.sidebar.markdown(
@@ -424,56 +294,31 @@ def main():
         # Página Evolução da Despesa
         st.title("Evolução da Despesa por Instituição")
 
+        # Dados do Siconfi já limpos e indexados por UF e Instituição
+        indice_desp = dados['despesas']
+
         # Seleção de UF, Instituição e Conta
-        ufs = sorted(df_desp['UF'].unique())
+        ufs = indice_desp.ufs
         uf_selecionada = st.sidebar.selectbox('Selecione a UF', ufs)
 
-        instituicoes = sorted(df_desp[df_desp['UF'] == uf_selecionada]['Instituição'].unique())
+        instituicoes = indice_desp.instituicoes(uf_selecionada)
         instituicao_selecionada = st.sidebar.selectbox('Selecione a Instituição', instituicoes)
 
         # Normalizar o nome da instituição selecionada
         instituicao_selecionada_normalizada = normalizar_texto(instituicao_selecionada)
 
         # Filtrar os dados com base nas seleções de UF e Instituição
-        df_filtrado_instituicao = df_desp[
-            (df_desp['UF'] == uf_selecionada) &
-            (df_desp['Instituição'] == instituicao_selecionada)
-        ]
-
-        # Identificar o último ano da série
-        ultimo_ano = df_filtrado_instituicao['Ano'].max()
-
-        # Filtrar os dados para o último ano
-        df_ultimo_ano = df_filtrado_instituicao[df_filtrado_instituicao['Ano'] == ultimo_ano]
-
-        # Filtrar os dados da despesa corrente líquida (usando o mesmo nome de coluna para a despesa)
-        df_despesa_corrente_ultimo_ano = df_ultimo_ano[df_ultimo_ano['Conta_Normalizada'] == conta_despesa_corrente_normalizada]
-
-        # Obter o valor da população para 2023 a partir da coluna 'População'
-        df_populacao_2023 = df_desp[
-            (df_desp['UF'] == uf_selecionada) &
-            (df_desp['Instituição'] == instituicao_selecionada) &
-            (df_desp['Ano'] == '2023')
-        ]
-
-        if 'População' in df_populacao_2023.columns:
-            populacao_2023 = df_populacao_2023['População'].values[0]
-        else:
-            populacao_2023 = None
-
-        if not df_despesa_corrente_ultimo_ano.empty:
-            despesa_corrente_valor = df_despesa_corrente_ultimo_ano['Valor'].values[0]
+        df_filtrado_instituicao = indice_desp.instituicao(uf_selecionada, instituicao_selecionada)
 
-            # Calcular a participação percentual de cada conta no último ano
-            df_ultimo_ano['Percentual'] = df_ultimo_ano.apply(
-                lambda row: (row['Valor'] / despesa_corrente_valor) * 100 if pd.notna(row['Valor']) else None, axis=1)
+        # Quadro do último ano da série (contas ordenadas por participação, já sem as contas do topo),
+        # pré-calculado na ingestão para todas as instituições
+        quadro = dados['ultimo_ano_despesas'].instituicao(uf_selecionada, instituicao_selecionada)
+        ultimo_ano = quadro['ano']
 
-            # Ordenar as contas por percentual em ordem decrescente
-            df_ultimo_ano_ordenado = df_ultimo_ano.sort_values(by='Percentual', ascending=False)
-
-            # Remover as 4 primeiras contas
-            df_ultimo_ano_restante = df_ultimo_ano_ordenado.iloc[1:]
+        # População de 2023, se disponível
+        populacao_2023 = quadro['populacao']
 
+        if quadro['referencia']:
             # Exibir o resumo das contas restantes com percentual ordenado
             st.write(f"### Participação percentual na Despesa (EXCETO INTRA-ORÇAMENTÁRIAS) ({ultimo_ano}) para {instituicao_selecionada}:")
 
@@ -485,56 +330,34 @@ def main():
             colunas_por_linha = 3
 
             # Dividir os dados em blocos de linhas com 3 colunas
-            for inicio in range(0, len(df_ultimo_ano_restante), colunas_por_linha):
+            contas_ultimo_ano = quadro['contas']
+            for inicio in range(0, len(contas_ultimo_ano), colunas_por_linha):
                 cols = st.columns(colunas_por_linha)
-                for idx, (i, row) in enumerate(df_ultimo_ano_restante.iloc[inicio:inicio + colunas_por_linha].iterrows()):
+                for idx, (conta, percentual) in enumerate(contas_ultimo_ano[inicio:inicio + colunas_por_linha]):
                     with cols[idx]:
-                        st.metric(label=row['Conta'], value=f"{row['Percentual']:.2f}%")
+                        st.metric(label=conta, value=f"{percentual:.2f}%")
         else:
             st.write(f"Nenhum dado disponível para 'Despesa' no ano {ultimo_ano}.")
 
         # Seleção de Conta
-        contas = sorted(df_filtrado_instituicao['Conta'].unique())
+        contas = contas_instituicao(df_filtrado_instituicao)
         conta_selecionada = st.selectbox('Selecione a Conta', contas)
 
         # Normalizar o nome da conta selecionada
         conta_selecionada_normalizada = normalizar_texto(conta_selecionada)
 
-        # Filtrar os dados com base nas seleções de conta
-        df_filtrado = df_desp[
-            (df_desp['UF'] == uf_selecionada) &
-            (df_desp['Instituição'] == instituicao_selecionada) &
-            (df_desp['Ano'].between('2015', '2023'))
-        ]
-
-        # Função para calcular percentual
-        def calcular_percentual(row, df_filtrado):
-            despesa_corrente_liquida = df_filtrado[
-                (df_filtrado['Conta_Normalizada'] == conta_despesa_corrente_normalizada) & 
-                (df_filtrado['Ano'] == row['Ano'])
-            ]
-            if not despesa_corrente_liquida.empty:
-                valor_despesa_corrente = despesa_corrente_liquida['Valor'].values[0]
-                valor_atual = row['Valor']
-                if pd.notna(valor_despesa_corrente) and pd.notna(valor_atual):
-                    return (valor_atual / valor_despesa_corrente) * 100
-            return None
-
-        # Aplicar a função para calcular o percentual
-        df_filtrado['Percentual_Despesa'] = df_filtrado.apply(
-            lambda row: calcular_percentual(row, df_filtrado) if row['Conta_Normalizada'] == conta_selecionada_normalizada else None, axis=1
-        )
+        # Registrar a seleção exibida (taxa de acerto da antecipação)
+        ANTECIPACAO.consultar((page, uf_selecionada, instituicao_selecionada, conta_selecionada))
+
+        # Linhas de 2015-2023 com o percentual da conta selecionada sobre a Despesa (exceto
+        # intraorçamentárias) e gráficos da conta (as mesmas funções usadas na antecipação)
+        df_filtrado, chart_conta, chart_despesa = selecao_despesa(
+            page, indice_desp, uf_selecionada, instituicao_selecionada, conta_selecionada)
 
         # Gráfico de evolução da conta selecionada ao longo do tempo
-        if not df_filtrado.empty:
+        if chart_conta is not None:
             st.write(f"Evolução da conta ({conta_selecionada}) ao longo do tempo (2015-2023)")
-            chart_conta = alt.Chart(df_filtrado).mark_line().encode(
-                x=alt.X('Ano:O', title='Ano'),
-                y=alt.Y('Valor:Q', title=f'Valor da {conta_selecionada}'),
-                tooltip=[alt.Tooltip('Ano:O', title='Ano'),
-                        alt.Tooltip('Valor:Q', title='Valor', format=",.2f")]
-            ).properties(width='container', height=400)
-            st.altair_chart(chart_conta, use_container_width=True)
+            exibir_grafico(chart_conta)
         else:
             st.write(f"Não há dados disponíveis para a conta ({conta_selecionada}) entre 2015 e 2023.")
         
@@ -542,15 +365,9 @@ def main():
         st.markdown("---")
 
         # Gráfico de evolução da Despesa (em barras)
-        if df_filtrado['Percentual_Despesa'].notnull().sum() > 0:
+        if chart_despesa is not None:
             st.write(f"Evolução da Despesa ({conta_selecionada}) sobre a Despesa Corrente Líquida (2015-2023)")
-            chart_despesa = alt.Chart(df_filtrado.dropna(subset=['Percentual_Despesa'])).mark_bar().encode(
-                x=alt.X('Ano:O', title='Ano'),
-                y=alt.Y('Percentual_Despesa:Q', title=f'Percentual da {conta_selecionada} sobre Despesa Corrente Líquida'),
-                tooltip=[alt.Tooltip('Ano:O', title='Ano'), 
-                        alt.Tooltip('Percentual_Despesa:Q', title='Percentual', format=",.2f")]
-            ).properties(width='container', height=400)
-            st.altair_chart(chart_despesa, use_container_width=True)
+            exibir_grafico(chart_despesa)
         else:
             st.write("Nenhum dado disponível para calcular o percentual.")
         
@@ -577,6 +394,80 @@ def main():
         st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
         st.markdown("---")
 
+        # Antecipar em segundo plano as próximas seleções prováveis (instituições vizinhas e demais contas)
+        ANTECIPACAO.antecipar_evolucao(page, selecao_despesa, indice_desp, dados['ultimo_ano_despesas'],
+                                       uf_selecionada, instituicao_selecionada, conta_selecionada)
+
+
+        st.sidebar.markdown("---")
+        st.sidebar.markdown(
+            '<h6>Made in &nbsp<img src="https://streamlit.io/images/brand/streamlit-mark-color.png" alt="Streamlit logo" height="16">&nbsp by <a href="https://www.linkedin.com/in/jonas-manabu-okawara">Jonas Okawara</a></h6>',
+            unsafe_allow_html=True,
+        )
+
+    elif page == 'Comparação de Municípios':
+        # Página de comparação: receitas, despesas e CAPAG de vários municípios lado a lado
+        st.title("Comparação entre Municípios")
+
+        # Pivô município x ano x métrica já montado; cada seleção é uma indexação por posições
+        pivo = dados['comparacao']
+
+        # Municípios de qualquer UF, identificados como "Município (UF)"
+        municipios_selecionados = st.sidebar.multiselect(
+            f'Selecione até {MAXIMO_MUNICIPIOS} municípios', pivo.rotulos, max_selections=MAXIMO_MUNICIPIOS)
+
+        if municipios_selecionados:
+            codigos = pivo.codigos_selecionados(municipios_selecionados)
+            chave = tuple(codigos)
+
+            # Receita Total e Despesa Total de cada município ao longo dos anos
+            st.write('Evolução da Receita Total dos municípios selecionados')
+            chart_receita = GRAFICOS.obter((page, 'receita', chave), pivo, lambda: grafico_comparacao_total(
+                pivo.longo(codigos, ['Receita_Total']), 'Receita Total', 'Evolução da Receita Total'))
+            exibir_grafico(chart_receita)
+
+            st.write('Evolução da Despesa Total dos municípios selecionados')
+            chart_despesa = GRAFICOS.obter((page, 'despesa', chave), pivo, lambda: grafico_comparacao_total(
+                pivo.longo(codigos, ['Despesa_Total']), 'Despesa Total', 'Evolução da Despesa Total'))
+            exibir_grafico(chart_despesa)
+
+            st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
+            st.markdown("---")
+
+            # Composição e notas de um ano escolhido (por padrão, o mais recente)
+            anos = list(pivo.anos)[::-1]
+            ano_selecionado = st.sidebar.selectbox('Selecione o Ano', anos)
+
+            st.write(f'Composição das Receitas e das Despesas em {ano_selecionado}')
+            chart_composicao_receita = GRAFICOS.obter(
+                (page, 'composicao_receita', chave, ano_selecionado), pivo,
+                lambda: grafico_comparacao_receita(pivo.longo(codigos, COLUNAS_RECEITA, ano_selecionado)))
+            exibir_grafico(chart_composicao_receita)
+            chart_composicao_despesa = GRAFICOS.obter(
+                (page, 'composicao_despesa', chave, ano_selecionado), pivo,
+                lambda: grafico_comparacao_despesa(pivo.longo(codigos, COLUNAS_DESPESA, ano_selecionado)))
+            exibir_grafico(chart_composicao_despesa)
+
+            # Valores do ano lado a lado
+            df_ano = pivo.tabela_ano(codigos, ano_selecionado)
+            st.write(f'Receitas e despesas dos municípios selecionados em {ano_selecionado}')
+            st.dataframe(df_ano[['Município', 'populacao', 'Receita_Total', *COLUNAS_RECEITA, 'Despesa_Total',
+                                 *COLUNAS_DESPESA]], use_container_width=True, hide_index=True)
+
+            st.markdown('<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>',unsafe_allow_html=True)
+            st.markdown("---")
+
+            # Indicadores e notas CAPAG do ano
+            st.write(f'Indicadores e notas CAPAG dos municípios selecionados em {ano_selecionado}')
+            df_capag_ano = df_ano[['Município', 'Indicador 1', 'Nota 1', 'Indicador 2', 'Nota 2', 'Indicador 3',
+                                   'Nota 3', NOTAS_CAPAG[-1]]]
+            st.dataframe(df_capag_ano.style.format(formatar_indicador, subset=INDICADORES_CAPAG),
+                         use_container_width=True, hide_index=True)
+
+            st.markdown('<h6>Fonte: <a href="https://www.tesourotransparente.gov.br/temas/estados-e-municipios/capacidade-de-pagamento-capag">Capacidade de Pagamento (CAPAG)</a></h6>',unsafe_allow_html=True)
+            st.markdown("---")
+        else:
+            st.write("Selecione ao menos um município para comparar.")
 
         st.sidebar.markdown("---")
         st.sidebar.markdown(
@@ -586,7 +477,15 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Endpoint /metrics (se RELORC_METRICAS_PORTA estiver definida) e medição da execução completa
+    iniciar_servidor()
+    METRICAS.iniciar_execucao()
+    with etapa('execucao'):
+        main()
+    # Gravar em segundo plano o snapshot de partida rápida, se os dados carregados mudaram
+    salvar_partida()
+    if DEBUG:
+        painel_desempenho()
 
 
 
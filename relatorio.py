@@ -0,0 +1,214 @@
+import argparse
+import html
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from carregamento import carregar_relatorio
+from graficos import grafico_despesa_municipio, grafico_receita_municipio
+from rankings import INDICADORES_CAPAG
+
+# Pasta padrão dos relatórios gerados em lote
+CAMINHO_RELATORIOS = './relatorios/'
+
+# Arquivo (dentro da pasta de destino) com os códigos dos municípios já concluídos
+ARQUIVO_PROGRESSO = 'progresso.log'
+
+FONTE_SICONFI = '<h6>Fonte: <a href="https://siconfi.tesouro.gov.br/siconfi/index.jsf">Siconfi</a></h6>'
+FONTE_CAPAG = ('<h6>Fonte: <a href="https://www.tesourotransparente.gov.br/temas/estados-e-municipios/'
+               'capacidade-de-pagamento-capag">Capacidade de Pagamento (CAPAG)</a></h6>')
+
+MODELO_HTML = """<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>Relatório Orçamentário Municipal - {municipio} ({uf})</title>
+<script src="https://cdn.jsdelivr.net/npm/vega@{vega}"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-lite@{vegalite}"></script>
+<script src="https://cdn.jsdelivr.net/npm/vega-embed@{vegaembed}"></script>
+</head>
+<body>
+<h1>Relatório Orçamentário Municipal (2020-23)</h1>
+<p>Evolução da composição da Receita Total do município {municipio} ({uf})</p>
+<div id="receita" style="width: 100%"></div>
+{fonte_siconfi}
+<hr>
+<p>Evolução da composição das Despesas do município {municipio}</p>
+<div id="despesa" style="width: 100%"></div>
+{fonte_siconfi}
+<hr>
+<p>Tabela com dados da Nota Capag para o município {municipio} ({uf})</p>
+{tabela_capag}
+{fonte_capag}
+<script>
+vegaEmbed('#receita', {receita});
+vegaEmbed('#despesa', {despesa});
+</script>
+</body>
+</html>
+"""
+
+
+def formatar_indicador(valor):
+    # Indicadores CAPAG na tabela: seis casas decimais e 'n.d.' (não disponível) para os ausentes
+    return 'n.d.' if pd.isna(valor) else f'{valor:.6f}'
+
+
+def tabela_formatada(df_capag):
+    # Indicadores já como texto, para as saídas que não aceitam formatação por coluna (HTML)
+    return df_capag.assign(**{coluna: df_capag[coluna].map(formatar_indicador) for coluna in INDICADORES_CAPAG})
+
+
+def tabela_capag(df_capag):
+    # Tabela da Nota Capag sem o código do município, em ordem cronológica
+    return df_capag.drop(columns=['cod']).sort_values(by='ano').reset_index(drop=True)
+
+
+def conteudo_relatorio(df_municipio, df_capag):
+    # Conteúdo da página "Relatório Orçamentário" de um município: gráficos de receita e despesa e tabela CAPAG
+    return {
+        'codigo': df_municipio['id_municipio'].iloc[0],
+        'municipio': df_municipio['municipio'].iloc[0],
+        'uf': df_municipio['uf'].iloc[0],
+        'receita': grafico_receita_municipio(df_municipio),
+        'despesa': grafico_despesa_municipio(df_municipio),
+        'capag': tabela_capag(df_capag),
+    }
+
+
+def _json_script(valor):
+    # JSON embutido em <script>: "</" não pode encerrar o bloco antes da hora
+    return json.dumps(valor, ensure_ascii=False).replace('</', '<\\/')
+
+
+def relatorio_html(conteudo):
+    # Importado aqui: a aplicação usa este módulo sem gerar HTML e não precisa carregar o Altair na partida
+    import altair as alt
+    return MODELO_HTML.format(
+        municipio=html.escape(conteudo['municipio']),
+        uf=html.escape(conteudo['uf']),
+        vega=alt.VEGA_VERSION,
+        vegalite=alt.VEGALITE_VERSION,
+        vegaembed=alt.VEGAEMBED_VERSION,
+        fonte_siconfi=FONTE_SICONFI,
+        fonte_capag=FONTE_CAPAG,
+        tabela_capag=tabela_formatada(conteudo['capag']).to_html(index=False, na_rep=''),
+        receita=_json_script(conteudo['receita']),
+        despesa=_json_script(conteudo['despesa']),
+    )
+
+
+def relatorio_json(conteudo):
+    dados = dict(conteudo)
+    # NaN vira null pelo to_json do pandas
+    capag = conteudo['capag'].to_json(orient='records', force_ascii=False, double_precision=15)
+    dados['capag'] = json.loads(capag)
+    return json.dumps(dados, ensure_ascii=False)
+
+
+def _gravar(caminho, texto):
+    # Grava em arquivo temporário e renomeia: uma interrupção nunca deixa um relatório pela metade
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(texto)
+    os.replace(temporario, caminho)
+
+
+# Índice de cada processo de geração, carregado uma única vez pelo inicializador
+_DADOS = {}
+
+
+def _iniciar_processo():
+    _DADOS['relatorio'] = carregar_relatorio()
+
+
+def _gerar_lote(codigos, destino, formatos):
+    # Gera e grava os relatórios de um lote de municípios; só os códigos concluídos voltam ao processo principal
+    if not _DADOS:
+        _iniciar_processo()
+    concluidos = []
+    for codigo in codigos:
+        conteudo = conteudo_relatorio(*_DADOS['relatorio'].municipio(codigo))
+
+        pasta = os.path.join(destino, conteudo['uf'])
+        os.makedirs(pasta, exist_ok=True)
+        if 'html' in formatos:
+            _gravar(os.path.join(pasta, codigo + '.html'), relatorio_html(conteudo))
+        if 'json' in formatos:
+            _gravar(os.path.join(pasta, codigo + '.json'), relatorio_json(conteudo))
+        concluidos.append(codigo)
+    return concluidos
+
+
+def ler_progresso(destino):
+    caminho = os.path.join(destino, ARQUIVO_PROGRESSO)
+    if not os.path.exists(caminho):
+        return set()
+    with open(caminho, encoding='utf-8') as arquivo:
+        return {linha.strip() for linha in arquivo if linha.strip()}
+
+
+def _lotes(codigos, tamanho):
+    for inicio in range(0, len(codigos), tamanho):
+        yield codigos[inicio:inicio + tamanho]
+
+
+def gerar_relatorios(destino=CAMINHO_RELATORIOS, formatos=('html', 'json'), processos=None, tamanho_lote=50,
+                     recomecar=False):
+    # Gera o relatório de todos os municípios, retomando do ponto em que uma execução anterior parou.
+    # Cada município concluído é registrado no arquivo de progresso assim que seus arquivos são gravados.
+    processos = processos or 1
+    os.makedirs(destino, exist_ok=True)
+    caminho_progresso = os.path.join(destino, ARQUIVO_PROGRESSO)
+    if recomecar and os.path.exists(caminho_progresso):
+        os.remove(caminho_progresso)
+
+    concluidos = ler_progresso(destino)
+    codigos = [codigo for codigo in carregar_relatorio().codigos if codigo not in concluidos]
+    print(f"{len(concluidos):,} municípios já concluídos; {len(codigos):,} a gerar.")
+
+    with open(caminho_progresso, 'a', encoding='utf-8') as progresso:
+        def registrar(lote):
+            progresso.write(''.join(codigo + '\n' for codigo in lote))
+            progresso.flush()
+
+        if processos == 1:
+            for lote in _lotes(codigos, tamanho_lote):
+                registrar(_gerar_lote(lote, destino, formatos))
+        else:
+            # No máximo dois lotes por processo em andamento: a memória não cresce com o número de municípios
+            with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+                pendentes = set()
+                for lote in _lotes(codigos, tamanho_lote):
+                    if len(pendentes) >= 2 * processos:
+                        prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                        for futuro in prontos:
+                            registrar(futuro.result())
+                    pendentes.add(executor.submit(_gerar_lote, lote, destino, formatos))
+                for futuro in wait(pendentes).done:
+                    registrar(futuro.result())
+
+    print(f"Relatórios gravados em {destino}")
+    return len(codigos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera o Relatório Orçamentário de todos os municípios em HTML e/ou JSON.')
+    parser.add_argument('--destino', default=CAMINHO_RELATORIOS, help='Pasta onde os relatórios serão gravados')
+    parser.add_argument('--formato', choices=['html', 'json', 'ambos'], default='ambos',
+                        help='Formato dos arquivos gerados (padrão: ambos)')
+    parser.add_argument('--processos', type=int, default=os.cpu_count(),
+                        help='Número de processos de geração (padrão: número de CPUs)')
+    parser.add_argument('--lote', type=int, default=50, help='Municípios por tarefa enviada a cada processo')
+    parser.add_argument('--recomecar', action='store_true',
+                        help='Ignora o progresso registrado e gera todos os relatórios novamente')
+    args = parser.parse_args()
+
+    formatos = ('html', 'json') if args.formato == 'ambos' else (args.formato,)
+    gerar_relatorios(args.destino, formatos, args.processos, args.lote, args.recomecar)
+
+
+if __name__ == "__main__":
+    main()
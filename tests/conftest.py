@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Os módulos da aplicação ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.sintetico import CONTAS_RECEITA, gerar_capag, gerar_rec_desp, gerar_siconfi as gerar_ano
+from carregamento import tipar_capag
+
+RCL = CONTAS_RECEITA[0]
+
+# Contas com acentos, pontuação e espaços nas bordas, como nos arquivos do Siconfi
+CONTAS = [RCL, 'RECEITAS CORRENTES (I)', 'Dedução (II)', '  Impostos, Taxas e Contribuições de Melhoria ',
+          'Transferências Correntes', 'Receita Patrimonial', 'Outras Receitas Correntes', 'Cota-Parte do FPM']
+
+MUNICIPIOS = [('SP', 'São Paulo', 3550308), ('SP', 'Campinas', 3509502), ('MG', 'Abaeté', 3100203),
+              ('MG', 'Araxá', 3104007)]
+
+
+def gerar_siconfi(anos=range(2014, 2024), semente=0):
+    # DataFrame como lido de um CSV do Siconfi, gerado por benchmarks/sintetico.py e com casos difíceis:
+    # valores inválidos, uma conta vazia, UF e instituição com espaços e caixa diferentes, um ano sem a
+    # conta de referência e uma instituição sem a conta de referência no último ano
+    df = pd.concat([gerar_ano(MUNICIPIOS, len(CONTAS), ano, CONTAS, semente, fracao_invalidos=0.04)
+                    for ano in anos], ignore_index=True)
+    sem_rcl = (df['Conta'] == RCL) & (((df['Cod.IBGE'] == 3509502) & (df['Ano'] == 2018)) |
+                                      ((df['Cod.IBGE'] == 3104007) & (df['Ano'] == 2023)))
+    df = df[~sem_rcl].reset_index(drop=True)
+    abaete = df['Cod.IBGE'] == 3100203
+    df.loc[abaete, 'UF'] = ' mg'
+    df.loc[abaete, 'Instituição'] = df.loc[abaete, 'Instituição'] + ' '
+    df['Conta'] = df['Conta'].astype(object)
+    df.loc[len(df) // 2, 'Conta'] = None
+    return df
+
+
+@pytest.fixture
+def siconfi():
+    return gerar_siconfi()
+
+
+@pytest.fixture
+def planilhas():
+    # rec_desp_full.xlsx e capag_full.xlsx já com as conversões de ler_rec_desp/ler_capag; Araxá não tem
+    # CAPAG no último ano
+    rec_desp = gerar_rec_desp(MUNICIPIOS, semente=2)
+    capag = gerar_capag(MUNICIPIOS, semente=2, fracao_nd=0.1)
+    capag = capag[(capag['cod'] != 3104007) | (capag['ano'] != 2023)].reset_index(drop=True)
+    rec_desp = rec_desp.astype({'id_municipio': str, 'ano': str})
+    capag = tipar_capag(capag.astype({'cod': str, 'ano': str}))
+    return rec_desp, capag
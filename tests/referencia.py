@@ -0,0 +1,64 @@
+import pandas as pd
+
+from limpeza import normalizar_texto
+
+# Cálculos da versão original de main() (rel_orc_mun.py), reproduzidos linha a linha para comparação
+
+
+def converter_valor_original(serie):
+    # Três substituições por regex seguidas de pd.to_numeric
+    serie = serie.replace({r'\.': '', r',': '.', r'[^\d\.]': ''}, regex=True)
+    return pd.to_numeric(serie, errors='coerce')
+
+
+def limpar_original(df):
+    df = df.copy()
+    df['Ano'] = df['Ano'].astype(str)
+    df['Valor'] = converter_valor_original(df['Valor'])
+    df['Conta_Normalizada'] = df['Conta'].apply(normalizar_texto)
+    df['UF'] = df['UF'].str.strip().str.upper()
+    df['Instituição'] = df['Instituição'].str.strip().str.upper()
+    return df
+
+
+def percentual_original(df_rec, uf, instituicao, conta, conta_referencia):
+    # Percentual da conta selecionada sobre a conta de referência, linha a linha (df.apply)
+    conta_normalizada = normalizar_texto(conta)
+    df_filtrado = df_rec[
+        (df_rec['UF'] == uf) &
+        (df_rec['Instituição'] == instituicao) &
+        (df_rec['Ano'].between('2015', '2023'))
+    ]
+
+    def calcular_percentual(row, df_filtrado):
+        referencia = df_filtrado[
+            (df_filtrado['Conta_Normalizada'] == conta_referencia) &
+            (df_filtrado['Ano'] == row['Ano'])
+        ]
+        if not referencia.empty:
+            valor_referencia = referencia['Valor'].values[0]
+            valor_atual = row['Valor']
+            if pd.notna(valor_referencia) and pd.notna(valor_atual):
+                return (valor_atual / valor_referencia) * 100
+        return None
+
+    percentual = df_filtrado.apply(
+        lambda row: calcular_percentual(row, df_filtrado) if row['Conta_Normalizada'] == conta_normalizada else None,
+        axis=1)
+    return pd.to_numeric(percentual, errors='coerce').astype('float64')
+
+
+def ultimo_ano_original(df_rec, uf, instituicao, conta_referencia, descartar):
+    # Quadro do último ano: (ano, população de 2023, conta de referência presente, [(conta, percentual)])
+    df_instituicao = df_rec[(df_rec['UF'] == uf) & (df_rec['Instituição'] == instituicao)]
+    ultimo_ano = df_instituicao['Ano'].max()
+    df_ultimo_ano = df_instituicao[df_instituicao['Ano'] == ultimo_ano].copy()
+    df_referencia = df_ultimo_ano[df_ultimo_ano['Conta_Normalizada'] == conta_referencia]
+    populacao = df_instituicao[df_instituicao['Ano'] == '2023']['População'].values[0]
+    if df_referencia.empty:
+        return int(ultimo_ano), populacao, False, []
+    valor_referencia = df_referencia['Valor'].values[0]
+    df_ultimo_ano['Percentual'] = df_ultimo_ano.apply(
+        lambda row: (row['Valor'] / valor_referencia) * 100 if pd.notna(row['Valor']) else None, axis=1)
+    restante = df_ultimo_ano.sort_values(by='Percentual', ascending=False).iloc[descartar:]
+    return int(ultimo_ano), populacao, True, list(zip(restante['Conta'], restante['Percentual']))
@@ -0,0 +1,119 @@
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import api
+from cache import CacheDados
+from indices import IndiceRelatorio, IndiceSiconfi
+from limpeza import limpar_siconfi, tipar_siconfi
+
+
+@pytest.fixture
+def servidor():
+    servidor = api.criar_servidor(porta=0)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{servidor.server_address[1]}'
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _consultar(url, cabecalhos=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=cabecalhos or {})) as resposta:
+            return resposta.status, json.loads(resposta.read())
+    except urllib.error.HTTPError as erro:
+        return erro.code, json.loads(erro.read())
+
+
+def _etag(url, cabecalhos=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=cabecalhos or {})) as resposta:
+            return resposta.status, resposta.headers['ETag']
+    except urllib.error.HTTPError as erro:
+        return erro.code, erro.headers['ETag']
+
+
+@pytest.fixture
+def dados(monkeypatch, planilhas, siconfi):
+    # Rotas reais sobre os dados sintéticos, com um cache de respostas vazio em cada teste
+    relatorio = IndiceRelatorio(*planilhas)
+    indice = IndiceSiconfi(tipar_siconfi(limpar_siconfi(siconfi.dropna(subset=['Conta']))))
+    monkeypatch.setattr(api, 'carregar_relatorio', lambda: relatorio)
+    monkeypatch.setattr(api, '_versao_planilhas', lambda: 'v1')
+    monkeypatch.setattr(api, 'SICONFI', {tipo: (lambda: indice, caminho, conta)
+                                         for tipo, (_, caminho, conta) in api.SICONFI.items()})
+    monkeypatch.setattr(api, 'assinatura_siconfi', lambda tipo, caminho, uf: 'v1')
+    respostas = CacheDados(1024 ** 2)
+    monkeypatch.setattr(api, 'RESPOSTAS', respostas)
+    return respostas, indice
+
+
+def test_rota_desconhecida(servidor):
+    status, corpo = _consultar(servidor + '/nada')
+    assert status == 404 and 'erro' in corpo
+
+
+def test_erro_inesperado_responde_500_em_json(servidor, monkeypatch, caplog):
+    def falhar(codigo):
+        raise ValueError('planilha corrompida')
+    monkeypatch.setattr(api, '_versao_planilhas', lambda: 'v1')
+    monkeypatch.setattr(api, 'capag', falhar)
+    status, corpo = _consultar(servidor + '/capag/3550308')
+    assert status == 500
+    assert corpo == {'erro': 'Erro interno do servidor'}
+    # O traceback vai para o log, não para o cliente
+    assert 'planilha corrompida' in caplog.text
+
+
+def test_metricas_pelo_nome_da_rota(servidor, monkeypatch):
+    from metricas import METRICAS
+    monkeypatch.setattr(api, '_versao_planilhas', lambda: 'v1')
+    monkeypatch.setattr(api, 'capag', lambda codigo: {'codigo': codigo})
+    for caminho in ['/capag/1', '/capag/2', '/x1', '/x2/y', '/municipio/1/outros']:
+        _consultar(servidor + caminho)
+    detalhes = {detalhe for etapa, detalhe in METRICAS._totais if etapa == 'api'}
+    # Um rótulo por rota, qualquer que seja o caminho enviado
+    assert detalhes <= {'municipio', 'capag', 'instituicao', 'conta', 'desconhecida'}
+    assert {'capag', 'desconhecida'} <= detalhes
+
+
+def test_rotas_com_dados(servidor, dados):
+    _, indice = dados
+    status, corpo = _consultar(servidor + '/municipio/3509502/receitas')
+    assert status == 200 and corpo['municipio'] == 'Campinas' and len(corpo['receitas']) == 4
+    status, corpo = _consultar(servidor + '/capag/3100203')
+    assert status == 200 and [linha['ano'] for linha in corpo['capag']] == ['2020', '2021', '2022', '2023']
+    uf = indice.ufs[0]
+    nome = indice.instituicoes(uf)[0]
+    endereco = f'{servidor}/instituicao/{uf}/{urllib.parse.quote(nome)}'
+    status, corpo = _consultar(endereco)
+    assert status == 200 and corpo['contas']
+    status, corpo = _consultar(endereco + '/conta/' + urllib.parse.quote(corpo['contas'][1]))
+    assert status == 200 and len(corpo['serie']) == 9
+
+
+def test_etag_atual_responde_304(servidor, dados):
+    status, etag = _etag(servidor + '/capag/3509502')
+    assert status == 200 and etag
+    assert _etag(servidor + '/capag/3509502', {'If-None-Match': etag}) == (304, etag)
+    # ETag de outra resposta ou de outra versão dos dados: resposta completa
+    assert _etag(servidor + '/capag/3509502', {'If-None-Match': '"outro"'})[0] == 200
+    status, outro = _etag(servidor + '/capag/3100203', {'If-None-Match': etag})
+    assert status == 200 and outro != etag
+
+
+def test_variacoes_do_caminho_compartilham_a_resposta(servidor, dados):
+    respostas, _ = dados
+    respostas_caminho = {_etag(f'{servidor}/capag/3509502{sufixo}') for sufixo in ['', '/', '?x=1', '?x=2&y=3',
+                                                                                  '?tipo=a']}
+    for i in range(50):
+        assert _consultar(f'{servidor}/capag/3509502?x={i}')[0] == 200
+    assert len(respostas_caminho) == 1 and next(iter(respostas_caminho))[0] == 200
+    # Um corpo por rota e parâmetros, e nenhuma trava de construção deixada para trás
+    assert len(respostas) == 1
+    assert respostas._construcoes == {}
@@ -0,0 +1,47 @@
+import sys
+
+from cache import CacheDados
+from evolucao import CONTA_RECEITA
+from indices import IndiceRelatorio, IndiceSiconfi
+from limpeza import limpar_siconfi, tipar_siconfi
+
+
+def test_indices_contam_as_tabelas_que_guardam(siconfi, planilhas):
+    df = tipar_siconfi(limpar_siconfi(siconfi.iloc[::-1].reset_index(drop=True)))
+    indice = IndiceSiconfi(df)
+    # Fora de ordem: o índice guarda uma cópia ordenada além da tabela de origem
+    assert indice.df is not df
+    assert sys.getsizeof(indice) > 2 * df.memory_usage(deep=True).sum() * 0.99
+    rec_desp, capag = planilhas
+    relatorio = IndiceRelatorio(rec_desp, capag)
+    assert sys.getsizeof(relatorio) > relatorio.df.memory_usage(deep=True).sum() + rec_desp.memory_usage(
+        deep=True).sum()
+
+
+def test_participacoes_respeitam_o_limite_do_cache(siconfi, monkeypatch):
+    cache = CacheDados(limite_bytes=5_000)
+    monkeypatch.setattr('indices.CACHE', cache)
+    indice = IndiceSiconfi(tipar_siconfi(limpar_siconfi(siconfi)))
+    for uf in indice.ufs:
+        for instituicao in indice.instituicoes(uf):
+            indice.participacao(uf, instituicao, CONTA_RECEITA)
+            indice.ultimo_ano(uf, instituicao, CONTA_RECEITA, 2)
+            assert cache.total_bytes <= cache.limite_bytes
+    # Duas entradas por instituição; as menos usadas foram descartadas
+    assert 0 < len(cache) < 2 * 4
+
+
+def test_siconfi_em_uma_unica_entrada(tmp_path, monkeypatch):
+    from carregamento import carregar_siconfi
+    from conftest import gerar_siconfi
+    cache = CacheDados(limite_bytes=1024 ** 3)
+    monkeypatch.setattr('carregamento.CACHE', cache)
+    for ano in (2022, 2023):
+        gerar_siconfi(anos=[ano]).to_csv(tmp_path / f'{ano}.csv', sep=';', index=False, encoding='ISO-8859-1')
+    df = carregar_siconfi(str(tmp_path))
+    # Apenas o conjunto concatenado: os arquivos limpos não ficam no cache
+    assert list(cache._itens) == [('siconfi', str(tmp_path))]
+    assert carregar_siconfi(str(tmp_path)) is df
+    gerar_siconfi(anos=[2021]).to_csv(tmp_path / '2021.csv', sep=';', index=False, encoding='ISO-8859-1')
+    assert sorted(carregar_siconfi(str(tmp_path))['Ano'].unique()) == [2021, 2022, 2023]
+    assert len(cache) == 1
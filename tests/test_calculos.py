@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculos import QUADRO_ULTIMO_ANO, calcular_participacao, tabela_ultimo_ano
+from evolucao import CONTA_RECEITA, contas_instituicao, filtrar_conta
+from indices import IndiceRelatorio, IndiceSiconfi, IndiceUltimoAno
+from limpeza import limpar_siconfi, tipar_siconfi
+from referencia import limpar_original, percentual_original, ultimo_ano_original
+
+
+@pytest.fixture
+def dados(siconfi):
+    # Mesmo CSV pelos dois caminhos: a limpeza original (Ano em texto) e o índice usado pelas páginas.
+    # A caixa de seleção de conta (sorted) não aceita conta vazia, nem na versão original
+    siconfi = siconfi.dropna(subset=['Conta']).reset_index(drop=True)
+    return limpar_original(siconfi), IndiceSiconfi(tipar_siconfi(limpar_siconfi(siconfi.copy())))
+
+
+def _assert_quadro(quadro, ano, populacao, referencia, contas):
+    assert (quadro['ano'], quadro['populacao'], quadro['referencia']) == (ano, populacao, referencia)
+    assert [conta for conta, _ in quadro['contas']] == [conta for conta, _ in contas]
+    np.testing.assert_allclose([percentual for _, percentual in quadro['contas']],
+                               [percentual for _, percentual in contas], rtol=1e-12, equal_nan=True)
+
+
+def _selecoes(indice):
+    for uf in indice.ufs:
+        for instituicao in indice.instituicoes(uf):
+            yield uf, instituicao
+
+
+def test_percentual_da_conta_igual_ao_calculo_original(dados):
+    original, indice = dados
+    for uf, instituicao in _selecoes(indice):
+        for conta in contas_instituicao(indice.instituicao(uf, instituicao)):
+            df_filtrado, df_conta = filtrar_conta(indice, uf, instituicao, conta, CONTA_RECEITA, 'Percentual')
+            esperado = percentual_original(original, uf, instituicao, conta, CONTA_RECEITA)
+            np.testing.assert_allclose(df_filtrado['Percentual'].to_numpy(dtype='float64'), esperado.to_numpy(),
+                                       rtol=1e-12, equal_nan=True)
+            assert len(df_conta) == (df_filtrado['Conta'] == conta).sum()
+
+
+def test_participacao_de_todas_as_contas(dados):
+    original, indice = dados
+    for uf, instituicao in _selecoes(indice):
+        df_instituicao = indice.instituicao(uf, instituicao)
+        participacao = indice.participacao(uf, instituicao, CONTA_RECEITA)
+        # Divisão direta pela primeira ocorrência da conta de referência em cada ano
+        referencia = df_instituicao[df_instituicao['Conta_Normalizada'] == CONTA_RECEITA]
+        por_ano = referencia.drop_duplicates('Ano').set_index('Ano')['Valor']
+        esperado = df_instituicao['Valor'] / df_instituicao['Ano'].map(por_ano) * 100
+        pd.testing.assert_series_equal(participacao, esperado, check_names=False, check_dtype=False)
+
+
+@pytest.mark.parametrize('nome', ['receitas', 'despesas'])
+def test_quadro_do_ultimo_ano_igual_ao_calculo_original(dados, nome):
+    original, indice = dados
+    conta_referencia, descartar = QUADRO_ULTIMO_ANO[nome]
+    if nome == 'despesas':
+        # Fixture de receitas com outra conta como referência: exercita o descarte de apenas uma conta
+        conta_referencia = original['Conta_Normalizada'].iloc[1]
+    quadros = IndiceUltimoAno(tabela_ultimo_ano(indice.df, conta_referencia, descartar))
+    for uf, instituicao in _selecoes(indice):
+        ano, populacao, referencia, contas = ultimo_ano_original(original, uf, instituicao, conta_referencia,
+                                                                  descartar)
+        _assert_quadro(quadros.instituicao(uf, instituicao), ano, populacao, referencia, contas)
+        # O quadro calculado por instituição (sem a tabela da ingestão) é o mesmo
+        _assert_quadro(indice.ultimo_ano(uf, instituicao, conta_referencia, descartar), ano, populacao, referencia,
+                       contas)
+
+
+def test_calcular_participacao_sem_conta_de_referencia():
+    df = pd.DataFrame({'Ano': [2020, 2020, 2021], 'Conta_Normalizada': ['A', 'B', 'B'], 'Valor': [200.0, 50.0, 10.0]})
+    pd.testing.assert_series_equal(calcular_participacao(df, 'A'), pd.Series([100.0, 25.0, np.nan]),
+                                   check_names=False)
+
+
+def test_relatorio_igual_ao_filtro_original(planilhas):
+    rec_desp, capag = planilhas
+    indice = IndiceRelatorio(rec_desp, capag)
+    assert indice.ufs == sorted(rec_desp['uf'].unique())
+    for uf in indice.ufs:
+        assert indice.municipios(uf) == sorted(rec_desp[rec_desp['uf'] == uf]['municipio'].unique())
+        for municipio in indice.municipios(uf):
+            codigo = indice.codigo(uf, municipio)
+            df_municipio, df_capag = indice.municipio(codigo)
+            # Filtro original: uma máscara booleana em cada planilha (os nomes do fixture não se repetem)
+            esperado = rec_desp[rec_desp['municipio'] == municipio]
+            esperado_capag = capag[capag['Nome_Município'] == municipio]
+            pd.testing.assert_frame_equal(df_municipio.reset_index(drop=True), esperado.reset_index(drop=True))
+            pd.testing.assert_frame_equal(df_capag.reset_index(drop=True), esperado_capag.reset_index(drop=True))
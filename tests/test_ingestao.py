@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+
+from carregamento import atualizar_particoes, construir_siconfi, ler_todas_particoes
+from conftest import gerar_siconfi
+from ingestao import PARTICOES_RCL, ingerir
+from limpeza import blocos_siconfi, ler_csv_limpo, tipar_siconfi, unificar_categorias
+
+
+def _gravar_csv(pasta, ano, semente=0):
+    # Um arquivo por ano, no formato exportado pelo Siconfi
+    arquivo = os.path.join(pasta, f'receitas_{ano}.csv')
+    gerar_siconfi(anos=[ano], semente=semente).to_csv(arquivo, sep=';', index=False, encoding='ISO-8859-1')
+    return arquivo
+
+
+@pytest.fixture
+def pasta_csv(tmp_path):
+    pasta = tmp_path / 'Receitas'
+    pasta.mkdir()
+    for ano in range(2014, 2021):
+        _gravar_csv(str(pasta), ano)
+    return str(pasta)
+
+
+def test_leitura_em_blocos_igual_a_leitura_completa(pasta_csv):
+    arquivo = os.path.join(pasta_csv, 'receitas_2018.csv')
+    blocos = [tipar_siconfi(bloco) for bloco in blocos_siconfi(arquivo, linhas_por_bloco=7)]
+    em_blocos = pd.concat(unificar_categorias(blocos), ignore_index=True)
+    pd.testing.assert_frame_equal(em_blocos, ler_csv_limpo(arquivo))
+
+
+@pytest.mark.parametrize('linhas_por_bloco', [None, 9])
+def test_ingestao_incremental_igual_a_reconstrucao(pasta_csv, tmp_path, linhas_por_bloco):
+    destino = str(tmp_path / 'dados')
+    atualizar_particoes(pasta_csv, 'receitas', destino, processos=1, linhas_por_bloco=linhas_por_bloco)
+    # Novos anos publicados, um arquivo corrigido e um arquivo retirado
+    for ano in range(2021, 2024):
+        _gravar_csv(pasta_csv, ano)
+    _gravar_csv(pasta_csv, 2016, semente=5)
+    os.remove(os.path.join(pasta_csv, 'receitas_2014.csv'))
+    atualizar_particoes(pasta_csv, 'receitas', destino, processos=1, linhas_por_bloco=linhas_por_bloco)
+    incremental = ler_todas_particoes('receitas', destino)
+
+    completo = str(tmp_path / 'completo')
+    atualizar_particoes(pasta_csv, 'receitas', completo, processos=1, completo=True)
+    pd.testing.assert_frame_equal(incremental, ler_todas_particoes('receitas', completo))
+    # E o mesmo conjunto lido diretamente dos CSVs pela aplicação
+    pd.testing.assert_frame_equal(incremental, construir_siconfi(pasta_csv, 1))
+
+
+def test_ingestao_em_blocos_gera_os_mesmos_rankings(pasta_csv, planilhas, tmp_path):
+    rec_desp, capag = planilhas
+    arquivo_rec_desp, arquivo_capag = str(tmp_path / 'rec_desp.xlsx'), str(tmp_path / 'capag.xlsx')
+    rec_desp.to_excel(arquivo_rec_desp, index=False)
+    capag.to_excel(arquivo_capag, index=False)
+    vazia = tmp_path / 'Despesas'
+    vazia.mkdir()
+    rankings = []
+    for destino, linhas_por_bloco in (('completo', None), ('blocos', 9)):
+        destino = str(tmp_path / destino)
+        ingerir(str(vazia), pasta_csv, arquivo_rec_desp, arquivo_capag, destino, processos=1,
+                linhas_por_bloco=linhas_por_bloco)
+        rankings.append(pd.read_feather(os.path.join(destino, 'rankings.feather')))
+    # Em blocos, as participações na RCL de cada UF ficam no disco até a montagem dos rankings
+    assert sorted(os.listdir(os.path.join(destino, PARTICOES_RCL))) == ['MG.feather', 'SP.feather']
+    assert rankings[0]['indicador'].astype(str).str.startswith('RCL % ').any()
+    pd.testing.assert_frame_equal(rankings[0], rankings[1], check_categorical=False)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from limpeza import converter_valor, limpar_siconfi, normalizar_coluna, normalizar_texto
+from referencia import converter_valor_original, limpar_original
+
+TEXTOS = ['RECEITA CORRENTE LÍQUIDA (III) = (I - II)', 'DESPESAS (EXCETO INTRA-ORÇAMENTÁRIAS) (I)',
+          'Dedução (II)', '  Impostos, Taxas e Contribuições de Melhoria ', 'Cota-Parte do FPM',
+          'Transferências da União - Específicas de Estados/DF/Municípios', 'ÂÊÎÔÛ àèìòù ãõ ç ü',
+          '\tinversões financeiras\n', '1.2.3 Receita de Serviços', '', '   ', None, np.nan,
+          'RECEITA CORRENTE LÍQUIDA (III) = (I - II)']
+
+
+@pytest.mark.parametrize('dtype', [object, 'str', 'category'])
+def test_normalizar_coluna_igual_a_normalizar_texto(dtype):
+    serie = pd.Series(TEXTOS * 3, index=range(100, 100 + 3 * len(TEXTOS)), dtype=dtype)
+    esperado = serie.astype(object).apply(normalizar_texto)
+    pd.testing.assert_series_equal(normalizar_coluna(serie), esperado, check_dtype=False)
+
+
+def test_normalizar_coluna_contas_do_siconfi(siconfi):
+    pd.testing.assert_series_equal(normalizar_coluna(siconfi['Conta']), siconfi['Conta'].apply(normalizar_texto),
+                                   check_dtype=False, check_names=False)
+
+
+VALORES = ['1.234.567,89', '-1.234,56', '-0,5', '', '   ', '1.234', '1.234.567', '12,5', ' 12,5 ', ',5', '0,00',
+           'n.d.', '-', '1,2,3', '1.234,56,7', 'R$ 10,00', '1e5', None, np.nan]
+
+
+def test_converter_valor_igual_a_limpeza_original():
+    # A limpeza original descarta qualquer caractere fora de dígitos, ponto e vírgula (inclusive o sinal
+    # de menos): "-1.234,56" vira 1234.56; o parser mantém exatamente esse comportamento
+    serie = pd.Series(VALORES, dtype=object)
+    pd.testing.assert_series_equal(converter_valor(serie), converter_valor_original(serie), check_dtype=False)
+    assert converter_valor(pd.Series(['1.234']))[0] == 1234.0
+
+
+@pytest.mark.parametrize('serie', [
+    pd.Series([1.5, -2.25, np.nan, 1e9]),
+    pd.Series([1, -2, 3]),
+    pd.Series([1.5, '1.234,5', None, -3, '-', '2,0'], dtype=object),
+], ids=['float', 'int', 'misto'])
+def test_converter_valor_numeros_ja_convertidos(serie):
+    pd.testing.assert_series_equal(converter_valor(serie), converter_valor_original(serie), check_dtype=False)
+
+
+def test_limpar_siconfi_igual_a_limpeza_original(siconfi):
+    limpo = limpar_siconfi(siconfi.copy())
+    original = limpar_original(siconfi)
+    for coluna in ['Valor', 'Conta_Normalizada', 'UF', 'Instituição']:
+        pd.testing.assert_series_equal(limpo[coluna], original[coluna], check_dtype=False)
+    assert (limpo['Ano'].astype(str) == original['Ano']).all()
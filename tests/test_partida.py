@@ -0,0 +1,72 @@
+import threading
+import time
+
+import partida
+
+
+def test_gravacoes_seguidas_gravam_apenas_o_estado_mais_recente(monkeypatch, tmp_path):
+    estados = iter(range(1000))
+    monkeypatch.setattr(partida, 'exportar', lambda: (next(estados), {'versao': next(estados)}))
+    monkeypatch.setattr(partida, '_estado', {'restaurado': True, 'gravado': None, 'pendente': None,
+                                             'gravando': False})
+    gravados = []
+    liberar = threading.Event()
+
+    def gravar(conteudo, arquivo):
+        liberar.wait(5)
+        gravados.append(conteudo['versao'])
+    monkeypatch.setattr(partida, 'gravar', gravar)
+
+    arquivo = str(tmp_path / 'partida.pickle')
+    for _ in range(20):
+        partida.salvar_partida(arquivo)
+    # Uma única thread de gravação, mesmo com várias mudanças enquanto a primeira gravação não termina
+    assert sum(thread.name == 'relorc-partida' for thread in threading.enumerate()) == 1
+    liberar.set()
+    for _ in range(500):
+        if not partida._estado['gravando']:
+            break
+        time.sleep(0.01)
+    # A primeira gravação e depois apenas a última mudança
+    assert gravados == [1, 39]
+
+
+def test_selecoes_entre_dados_ja_carregados_nao_regravam(monkeypatch, tmp_path):
+    from cache import CacheDados
+    cache = CacheDados(limite_bytes=1024 ** 3)
+    monkeypatch.setattr(partida, 'CACHE', cache)
+    monkeypatch.setattr(partida, '_estado', {'restaurado': True, 'gravado': None, 'pendente': None,
+                                             'gravando': False})
+    gravados = []
+    monkeypatch.setattr(partida, 'gravar', lambda conteudo, arquivo: gravados.append(conteudo))
+    arquivo = str(tmp_path / 'partida.pickle')
+
+    def aguardar():
+        for _ in range(500):
+            if not partida._estado['gravando']:
+                return
+            time.sleep(0.01)
+
+    fonte = cache.obter(('siconfi', 'Receitas'), ('a.csv', 1, 10), lambda: [1, 2, 3])
+    cache.obter(('indice', 'receitas'), id(fonte), lambda: {'indice': fonte})
+    cache.obter(('xlsx', 'capag.xlsx'), ('capag.xlsx', 1, 10), lambda: [4])
+    partida.salvar_partida(arquivo)
+    aguardar()
+    assert len(gravados) == 1
+    assert {chave for chave, _, _ in gravados[0]['dados']} == {('siconfi', 'Receitas'), ('indice', 'receitas'),
+                                                                ('xlsx', 'capag.xlsx')}
+    # Cliques alternados: entradas por seleção e uso de dados já carregados (que reordena o LRU)
+    for clique in range(6):
+        cache.obter(('participacao', object(), 'SP', clique), 1, lambda: [clique])
+        if clique % 2:
+            assert cache.obter(('siconfi', 'Receitas'), ('a.csv', 1, 10), list) is fonte
+        else:
+            cache.obter(('xlsx', 'capag.xlsx'), ('capag.xlsx', 1, 10), list)
+        partida.salvar_partida(arquivo)
+        aguardar()
+    assert len(gravados) == 1
+    # Uma fonte nova ou alterada é gravada
+    cache.obter(('snapshot', 'rankings.feather'), ('rankings.feather', 2, 5), lambda: [5])
+    partida.salvar_partida(arquivo)
+    aguardar()
+    assert len(gravados) == 2
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from conftest import RCL
+from indices import IndiceRankings
+from limpeza import limpar_siconfi, tipar_siconfi
+from rankings import PREFIXO_RCL, construir_rankings, indicadores_participacao_rcl, tabela_participacao_rcl
+
+
+def _estado(siconfi):
+    # Governo estadual no mesmo arquivo: código IBGE da UF (2 dígitos)
+    estado = siconfi[siconfi['Cod.IBGE'] == 3550308].assign(**{'Instituição': 'Governo do Estado de São Paulo',
+                                                                'Cod.IBGE': 35})
+    return pd.concat([siconfi, estado], ignore_index=True)
+
+
+def test_participacao_rcl_apenas_de_municipios(siconfi):
+    receitas = tipar_siconfi(limpar_siconfi(_estado(siconfi)))
+    participacoes = indicadores_participacao_rcl(receitas)
+    assert sorted(participacoes['municipio'].unique()) == ['3100203', '3104007', '3509502', '3550308']
+    assert participacoes['indicador'].astype(str).str.startswith(PREFIXO_RCL).all()
+
+
+def test_tabela_participacao_rcl(siconfi, planilhas):
+    receitas = tipar_siconfi(limpar_siconfi(_estado(siconfi)))
+    rankings = IndiceRankings(construir_rankings(*planilhas, receitas))
+    ano, tabela = tabela_participacao_rcl(rankings.municipio('3509502'))
+    assert ano == '2023'
+    assert list(tabela.columns[:2]) == ['Conta', '% da RCL']
+    assert not tabela['Conta'].str.startswith(PREFIXO_RCL).any()
+    # No máximo as quatro prefeituras no ranking nacional (Araxá não tem RCL em 2023); o governo do estado
+    # não entra
+    assert tabela['Posição no Brasil'].str.split(' de ').str[1].astype(int).between(1, 3).all()
+    # Sem a tabela do Siconfi, os rankings não têm participações na RCL
+    ano, _ = tabela_participacao_rcl(IndiceRankings(construir_rankings(*planilhas)).municipio('3509502'))
+    assert ano is None